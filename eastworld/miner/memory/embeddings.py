@@ -0,0 +1,92 @@
+# The MIT License (MIT)
+# Copyright © 2025 Eastworld AI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import hashlib
+import re
+from typing import Protocol
+
+import numpy as np
+import openai
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+class Embedder(Protocol):
+    """Text embedding model, vectors are L2-normalised float32 rows"""
+
+    name: str
+    dimension: int
+
+    async def embed(self, texts: list[str]) -> np.ndarray: ...
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class HashingEmbedder:
+    """
+    Deterministic local embedder. Word unigrams and bigrams are hashed into signed
+    buckets of a `dimension` sized vector, so similar texts share buckets. Needs no
+    model or network, for offline runs and tests.
+    """
+
+    def __init__(self, dimension: int = 256):
+        self.dimension = dimension
+        self.name = f"hashing-{dimension}"
+
+    def _embed_one(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        words = TOKEN_PATTERN.findall(text.lower())
+        tokens = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for token in tokens:
+            digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            sign = 1.0 if value >> 63 else -1.0
+            vector[value % self.dimension] += sign
+        return vector
+
+    async def embed(self, texts: list[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        return _normalize(np.stack([self._embed_one(text) for text in texts]))
+
+
+class OpenAIEmbedder:
+    """Embedder backed by an OpenAI compatible embeddings endpoint"""
+
+    def __init__(
+        self,
+        client: openai.AsyncOpenAI,
+        model: str = "text-embedding-3-small",
+        dimension: int = 256,
+    ):
+        self.client = client
+        self.model = model
+        self.dimension = dimension
+        self.name = f"{model}-{dimension}"
+
+    async def embed(self, texts: list[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        response = await self.client.embeddings.create(
+            model=self.model, input=texts, dimensions=self.dimension
+        )
+        vectors = np.array([item.embedding for item in response.data], np.float32)
+        return _normalize(vectors)
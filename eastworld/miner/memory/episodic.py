@@ -0,0 +1,184 @@
+# The MIT License (MIT)
+# Copyright © 2025 Eastworld AI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import json
+import os
+
+import bittensor as bt
+import numpy as np
+
+from eastworld.miner.memory.embeddings import Embedder
+
+
+class LSHIndex:
+    """
+    Random hyperplane LSH over L2-normalised vectors. Each of the `num_tables`
+    tables hashes a vector to the sign bits of `num_bits` projections, queries
+    also probe the buckets one bit away to find near misses.
+    """
+
+    def __init__(
+        self, dimension: int, num_tables: int = 8, num_bits: int = 10, seed: int = 0
+    ):
+        rng = np.random.default_rng(seed)
+        self.num_bits = num_bits
+        self.planes = rng.standard_normal((num_tables, num_bits, dimension))
+        self.planes = self.planes.astype(np.float32)
+        self._bit_values = 1 << np.arange(num_bits)
+        self.buckets: list[dict[int, list[int]]] = [{} for _ in range(num_tables)]
+
+    def _keys(self, vectors: np.ndarray) -> np.ndarray:
+        """Bucket keys of the vectors as an [N, num_tables] array"""
+        bits = np.einsum("tbd,nd->ntb", self.planes, vectors) > 0
+        return bits @ self._bit_values
+
+    def add(self, ids: list[int], vectors: np.ndarray):
+        for id_, keys in zip(ids, self._keys(vectors)):
+            for table, key in enumerate(keys):
+                self.buckets[table].setdefault(int(key), []).append(id_)
+
+    def query(self, vector: np.ndarray) -> set[int]:
+        """Ids of the candidate neighbours of a vector"""
+        candidates = set()
+        for table, key in enumerate(self._keys(vector[None])[0]):
+            key = int(key)
+            buckets = self.buckets[table]
+            candidates.update(buckets.get(key, ()))
+            for bit in range(self.num_bits):
+                candidates.update(buckets.get(key ^ (1 << bit), ()))
+        return candidates
+
+
+class EpisodicMemory:
+    """
+    File-backed memory of past experiences retrieved by embedding similarity.
+    Episodes are appended to a JSON lines file and their vectors to a float32
+    file, one pair of files per embedder, and indexed with LSH so prompts can
+    include the top-k relevant experiences instead of the raw history.
+    """
+
+    def __init__(
+        self,
+        data_dir: str,
+        embedder: Embedder,
+        num_tables: int = 8,
+        num_bits: int = 10,
+    ):
+        self.data_dir = data_dir
+        self.embedder = embedder
+        self.index = LSHIndex(embedder.dimension, num_tables, num_bits)
+
+        self.episodes: list[dict] = []
+        self._vectors = np.zeros((64, embedder.dimension), dtype=np.float32)
+
+        os.makedirs(data_dir, exist_ok=True)
+        self.episodes_file = os.path.join(data_dir, f"episodes_{embedder.name}.jsonl")
+        self.vectors_file = os.path.join(data_dir, f"episodes_{embedder.name}.f32")
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self.episodes)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._vectors[: len(self.episodes)]
+
+    def _load(self):
+        """Load the episodes, dropping any partial record left by a crash"""
+        episodes, offsets = [], [0]
+        if os.path.exists(self.episodes_file):
+            with open(self.episodes_file, "rb") as f:
+                for line in f:
+                    try:
+                        if not line.endswith(b"\n"):
+                            break
+                        episodes.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        break
+                    offsets.append(offsets[-1] + len(line))
+
+        row_size = self.embedder.dimension * self._vectors.itemsize
+        data = b""
+        if os.path.exists(self.vectors_file):
+            with open(self.vectors_file, "rb") as f:
+                data = f.read()
+        count = min(len(episodes), len(data) // row_size)
+        if count < len(episodes) or count * row_size < len(data):
+            bt.logging.warning(f"Episodic memory truncated to {count} episodes")
+            for filename, size in (
+                (self.episodes_file, offsets[count]),
+                (self.vectors_file, count * row_size),
+            ):
+                if os.path.exists(filename):
+                    os.truncate(filename, size)
+
+        vectors = np.frombuffer(data[: count * row_size], dtype=np.float32)
+        vectors = vectors.reshape(count, self.embedder.dimension)
+        self._reserve(count)
+        self._vectors[:count] = vectors
+        self.episodes = episodes[:count]
+        self.index.add(list(range(count)), vectors)
+
+    def _reserve(self, count: int):
+        """Grow the vector buffer to hold `count` episodes"""
+        capacity = len(self._vectors)
+        while capacity < count:
+            capacity *= 2
+        if capacity > len(self._vectors):
+            vectors = np.zeros((capacity, self.embedder.dimension), dtype=np.float32)
+            vectors[: len(self._vectors)] = self._vectors
+            self._vectors = vectors
+
+    async def add(self, text: str, **metadata) -> int:
+        """Embed, store and index an episode, returns its id"""
+        vector = (await self.embedder.embed([text]))[0].astype(np.float32)
+        episode = {"text": text, **metadata}
+        # The vector goes first, an episode line without its vector is dropped on load
+        with open(self.vectors_file, "ab") as f:
+            f.write(vector.tobytes())
+        with open(self.episodes_file, "ab") as f:
+            f.write(json.dumps(episode, separators=(",", ":")).encode() + b"\n")
+
+        episode_id = len(self.episodes)
+        self._reserve(episode_id + 1)
+        self._vectors[episode_id] = vector
+        self.episodes.append(episode)
+        self.index.add([episode_id], vector[None])
+        return episode_id
+
+    async def search(
+        self, query: str, k: int = 5, min_score: float = 0.0
+    ) -> list[tuple[float, dict]]:
+        """Top-k episodes most similar to the query, with their cosine similarity"""
+        if not self.episodes:
+            return []
+        vector = (await self.embedder.embed([query]))[0]
+        candidates = self.index.query(vector)
+        if len(candidates) < k:
+            # Too few hash collisions, the memory is small or the query is unusual
+            ids = np.arange(len(self.episodes))
+        else:
+            ids = np.fromiter(candidates, dtype=np.intp, count=len(candidates))
+
+        scores = self.vectors[ids] @ vector
+        top = np.argsort(-scores)[:k]
+        return [
+            (float(scores[i]), self.episodes[ids[i]])
+            for i in top
+            if scores[i] > min_score
+        ]
@@ -0,0 +1,131 @@
+# The MIT License (MIT)
+# Copyright © 2025 Eastworld AI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import asyncio
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from eastworld.miner.memory.embeddings import HashingEmbedder
+from eastworld.miner.memory.episodic import EpisodicMemory, LSHIndex
+
+
+class TestHashingEmbedder(unittest.TestCase):
+    def test_embed(self):
+        embedder = HashingEmbedder(dimension=64)
+        vectors = asyncio.run(
+            embedder.embed(
+                [
+                    "Blocked by a wall to the north",
+                    "Blocked by a wall to the north",
+                    "Picked up a battery from the crate",
+                ]
+            )
+        )
+
+        self.assertEqual(vectors.shape, (3, 64))
+        self.assertEqual(vectors.dtype, np.float32)
+        np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1.0, rtol=1e-5)
+        np.testing.assert_array_equal(vectors[0], vectors[1])
+        self.assertLess(vectors[0] @ vectors[2], 0.5)
+        self.assertEqual(asyncio.run(embedder.embed([])).shape, (0, 64))
+
+
+class TestLSHIndex(unittest.TestCase):
+    def test_query(self):
+        rng = np.random.default_rng(1)
+        vectors = rng.standard_normal((500, 32)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        index = LSHIndex(32, num_tables=8, num_bits=8)
+        index.add(list(range(len(vectors))), vectors)
+
+        # A slightly perturbed vector finds its origin among far fewer candidates
+        query = vectors[42] + 0.05 * rng.standard_normal(32).astype(np.float32)
+        candidates = index.query(query / np.linalg.norm(query))
+        self.assertIn(42, candidates)
+        self.assertLess(len(candidates), len(vectors))
+
+
+class TestEpisodicMemory(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.embedder = HashingEmbedder(dimension=128)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def add_episodes(self, memory: EpisodicMemory):
+        texts = [
+            "Moved north 10m, blocked by a rock wall",
+            "Talked to the engineer about the broken antenna",
+            "Collected a power cell near the crashed shuttle",
+            "Moved east 20m along the canyon floor",
+        ]
+        for step, text in enumerate(texts):
+            asyncio.run(memory.add(text, step=step))
+
+    def test_search(self):
+        memory = EpisodicMemory(self.temp_dir.name, self.embedder)
+        self.assertEqual(asyncio.run(memory.search("anything")), [])
+        self.add_episodes(memory)
+
+        results = asyncio.run(memory.search("where can I find a power cell", k=2))
+        self.assertLessEqual(len(results), 2)
+        score, episode = results[0]
+        self.assertEqual(episode["step"], 2)
+        self.assertGreater(score, 0)
+        self.assertEqual(
+            [score for score, _ in results],
+            sorted([score for score, _ in results], reverse=True),
+        )
+
+    def test_reload(self):
+        memory = EpisodicMemory(self.temp_dir.name, self.embedder)
+        self.add_episodes(memory)
+
+        reloaded = EpisodicMemory(self.temp_dir.name, self.embedder)
+        self.assertEqual(reloaded.episodes, memory.episodes)
+        np.testing.assert_array_equal(reloaded.vectors, memory.vectors)
+
+        # Another embedder keeps its own files
+        other = EpisodicMemory(self.temp_dir.name, HashingEmbedder(dimension=64))
+        self.assertEqual(len(other), 0)
+
+    def test_partial_record(self):
+        memory = EpisodicMemory(self.temp_dir.name, self.embedder)
+        self.add_episodes(memory)
+
+        # Crash after writing the vector but only part of the episode line
+        with open(memory.vectors_file, "ab") as f:
+            f.write(np.ones(128, dtype=np.float32).tobytes())
+        with open(memory.episodes_file, "ab") as f:
+            f.write(b'{"text":"Moved')
+
+        reloaded = EpisodicMemory(self.temp_dir.name, self.embedder)
+        self.assertEqual(len(reloaded), 4)
+        self.assertEqual(os.path.getsize(memory.vectors_file), 4 * 128 * 4)
+
+        asyncio.run(reloaded.add("Moved south 5m", step=4))
+        reloaded = EpisodicMemory(self.temp_dir.name, self.embedder)
+        self.assertEqual(reloaded.episodes[-1], {"text": "Moved south 5m", "step": 4})
+
+
+if __name__ == "__main__":
+    unittest.main()
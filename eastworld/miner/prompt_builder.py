@@ -0,0 +1,62 @@
+# The MIT License (MIT)
+# Copyright © 2025 Eastworld AI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import hashlib
+import json
+from typing import Any, Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+def content_version(content: Any) -> str:
+    """Stable digest of JSON serialisable content, to version a prompt section"""
+    data = json.dumps(content, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(data.encode(), digest_size=16).hexdigest()
+
+
+class PromptBuilder:
+    """
+    Cache of rendered prompt sections keyed by the version of their content. A
+    section is rendered again only when its version changes, so the sections
+    shared by the graph nodes are built once per change rather than once per
+    node and step.
+    """
+
+    def __init__(self):
+        self._sections: dict[str, tuple[Hashable, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def section(self, name: str, version: Hashable, render: Callable[[], T]) -> T:
+        """Rendered section `name`, rendered by `render` if `version` changed"""
+        cached = self._sections.get(name)
+        if cached is not None and cached[0] == version:
+            self.hits += 1
+            return cached[1]
+
+        self.misses += 1
+        value = render()
+        self._sections[name] = (version, value)
+        return value
+
+    def invalidate(self, name: str | None = None):
+        """Drop a cached section, or all of them"""
+        if name is None:
+            self._sections.clear()
+        else:
+            self._sections.pop(name, None)
@@ -15,10 +15,14 @@
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 
+import asyncio
+import contextlib
 import json
 import math
 import os
 import random
+import threading
+import time
 import traceback
 from typing import Annotated, TypedDict
 
@@ -30,18 +34,63 @@ from langgraph.graph import END, START, StateGraph
 from langgraph.graph.state import CompiledStateGraph
 
 from eastworld.base.miner import BaseMinerNeuron
-from eastworld.miner.slam.grid import ANONYMOUS_NODE_PREFIX
+from eastworld.miner.memory.embeddings import Embedder, HashingEmbedder
+from eastworld.miner.memory.episodic import EpisodicMemory
+from eastworld.miner.prompt_builder import PromptBuilder
 from eastworld.miner.slam.isam import ISAM2
 from eastworld.protocol import Observation
 
 SENSOR_MAX_RANGE = 50.0
 
+# Poses kept in the SLAM optimization window
+SLAM_SMOOTHER_LAG = 200.0
+
+# Deadlines of the LLM graph nodes in seconds. A node past its deadline is
+# cancelled and reported as an error, the step then falls back to `maze_run`.
+NODE_DEADLINES = {
+    "Landmark Annotation": 8.0,
+    "After-Action Review": 8.0,
+    "Action Selection": 8.0,
+}
+
+# Objectives are reevaluated in the background every this many steps, action
+# selection uses the latest goals and plans available
+OBJECTIVE_REEVALUATION_INTERVAL = 5
+OBJECTIVE_REEVALUATION_DEADLINE = 30.0
+
+# Seconds kept from the synapse timeout to send the response back, the LLM graph
+# gets the rest of the budget before the local policy answers instead
+FORWARD_RESPONSE_MARGIN = 2.0
+
+# Seconds between the background writes of the agent memory file
+MEMORY_FLUSH_INTERVAL = 10.0
+
+# Past experiences retrieved from the episodic memory into the action prompt
+EPISODIC_MEMORY_TOP_K = 3
+
 
 class JSONFileMemory:
+    """
+    Agent memory persisted to a JSON file. Mutations mark the memory dirty and a
+    background task writes it behind every `flush_interval` seconds, `save` writes
+    the pending changes right away (e.g. on shutdown). Each entry has a version
+    counter, bumped on change, for caches of what is derived from it. Mutations
+    and encoding hold `lock`, so `save` can be called from another thread.
+    """
+
     memory: dict
 
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, flush_interval: float = MEMORY_FLUSH_INTERVAL):
         self.file_path = file_path
+        self.flush_interval = flush_interval
+
+        self.dirty = False
+        self.versions: dict[str, int] = {}
+        self._version = 0
+        self._saved_version = 0
+        self.lock = threading.RLock()
+        self._save_lock = threading.Lock()
+        self._flush_task: asyncio.Task | None = None
 
         self.memory = None
         if os.path.exists(self.file_path):
@@ -49,7 +98,12 @@ class JSONFileMemory:
                 with open(self.file_path, "r") as f:
                     self.memory = json.load(f)
             except json.JSONDecodeError:
-                bt.logging.error("Memory file corrupted, creating new memory")
+                # Keep the corrupted file for inspection instead of overwriting it
+                os.replace(self.file_path, self.file_path + ".corrupted")
+                bt.logging.error(
+                    f"Memory file corrupted, moved to {self.file_path}.corrupted "
+                    "and creating new memory"
+                )
 
         if self.memory is None:
             self.memory = {
@@ -59,15 +113,69 @@ class JSONFileMemory:
                 "logs": [],
             }
 
+    def touch(self, key: str):
+        """Mark a memory entry as changed"""
+        with self.lock:
+            self.versions[key] = self.versions.get(key, 0) + 1
+            self.dirty = True
+
+    def set(self, key: str, value):
+        with self.lock:
+            self.memory[key] = value
+            self.touch(key)
+
+    def _dump(self) -> tuple[int, str] | None:
+        """Encode the memory if it has pending changes"""
+        with self.lock:
+            if not self.dirty:
+                return None
+            self.dirty = False
+            self._version += 1
+            return self._version, json.dumps(self.memory, separators=(",", ":"))
+
+    def _write(self, version: int, data: str):
+        """Write an encoded memory atomically, unless a newer one is written"""
+        with self._save_lock:
+            if version <= self._saved_version:
+                return
+            tmp_file_path = self.file_path + ".tmp"
+            with open(tmp_file_path, "w") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file_path, self.file_path)
+            self._saved_version = version
+
     def save(self):
-        """Save memory to file"""
-        with open(self.file_path, "w") as f:
-            json.dump(self.memory, f, indent=2)
+        """Save pending changes to file"""
+        dump = self._dump()
+        if dump is not None:
+            self._write(*dump)
+
+    def start_flush(self):
+        """Start the background flush task on the running event loop"""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_periodically())
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            # Encode in the event loop, which owns the memory, write in a thread
+            dump = self._dump()
+            if dump is None:
+                continue
+            try:
+                await asyncio.to_thread(self._write, *dump)
+            except Exception as e:
+                bt.logging.error(f"Error saving memory: {e}")
+                self.dirty = True
 
     def push_reflection(self, reflection: str):
-        self.memory["reflections"].append(reflection)
-        if len(self.memory["reflections"]) > 20:
-            self.memory["reflections"] = self.memory["reflections"][-10:]
+        with self.lock:
+            self.memory["reflections"].append(reflection)
+            if len(self.memory["reflections"]) > 20:
+                self.memory["reflections"] = self.memory["reflections"][-10:]
+            self.touch("reflections")
 
     def push_log(self, action: str):
         log = {
@@ -75,11 +183,17 @@ class JSONFileMemory:
             "feedback": "",
             "repeat_times": 1,
         }
-        self.memory["logs"].append(log)
-        if len(self.memory["logs"]) > 100:
-            self.memory["logs"] = self.memory["logs"][-60:]
+        with self.lock:
+            self.memory["logs"].append(log)
+            self.touch("logs")
+            if len(self.memory["logs"]) > 100:
+                self.memory["logs"] = self.memory["logs"][-60:]
 
     def update_log(self, feedback: str):
+        with self.lock:
+            self._update_log(feedback)
+
+    def _update_log(self, feedback: str):
         if not self.memory["logs"]:
             # Miner may have restarted and the last action is lost
             return
@@ -89,6 +203,7 @@ class JSONFileMemory:
             # The last log already has feedback, unexpected behavior
             return
         last_log["feedback"] = feedback.strip()
+        self.touch("logs")
 
         # Try to merge the last two logs if they are the same
         if len(self.memory["logs"]) < 2:
@@ -108,6 +223,8 @@ class AgentState(TypedDict):
     navigation_locations: Annotated[list[str], lambda a, b: b or a]
     reflection: Annotated[str, lambda a, b: b or a]
     action: Annotated[dict, lambda a, b: b or a]
+    selected_action: Annotated[dict, lambda a, b: b or a]
+    situation: Annotated[str, lambda a, b: b or a]
     errors: Annotated[set[str], lambda a, b: a.union(b)]
 
 
@@ -129,22 +246,47 @@ class SeniorAgent(BaseMinerNeuron):
     slam: ISAM2
     llm: openai.AsyncOpenAI
     memory: JSONFileMemory
+    episodic_memory: EpisodicMemory
 
     local_action_space: list[dict] = []
 
     def __init__(
-        self, config=None, slam_data: str = None, memory_file_path: str = "memory.json"
+        self,
+        config=None,
+        slam_data: str = None,
+        memory_file_path: str = "memory.json",
+        episodic_memory_dir: str = "episodic_memory",
+        embedder: Embedder | None = None,
     ):
         super(SeniorAgent, self).__init__(config=config)
         self.uid = self.metagraph.hotkeys.index(self.wallet.hotkey.ss58_address)
         self.step = 0
+        # The LLM graph run of a step may outlive its deadline, its selected action
+        # (and the situation it was selected in) is then executed in the next step
+        self.graph_task: asyncio.Task | None = None
+        self.graph_late = False
+        self.late_action: tuple[dict, str] | None = None
 
         self.graph = self._build_graph()
 
+        # SLAM steps are integrated in a background thread, so responses never wait
+        # for the factor graph optimization or saving. Old poses are marginalised
+        # by a fixed-lag smoother, so the optimization cost stays flat.
         if slam_data is None:
-            self.slam = ISAM2(load_data=False, data_dir="slam_data")
+            self.slam = ISAM2(
+                load_data=False,
+                data_dir="slam_data",
+                background=True,
+                smoother_lag=SLAM_SMOOTHER_LAG,
+            )
         else:
-            self.slam = ISAM2(load_data=True, data_dir=slam_data)
+            self.slam = ISAM2(
+                load_data=True,
+                data_dir=slam_data,
+                background=True,
+                smoother_lag=SLAM_SMOOTHER_LAG,
+            )
+        self.slam.start()
 
         self.llm = openai.AsyncOpenAI(timeout=10)
         self.model_small = "gemini-2.0-flash-lite"
@@ -152,7 +294,12 @@ class SeniorAgent(BaseMinerNeuron):
         self.model_large = "gemini-2.0-flash"
 
         prompt_dir = "eastworld/miner/prompts"
+        self.prompts = PromptBuilder()
+        # Action space list the cached action space section was rendered from
+        self._cached_action_space: list | None = None
         self.landmark_annotation_step = 0
+        self.objective_reevaluation_step = -OBJECTIVE_REEVALUATION_INTERVAL
+        self.objective_reevaluation_task: asyncio.Task | None = None
         self.landmark_annotation_prompt = PromptTemplate.from_file(
             os.path.join(prompt_dir, "senior_landmark_annotation.txt")
         )
@@ -172,6 +319,12 @@ class SeniorAgent(BaseMinerNeuron):
         self.memory = JSONFileMemory(memory_file_path)
         if not self.memory.memory["goals"]:
             self._init_memory()
+        # Past situations, actions and outcomes, retrieved by similarity. Pass an
+        # `OpenAIEmbedder(self.llm)` for model embeddings instead of local hashing.
+        self.episodic_memory = EpisodicMemory(
+            episodic_memory_dir, embedder or HashingEmbedder()
+        )
+        self.episode_situation: str | None = None
 
         with open("eastworld/miner/local_actions.json", "r") as f:
             self.local_action_space = json.load(f)
@@ -183,16 +336,18 @@ class SeniorAgent(BaseMinerNeuron):
     def _build_graph(self) -> CompiledStateGraph:
         graph_builder = StateGraph(AgentState)
 
-        graph_builder.add_node("Localization & Mapping", self.localization_mapping)
-        graph_builder.add_node("Perception", self.perception)
-        graph_builder.add_node("Landmark Annotation", self.landmark_annotation)
-
-        graph_builder.add_node("After-Action Review", self.after_action_review)
-        graph_builder.add_node("Grounding & Learning", self.grounding_learning)
-        graph_builder.add_node("Objective Reevaluation", self.objective_reevaluation)
-        graph_builder.add_node("Action Selection", self.action_selection)
-
-        graph_builder.add_node("Action Execution", self.action_execution)
+        nodes = {
+            "Localization & Mapping": self.localization_mapping,
+            "Perception": self.perception,
+            "Landmark Annotation": self.landmark_annotation,
+            "After-Action Review": self.after_action_review,
+            "Grounding & Learning": self.grounding_learning,
+            "Objective Reevaluation": self.objective_reevaluation,
+            "Action Selection": self.action_selection,
+            "Action Execution": self.action_execution,
+        }
+        for name, node in nodes.items():
+            graph_builder.add_node(name, self._with_deadline(name, node))
 
         graph_builder.add_edge(START, "Localization & Mapping")
         graph_builder.add_edge("Localization & Mapping", "Perception")
@@ -200,51 +355,170 @@ class SeniorAgent(BaseMinerNeuron):
         graph_builder.add_edge("Landmark Annotation", END)
         graph_builder.add_edge("Perception", "After-Action Review")
         graph_builder.add_edge("After-Action Review", "Grounding & Learning")
-        graph_builder.add_edge("After-Action Review", "Objective Reevaluation")
         graph_builder.add_edge("Grounding & Learning", END)
-        graph_builder.add_edge("Objective Reevaluation", "Action Selection")
+        # Objective reevaluation only starts a background task, it is off the
+        # critical path of action selection
+        graph_builder.add_edge("After-Action Review", "Objective Reevaluation")
+        graph_builder.add_edge("Objective Reevaluation", END)
+        graph_builder.add_edge("After-Action Review", "Action Selection")
         graph_builder.add_edge("Action Selection", "Action Execution")
         graph_builder.add_edge("Action Execution", END)
 
         return graph_builder.compile()
 
+    def _with_deadline(self, name: str, node):
+        """Wrap a graph node to cancel it past its deadline in `NODE_DEADLINES`"""
+        deadline = NODE_DEADLINES.get(name)
+        if deadline is None:
+            return node
+
+        async def run(state: AgentState) -> AgentState:
+            task = asyncio.ensure_future(node(state))
+            try:
+                done, _ = await asyncio.wait({task}, timeout=deadline)
+            except asyncio.CancelledError:
+                task.cancel()
+                raise
+            if done:
+                return task.result()
+
+            # Nodes return their state from `finally`, which also swallows the
+            # cancellation, so the timeout is reported here and not by `wait_for`
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+            bt.logging.error(f"{name} missed its deadline of {deadline}s")
+            state["errors"].add(f"{name} Timeout")
+            return state
+
+        return run
+
     def _init_memory(self):
-        self.memory.memory["goals"] = [
-            "Work alongside your team to accomplish critical objectives",
-            "Venture deep into the uncharted canyon to scavenge vital components for your mothership's repairs",
-        ]
-        self.memory.memory["plans"] = [
-            "Talk to your team to understand the current situation and the objectives",
-            "Explore unknown areas to supplement data for navigation systems",
-        ]
+        self.memory.set(
+            "goals",
+            [
+                "Work alongside your team to accomplish critical objectives",
+                "Venture deep into the uncharted canyon to scavenge vital components for your mothership's repairs",
+            ],
+        )
+        self.memory.set(
+            "plans",
+            [
+                "Talk to your team to understand the current situation and the objectives",
+                "Explore unknown areas to supplement data for navigation systems",
+            ],
+        )
 
     async def forward(self, synapse: Observation) -> Observation:
         self.step += 1
-        config = RunnableConfig(
-            configurable={"thread_id": f"step_{self.uid}_{self.step}"}
-        )
-        state = await self.graph.ainvoke(
-            AgentState(observation=synapse, errors=set()), config
-        )
+        budget = self._forward_budget(synapse)
+        state = AgentState(observation=synapse, errors=set())
+
+        if self.graph_task is not None and not self.graph_task.done():
+            # The LLM graph of a previous step is still running, only feed SLAM
+            bt.logging.warning("LLM Graph is busy, skip to the local policy")
+            await self.localization_mapping(state)
+            state["errors"].add("LLM Graph Busy")
+        else:
+            config = RunnableConfig(
+                configurable={"thread_id": f"step_{self.uid}_{self.step}"}
+            )
+            self.graph_late = False
+            self.graph_task = asyncio.create_task(self.graph.ainvoke(state, config))
+            try:
+                state = await asyncio.wait_for(asyncio.shield(self.graph_task), budget)
+            except asyncio.TimeoutError:
+                bt.logging.warning(f"LLM Graph missed the deadline of {budget:.1f}s")
+                # The run goes on to select an action for the next step, without
+                # executing it for this one
+                self.graph_late = True
+                self.graph_task.add_done_callback(self._keep_late_action)
+                state = AgentState(observation=synapse, errors={"LLM Graph Timeout"})
+
         if state["errors"]:
             bt.logging.error(
-                f"Errors in LLM Graph: {len(state['errors'])}. Fallback to random walk"
+                f"Errors in LLM Graph: {len(state['errors'])}. Fallback to local policy"
             )
-            direction, distance = self.maze_run(synapse)
-            action = {
-                "name": "move_in_direction",
-                "arguments": {"direction": direction, "distance": distance},
-            }
+            action = await self._local_policy(synapse)
         else:
+            self.late_action = None
             action = state["action"]
+            if state.get("selected_action"):
+                self._record_action(state["selected_action"], state.get("situation"))
 
-        self.memory.save()
+        # The memory is written behind by a background task, off the request path
+        self.memory.start_flush()
 
         bt.logging.info(f">> Agent Action: {action}")
         synapse.action = [action]
         return synapse
 
-    def localization_mapping(self, state: AgentState) -> AgentState:
+    def stop_run_thread(self):
+        super().stop_run_thread()
+        # Integrate the queued SLAM steps and snapshot them before the worker exits
+        self.slam.flush()
+        self.slam.stop()
+        with self.slam.lock:
+            self.slam.save()
+        # Write the memory changes not flushed by the background task yet, the
+        # memory lock keeps requests still being handled out while it is encoded
+        self.memory.save()
+
+    def _forward_budget(self, synapse: Observation) -> float:
+        """Seconds left to answer the synapse before the validator times out"""
+        budget = synapse.timeout - FORWARD_RESPONSE_MARGIN
+        if synapse.dendrite is not None and synapse.dendrite.nonce:
+            # The dendrite nonce is the request time in nanoseconds
+            elapsed = time.time() - synapse.dendrite.nonce / 1e9
+            if 0 < elapsed < budget:
+                budget -= elapsed
+        return max(budget, 0.0)
+
+    def _keep_late_action(self, task: asyncio.Task):
+        """Keep the action selected by an LLM graph run that finished too late"""
+        if task.cancelled() or task.exception() is not None:
+            return
+        state = task.result()
+        if not state["errors"] and state.get("selected_action"):
+            self.late_action = (state["selected_action"], state.get("situation"))
+
+    def _record_action(self, action: dict, situation: str | None):
+        """
+        Log an LLM action returned to the validator, its feedback comes with the next
+        observation and makes an episode of the situation it was selected in
+        """
+        self.episode_situation = situation
+        self.memory.push_log(
+            f"{action['name']}, "
+            + ", ".join([f"{k}: {v}" for k, v in action["arguments"].items()])
+        )
+
+    async def _local_policy(self, synapse: Observation) -> dict:
+        """Action of the step when the LLM graph fails or misses the deadline"""
+        late_action, self.late_action = self.late_action, None
+        if late_action:
+            action, situation = late_action
+            bt.logging.info(f"Execute late LLM action: {action}")
+            try:
+                executed = await asyncio.wait_for(
+                    self.execute_action(synapse, action),
+                    self._forward_budget(synapse),
+                )
+                self._record_action(action, situation)
+                return executed
+            except Exception as e:
+                bt.logging.error(f"Late Action Execution Error: {e}")
+
+        # Moves of the local policy are not logged, their feedback is dropped
+        self.episode_situation = None
+
+        direction, distance = self.maze_run(synapse)
+        return {
+            "name": "move_in_direction",
+            "arguments": {"direction": direction, "distance": distance},
+        }
+
+    async def localization_mapping(self, state: AgentState) -> AgentState:
         bt.logging.debug(">> Localization & Mapping")
         try:
             synapse: Observation = state["observation"]
@@ -267,23 +541,13 @@ class SeniorAgent(BaseMinerNeuron):
                     bt.logging.debug(
                         f"SLAM: {lidar_data} {odometry} {odometry_direction}"
                     )
-                    self.slam.run_iteration(lidar_data, odometry, odometry_direction)
-
-                    x, y, theta = self.slam.get_current_pose()
-                    bt.logging.debug(f"SLAM: Update Navigation Topology: {x} {y}")
-                    self.slam.grid_map.update_nav_topo(
-                        self.slam.pose_index, x, y, allow_isolated=True
-                    )
+                    self.slam.submit(lidar_data, odometry, odometry_direction)
+                    self.slam.schedule(self._update_nav_topo)
                 except Exception as e:
                     bt.logging.error(f"SLAM Error: {e}")
                     traceback.print_exc()
 
-            nav_nodes_labeled_all = [
-                f"{node_id} : {node_data[3]}"
-                for node_id, node_data in self.slam.grid_map.nav_nodes.items()
-                if not node_id.startswith(ANONYMOUS_NODE_PREFIX)
-            ]
-            state["navigation_locations"] = nav_nodes_labeled_all
+            state["navigation_locations"] = self._navigation_locations()
         except Exception as e:
             bt.logging.error(f"Localization & Mapping Error: {e}")
             traceback.print_exc()
@@ -291,6 +555,67 @@ class SeniorAgent(BaseMinerNeuron):
         finally:
             return state
 
+    def _nav_version(self) -> tuple[int, int]:
+        # The grid map is replaced when SLAM data is loaded
+        grid_map = self.slam.grid_map
+        return id(grid_map), grid_map.nav_version
+
+    def _navigation_locations(self) -> list[str]:
+        """Labeled navigation nodes and their descriptions"""
+        # Snapshot the registry, the SLAM worker may be adding nodes meanwhile
+        return self.prompts.section(
+            "navigation_locations",
+            self._nav_version(),
+            lambda: [
+                f"{node_id} : {node_desc}"
+                for node_id, node_desc in list(self.slam.grid_map.labeled_nodes.items())
+            ],
+        )
+
+    def _navigation_section(self) -> str:
+        """Labeled navigation nodes as a prompt list"""
+        return self.prompts.section(
+            "navigation_section",
+            self._nav_version(),
+            lambda: "\n".join([f"  - {x}" for x in self._navigation_locations()]),
+        )
+
+    def _memory_section(self, key: str, prefix: str = "  - ") -> str:
+        """Memory entry as a prompt list, rendered again once the entry changes"""
+        return self.prompts.section(
+            f"memory_{key}_{prefix}",
+            self.memory.versions.get(key, 0),
+            lambda: "\n".join([f"{prefix}{x}" for x in self.memory.memory[key]]),
+        )
+
+    def _action_space_section(self, synapse: Observation) -> str:
+        """
+        Names and descriptions of the available actions as a prompt list. Keyed by
+        the identity of the action space list, which the nodes of a step share, so
+        the key costs nothing compared to rendering.
+        """
+        action_space = synapse.action_space
+
+        def render() -> str:
+            # Keep the keyed list alive, so its id is not reused by another list
+            self._cached_action_space = action_space
+            return "".join(
+                [
+                    f"  - {act['function']['name']}: {act['function']['description']}\n"
+                    for act in [*action_space, *self.local_action_space]
+                ]
+            )
+
+        return self.prompts.section(
+            "action_space", (id(action_space), len(action_space)), render
+        )
+
+    def _update_nav_topo(self, slam: ISAM2):
+        """Add the latest SLAM pose to the navigation topology"""
+        x, y = slam.current_x, slam.current_y
+        bt.logging.debug(f"SLAM: Update Navigation Topology: {x} {y}")
+        slam.grid_map.update_nav_topo(slam.pose_index, x, y, allow_isolated=True)
+
     async def perception(self, state: AgentState) -> AgentState:
         bt.logging.debug(">> Perception")
         # Extract entities from `Observation.Perception` (or vision image), etc.
@@ -310,12 +635,15 @@ class SeniorAgent(BaseMinerNeuron):
             self.landmark_annotation_step = self.step
 
             x, y, theta = self.slam.get_current_pose()
-            nav_nodes = self.slam.grid_map.get_nav_nodes(x, y, 40.0)
-            nav_nodes_labeled = [
-                node_id
-                for node_id in nav_nodes
-                if not node_id.startswith(ANONYMOUS_NODE_PREFIX)
-            ]
+            pose_index = self.slam.latest_pose_index
+            nav_nodes, nav_nodes_labeled = await asyncio.wrap_future(
+                self.slam.call(
+                    lambda slam: (
+                        slam.grid_map.get_nav_nodes(x, y, 40.0),
+                        slam.grid_map.get_nav_nodes(x, y, 40.0, labeled_only=True),
+                    )
+                )
+            )
 
             prompt_context = {
                 "x": f"{x:.2f}",
@@ -323,9 +651,7 @@ class SeniorAgent(BaseMinerNeuron):
                 "anonymous_landmark_count": len(nav_nodes) - len(nav_nodes_labeled),
                 "labeled_landmark_count": len(nav_nodes_labeled),
                 "labeled_landmark_list": ", ".join(nav_nodes_labeled),
-                "labeled_landmark_all": "\n".join(
-                    [f"  - {k}" for k in state["navigation_locations"]]
-                ),
+                "labeled_landmark_all": self._navigation_section(),
                 "sensor_readings": "\n".join(
                     [f"  - {', '.join(items)}" for items in synapse.sensor.lidar]
                 ),
@@ -344,13 +670,15 @@ class SeniorAgent(BaseMinerNeuron):
             node_id = node_data[0].strip()
             node_desc = node_data[1].strip() if len(node_data) > 1 else ""
             if node_id != "NA":
-                self.slam.grid_map.update_nav_topo(
-                    self.slam.pose_index,
-                    x,
-                    y,
-                    node_id=node_id,
-                    node_desc=node_desc,
-                    allow_isolated=True,
+                self.slam.schedule(
+                    lambda slam: slam.grid_map.update_nav_topo(
+                        pose_index,
+                        x,
+                        y,
+                        node_id=node_id,
+                        node_desc=node_desc,
+                        allow_isolated=True,
+                    )
                 )
         except Exception as e:
             bt.logging.error(f"Landmark Annotation Error: {e}")
@@ -382,15 +710,9 @@ class SeniorAgent(BaseMinerNeuron):
                 )
                 recent_action_log += f"\n  - Log {idx + 1}\n    Action: {l['action']} {repeat_str}\n    Result: {l['feedback']}"
 
-            action_space = ""
-            for act in [*synapse.action_space, *self.local_action_space]:
-                action_space += (
-                    f"  - {act['function']['name']}: {act['function']['description']}\n"
-                )
-
             prompt_context = {
-                "goals": "\n".join([f"  - {x}" for x in self.memory.memory["goals"]]),
-                "plans": "\n".join([f"  - {x}" for x in self.memory.memory["plans"]]),
+                "goals": self._memory_section("goals"),
+                "plans": self._memory_section("plans"),
                 "sensor_readings": "\n".join(
                     [f"  - {', '.join(items)}" for items in synapse.sensor.lidar]
                 ),
@@ -405,10 +727,8 @@ class SeniorAgent(BaseMinerNeuron):
                         for item in synapse.items
                     ]
                 ),
-                "navigation_locations": "\n".join(
-                    [f"  - {x}" for x in state["navigation_locations"]]
-                ),
-                "action_space": action_space,
+                "navigation_locations": self._navigation_section(),
+                "action_space": self._action_space_section(synapse),
                 "recent_reflections": recent_reflections,
                 "recent_action_log": recent_action_log,
             }
@@ -435,49 +755,87 @@ class SeniorAgent(BaseMinerNeuron):
         if state["errors"]:
             return state
 
-        # TODO: Implement grounding and learning with LancerDB or Chroma
-        return state
+        try:
+            # Record the outcome of the last selected action as an episode
+            situation, self.episode_situation = self.episode_situation, None
+            logs = self.memory.memory["logs"]
+            if situation is None or not logs or not logs[-1]["feedback"]:
+                return state
+
+            action, feedback = logs[-1]["action"], logs[-1]["feedback"]
+            await self.episodic_memory.add(
+                f"Situation: {situation}\nAction: {action}\nResult: {feedback}",
+                step=self.step,
+                action=action,
+                feedback=feedback,
+            )
+        except Exception as e:
+            bt.logging.error(f"Grounding & Learning Error: {e}")
+            traceback.print_exc()
+        finally:
+            return state
 
     async def objective_reevaluation(self, state: AgentState) -> AgentState:
         bt.logging.debug(">> Objective Reevaluation")
         if state["errors"]:
             return state
 
-        try:
-            synapse: Observation = state["observation"]
+        if (
+            self.objective_reevaluation_task is not None
+            and not self.objective_reevaluation_task.done()
+        ) or (
+            self.step - self.objective_reevaluation_step
+            < OBJECTIVE_REEVALUATION_INTERVAL
+        ):
+            return state
+
+        self.objective_reevaluation_step = self.step
+        self.objective_reevaluation_task = asyncio.create_task(
+            self._reevaluate_objectives(state["reflection"])
+        )
+        return state
 
+    async def _reevaluate_objectives(self, reflection: str):
+        """Update the goals and plans in memory, run as a background task"""
+        try:
             prompt_context = {
-                "goals": "\n".join(self.memory.memory["goals"]),
-                "plans": "\n".join(self.memory.memory["plans"]),
-                "reflection": state["reflection"],
+                "goals": self._memory_section("goals", prefix=""),
+                "plans": self._memory_section("plans", prefix=""),
+                "reflection": reflection,
             }
             prompt = self.objective_reevaluation_prompt.format(**prompt_context)
             bt.logging.debug(f"Objective Reevaluation Prompt: {prompt}")
-            response = await self.llm.chat.completions.create(
-                model=self.model_large,
-                messages=[{"role": "user", "content": prompt}],
+            response = await asyncio.wait_for(
+                self.llm.chat.completions.create(
+                    model=self.model_large,
+                    messages=[{"role": "user", "content": prompt}],
+                ),
+                OBJECTIVE_REEVALUATION_DEADLINE,
             )
 
             content = response.choices[0].message.content.strip().split("\n\n")
             bt.logging.debug(f"Objective Reevaluation Response: {content}")
             new_goals = content[0].split("\n")
             new_plans = content[1].split("\n")
-            self.memory.memory["goals"] = [
-                goal.strip()
-                for goal in new_goals
-                if goal.strip() and not goal.strip().startswith("#")
-            ]
-            self.memory.memory["plans"] = [
-                plan.strip()
-                for plan in new_plans
-                if plan.strip() and not plan.strip().startswith("#")
-            ]
+            self.memory.set(
+                "goals",
+                [
+                    goal.strip()
+                    for goal in new_goals
+                    if goal.strip() and not goal.strip().startswith("#")
+                ],
+            )
+            self.memory.set(
+                "plans",
+                [
+                    plan.strip()
+                    for plan in new_plans
+                    if plan.strip() and not plan.strip().startswith("#")
+                ],
+            )
         except Exception as e:
             bt.logging.error(f"Objective Reevaluation Error: {e}")
             traceback.print_exc()
-            state["errors"].add(f"Objective Reevaluation Error: {e}")
-        finally:
-            return state
 
     async def action_selection(self, state: AgentState) -> AgentState:
         bt.logging.debug(">> Action Selection")
@@ -487,10 +845,23 @@ class SeniorAgent(BaseMinerNeuron):
         try:
             synapse: Observation = state["observation"]
 
+            situation = (
+                f"{synapse.perception.environment}\n{synapse.perception.objects}"
+            )
+            experiences = await self.episodic_memory.search(
+                f"{situation}\n{state['reflection']}", k=EPISODIC_MEMORY_TOP_K
+            )
+
             prompt_context = {
-                "goals": "\n".join([f"  - {x}" for x in self.memory.memory["goals"]]),
-                "plans": "\n".join([f"  - {x}" for x in self.memory.memory["plans"]]),
+                "goals": self._memory_section("goals"),
+                "plans": self._memory_section("plans"),
                 "reflection": state["reflection"],
+                "experiences": "\n".join(
+                    [
+                        f"  - Action: {episode['action']}\n    Result: {episode['feedback']}"
+                        for _, episode in experiences
+                    ]
+                ),
                 "sensor_readings": "\n".join(
                     [f"  - {', '.join(items)}" for items in synapse.sensor.lidar]
                 ),
@@ -504,9 +875,7 @@ class SeniorAgent(BaseMinerNeuron):
                         for item in synapse.items
                     ]
                 ),
-                "navigation_locations": "\n".join(
-                    [f"  - {x}" for x in state["navigation_locations"]]
-                ),
+                "navigation_locations": self._navigation_section(),
             }
             prompt = self.action_selection_prompt.format(**prompt_context)
             bt.logging.debug(f"Action Selection Prompt: {prompt}")
@@ -525,13 +894,10 @@ class SeniorAgent(BaseMinerNeuron):
                     "name": action.name,
                     "arguments": json.loads(action.arguments),
                 }
+                # Logged by `forward` once the action is actually returned
                 state["action"] = parsed_action
-                self.memory.push_log(
-                    f"{parsed_action['name']}, "
-                    + ", ".join(
-                        [f"{k}: {v}" for k, v in parsed_action["arguments"].items()]
-                    )
-                )
+                state["selected_action"] = parsed_action
+                state["situation"] = situation
         except Exception as e:
             bt.logging.error(f"Action Selection Error: {e}")
             traceback.print_exc()
@@ -539,10 +905,14 @@ class SeniorAgent(BaseMinerNeuron):
         finally:
             return state
 
-    def action_execution(self, state: AgentState) -> AgentState:
+    async def action_execution(self, state: AgentState) -> AgentState:
         bt.logging.debug(">> Action Execution")
         if state["errors"]:
             return state
+        if self.graph_late:
+            # The step was already answered, the selected action is executed in
+            # the next step against its observation
+            return state
 
         try:
             synapse: Observation = state["observation"]
@@ -550,28 +920,7 @@ class SeniorAgent(BaseMinerNeuron):
             action = state["action"]
             if not action:
                 bt.logging.error("No action to execute")
-                direction, distance = self.maze_run(synapse)
-
-                bt.logging.info(f"Direction: {direction}, Distance: {distance}")
-                state["action"] = {
-                    "name": "move_in_direction",
-                    "arguments": {"direction": direction, "distance": distance},
-                }
-                return state
-
-            if action["name"] == "explore_wall_following":
-                direction, distance = self.maze_run(synapse)
-                state["action"] = {
-                    "name": "move_in_direction",
-                    "arguments": {"direction": direction, "distance": distance},
-                }
-            elif action["name"] == "navigate_to":
-                target = action["arguments"].get("target")
-                direction, distance = self.navigate_to(synapse, target)
-                state["action"] = {
-                    "name": "move_in_direction",
-                    "arguments": {"direction": direction, "distance": distance},
-                }
+            state["action"] = await self.execute_action(synapse, action)
         except Exception as e:
             bt.logging.error(f"Action Execution Error: {e}")
             traceback.print_exc()
@@ -579,6 +928,22 @@ class SeniorAgent(BaseMinerNeuron):
         finally:
             return state
 
+    async def execute_action(self, synapse: Observation, action: dict | None) -> dict:
+        """Turn the local actions into a `move_in_direction` action"""
+        if not action or action["name"] == "explore_wall_following":
+            direction, distance = self.maze_run(synapse)
+        elif action["name"] == "navigate_to":
+            target = action["arguments"].get("target")
+            direction, distance = await self.navigate_to(synapse, target)
+        else:
+            return action
+
+        bt.logging.info(f"Direction: {direction}, Distance: {distance}")
+        return {
+            "name": "move_in_direction",
+            "arguments": {"direction": direction, "distance": distance},
+        }
+
     def random_walk(self, synapse: Observation) -> tuple[str, float]:
         weights = [1] * len(self.directions)
 
@@ -641,16 +1006,17 @@ class SeniorAgent(BaseMinerNeuron):
         self.maze_run_explore_direction = choice
         return choice, distance
 
-    def navigate_to(self, synapse: Observation, target_node: str) -> tuple[str, float]:
-        node = self.slam.grid_map.nav_nodes.get(target_node)
-        if node is None:
+    async def navigate_to(
+        self, synapse: Observation, target_node: str
+    ) -> tuple[str, float]:
+        # Path planning runs in the SLAM worker thread, which owns the grid map, so
+        # the event loop keeps serving other requests meanwhile
+        found, current_x, current_y, path = await asyncio.wrap_future(
+            self.slam.call(lambda slam: self._plan_path(slam, target_node))
+        )
+        if not found:
             bt.logging.error(f"Navigation target node {target_node} not found")
             return self.random_walk(synapse)
-
-        current_x, current_y, _ = self.slam.get_current_pose()
-        path = self.slam.grid_map.pose_navigation(
-            current_x, current_y, node[0], node[1]
-        )
         if path:
             next_node = path[1]
             direction = self._relative_direction(
@@ -664,6 +1030,16 @@ class SeniorAgent(BaseMinerNeuron):
             bt.logging.error(f"No path found to target node {target_node}")
             return self.random_walk(synapse)
 
+    def _plan_path(
+        self, slam: ISAM2, target_node: str
+    ) -> tuple[bool, float, float, list | None]:
+        node = slam.grid_map.nav_nodes.get(target_node)
+        current_x, current_y, _ = slam.get_current_pose()
+        if node is None:
+            return False, current_x, current_y, None
+        path = slam.grid_map.pose_navigation(current_x, current_y, node[1], node[2])
+        return True, current_x, current_y, path
+
     def _relative_direction(
         self, origin_x: float, origin_y: float, target_x: float, target_y: float
     ) -> str:
@@ -0,0 +1,259 @@
+# The MIT License (MIT)
+# Copyright © 2025 Eastworld AI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import collections
+import functools
+import math
+import threading
+
+import numpy as np
+
+SENSOR_MAX_RANGE = 50.0
+
+# Angle step of the beams interpolated around each lidar reading
+INTERPOLATION_STEP = 0.09
+
+# Angles of the eight lidar directions
+COMPASS_ANGLES = [i * np.pi / 4 for i in range(8)]
+
+# Maximum number of templates kept per kind, least recently used ones are evicted
+RAY_CACHE_SIZE = 65536
+READING_CACHE_SIZE = 16384
+SAMPLE_CACHE_SIZE = 16384
+
+
+@functools.lru_cache(maxsize=1024)
+def interpolation_offsets(distance: float) -> tuple[float, ...]:
+    """Angle offsets of the beams interpolated around a lidar reading"""
+    if distance <= 0:
+        return ()
+    t = np.arctan(2.0 / distance)
+    if t <= INTERPOLATION_STEP:
+        return ()
+    offsets = np.arange(INTERPOLATION_STEP, t, INTERPOLATION_STEP)
+    return (*offsets.tolist(), *(-offsets).tolist())
+
+
+def bresenham(x0: int, y0: int, x1: int, y1: int) -> list[tuple[int, int]]:
+    """Bresenham's algorithm implementation for ray tracing"""
+    points = []
+    dx = abs(x1 - x0)
+    dy = abs(y1 - y0)
+    sx = 1 if x0 < x1 else -1
+    sy = 1 if y0 < y1 else -1
+    err = dx - dy
+
+    while True:
+        points.append((x0, y0))
+        if x0 == x1 and y0 == y1:
+            break
+        e2 = 2 * err
+        if e2 > -dy:
+            err -= dy
+            x0 += sx
+        if e2 < dx:
+            err += dx
+            y0 += sy
+
+    return points
+
+
+class TemplateCache:
+    """
+    Bounded LRU cache of beam templates, safe to share between the SLAM thread and
+    the background save thread
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: collections.OrderedDict = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+class BeamTemplates:
+    """
+    Precomputed cell offsets of lidar beams relative to the sensor cell, for one map
+    resolution. Beam angles are quantised to `angle_bins` per turn, ranges to whole
+    meters (the precision of the lidar readings) and the sensor position inside its
+    cell to `cell_phases` steps per axis, so ray updates and raycasts become index
+    arithmetic on the sensor cell.
+    """
+
+    def __init__(self, resolution: float, angle_bins: int = 720, cell_phases: int = 4):
+        self.resolution = resolution
+        self.angle_bins = angle_bins
+        self.angle_step = 2 * np.pi / angle_bins
+        self.cell_phases = cell_phases
+
+        self._rays = TemplateCache(RAY_CACHE_SIZE)
+        self._readings = TemplateCache(READING_CACHE_SIZE)
+        self._samples = TemplateCache(SAMPLE_CACHE_SIZE)
+
+        # Build the eight lidar directions and their interpolated beams up front
+        phases = [i * resolution / cell_phases for i in range(cell_phases)]
+        for angle in COMPASS_ANGLES:
+            for distance in range(1, int(SENSOR_MAX_RANGE) + 2):
+                for offset in (0.0, *interpolation_offsets(float(distance))):
+                    for x in phases:
+                        for y in phases:
+                            self.ray(x, y, angle + offset, distance)
+
+    def _angle_bin(self, angle: float) -> int:
+        return round(angle / self.angle_step) % self.angle_bins
+
+    def _cell_phase(self, value: float) -> int:
+        return int(value / self.resolution % 1 * self.cell_phases)
+
+    def _end_offset(self, phase: int, length: float | np.ndarray):
+        """Cell offset of a point at `length` meters from a sensor at the cell phase"""
+        return np.floor(phase / self.cell_phases + length / self.resolution)
+
+    def ray(
+        self, x: float, y: float, angle: float, distance: float
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Cells crossed by a beam, from the sensor cell to the end point cell (inclusive)
+
+        Args:
+            x, y: World coordinates of the sensor
+            angle: Beam angle in radians
+            distance: Beam range in meters
+
+        Returns:
+            Arrays of x and y cell offsets relative to the sensor cell
+        """
+        key = (
+            self._angle_bin(angle),
+            round(distance),
+            self._cell_phase(x),
+            self._cell_phase(y),
+        )
+        template = self._rays.get(key)
+        if template is None:
+            angle_bin, length, phase_x, phase_y = key
+            quantised_angle = angle_bin * self.angle_step
+            end_x = int(self._end_offset(phase_x, length * math.cos(quantised_angle)))
+            end_y = int(self._end_offset(phase_y, length * math.sin(quantised_angle)))
+            points = np.array(bresenham(0, 0, end_x, end_y), dtype=np.intp)
+            template = (points[:, 0], points[:, 1])
+            self._rays.put(key, template)
+        return template
+
+    def reading(
+        self, x: float, y: float, angle: float, distance: float
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Cells crossed by a lidar reading, its beam and the beams interpolated around it
+
+        Args:
+            x, y: World coordinates of the sensor
+            angle: Reading angle in radians
+            distance: Reading range in meters
+
+        Returns:
+            Arrays of x and y cell offsets relative to the sensor cell, and a mask of
+            the beam end point cells
+        """
+        key = (
+            self._angle_bin(angle),
+            round(distance),
+            self._cell_phase(x),
+            self._cell_phase(y),
+        )
+        template = self._readings.get(key)
+        if template is None:
+            angle = key[0] * self.angle_step
+            rays = [
+                self.ray(x, y, angle + offset, distance)
+                for offset in (0.0, *interpolation_offsets(float(key[1])))
+            ]
+            ends = [np.zeros(len(offset_x), dtype=bool) for offset_x, _ in rays]
+            for end in ends:
+                end[-1] = True
+            template = (
+                np.concatenate([offset_x for offset_x, _ in rays]),
+                np.concatenate([offset_y for _, offset_y in rays]),
+                np.concatenate(ends),
+            )
+            self._readings.put(key, template)
+        return template
+
+    def samples(
+        self, x: float, y: float, angle: float, step: float, max_range: float
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Cells sampled at fixed distances along a beam
+
+        Args:
+            x, y: World coordinates of the sensor
+            angle: Beam angle in radians
+            step: Distance between samples in meters
+            max_range: Maximum sample distance (exclusive)
+
+        Returns:
+            Arrays of x and y cell offsets relative to the sensor cell, and the
+            sample distances
+        """
+        key = (
+            self._angle_bin(angle),
+            step,
+            max_range,
+            self._cell_phase(x),
+            self._cell_phase(y),
+        )
+        template = self._samples.get(key)
+        if template is None:
+            angle_bin, _, _, phase_x, phase_y = key
+            quantised_angle = angle_bin * self.angle_step
+            distances = np.arange(0, max_range, step)
+            offset_x = self._end_offset(phase_x, distances * math.cos(quantised_angle))
+            offset_y = self._end_offset(phase_y, distances * math.sin(quantised_angle))
+            template = (offset_x.astype(np.intp), offset_y.astype(np.intp), distances)
+            self._samples.put(key, template)
+        return template
+
+
+_templates: dict[float, BeamTemplates] = {}
+_templates_lock = threading.Lock()
+
+
+def get_beam_templates(resolution: float) -> BeamTemplates:
+    """Get the beam templates of a map resolution, built on first use"""
+    with _templates_lock:
+        templates = _templates.get(resolution)
+        if templates is None:
+            templates = BeamTemplates(resolution)
+            _templates[resolution] = templates
+        return templates
@@ -17,63 +17,58 @@
 
 import argparse
 import base64
-import io
 import json
+import os
 import pickle
 
 from flask import Flask, jsonify, render_template, send_from_directory
-import matplotlib
 import numpy as np
 
-matplotlib.use("Agg")  # Use non-interactive backend for plotting
-
-import matplotlib.pyplot as plt
-
 from eastworld.miner.slam.grid import ANONYMOUS_NODE_PREFIX, OccupancyGridMap
+from eastworld.miner.slam.render import BLUE, GREEN, ORANGE, RED, MapCanvas
 
 
-def visualize_gridmap(map: OccupancyGridMap, x, y: int):
-    fig, ax = plt.subplots(figsize=(80, 80))
-
-    # Base map
-    prob_map = 1 - 1 / (1 + np.exp(map.grid))
-    ax.imshow(prob_map, cmap="Greys", origin="lower")
+def visualize_gridmap(map: OccupancyGridMap, x, y: int, scale: int = 4) -> bytes:
+    canvas = MapCanvas(map.grid, scale)
 
     # Navigation topological
-    for node_id, (_, node_x, node_y, node_desc) in map.nav_nodes.items():
-        grid_x, grid_y = map.world_to_grid(node_x, node_y)
-        if node_id.startswith(ANONYMOUS_NODE_PREFIX):
-            ax.scatter(grid_x, grid_y, color="blue", s=100, marker="^", alpha=0.5)
-        else:
-            ax.scatter(grid_x, grid_y, color="orange", s=100, marker="*", alpha=0.5)
-    for node_id1, edges in map.nav_edges.items():
-        for node_id2 in edges.keys():
-            node_1 = map.nav_nodes[node_id1]
-            node_2 = map.nav_nodes[node_id2]
-            x1, y1 = map.world_to_grid(node_1[1], node_1[2])
-            x2, y2 = map.world_to_grid(node_2[1], node_2[2])
-            ax.plot([x1, x2], [y1, y2], color="green", alpha=0.5)
+    edges = [
+        (map.nav_nodes[node_id1], map.nav_nodes[node_id2])
+        for node_id1, node_edges in map.nav_edges.items()
+        for node_id2 in node_edges.keys()
+    ]
+    if edges:
+        x1s, y1s, x2s, y2s = np.array(
+            [
+                (*map.world_to_grid(n1[1], n1[2]), *map.world_to_grid(n2[1], n2[2]))
+                for n1, n2 in edges
+            ]
+        ).T
+        canvas.lines(x1s, y1s, x2s, y2s, GREEN, width=max(1, scale // 2), alpha=0.5)
+    for anonymous, color in ((True, BLUE), (False, ORANGE)):
+        nodes = [
+            map.world_to_grid(node_x, node_y)
+            for node_id, (_, node_x, node_y, _) in map.nav_nodes.items()
+            if node_id.startswith(ANONYMOUS_NODE_PREFIX) == anonymous
+        ]
+        if nodes:
+            grid_xs, grid_ys = np.array(nodes).T
+            canvas.points(grid_xs, grid_ys, color, radius=2 * scale, alpha=0.5)
 
     # Current position
     grid_x, grid_y = map.world_to_grid(x, y)
-    ax.scatter(grid_x, grid_y, color="red", s=300, marker="o")
+    canvas.points(grid_x, grid_y, RED, radius=3 * scale)
 
-    # Save as an image and return base64
-    buffer = io.BytesIO()
-    plt.savefig(buffer, format="png", bbox_inches="tight")
-    plt.close(fig)
-    buffer.seek(0)
-    image_png = buffer.getvalue()
-    buffer.close()
-    return image_png
+    return canvas.png()
 
 
 class SLAMConsoleServer:
-    def __init__(self, host="0.0.0.0", port=5000, data_dir="slam_data"):
+    def __init__(self, host="0.0.0.0", port=5000, data_dir="slam_data", scale=4):
         self.app = Flask(__name__)
         self.host = host
         self.port = port
         self.data_dir = data_dir
+        self.scale = scale
 
         self.setup_routes()
 
@@ -84,9 +79,13 @@ class SLAMConsoleServer:
 
         @self.app.route("/api/map/current")
         def get_current_map():
-            f = open(f"{self.data_dir}/map.pkl", "rb")
-            map = pickle.load(f)
-            f.close()
+            if os.path.exists(f"{self.data_dir}/map.npz"):
+                map = OccupancyGridMap.load_snapshot(f"{self.data_dir}/map.npz")
+            else:
+                # Map pickled by older versions
+                f = open(f"{self.data_dir}/map.pkl", "rb")
+                map = pickle.load(f)
+                f.close()
 
             f = open(f"{self.data_dir}/metadata.json", "r")
             metadata = json.load(f)
@@ -95,7 +94,8 @@ class SLAMConsoleServer:
             theta = metadata["theta"]
             f.close()
 
-            image_base64 = base64.b64encode(visualize_gridmap(map, x, y)).decode()
+            image = visualize_gridmap(map, x, y, scale=self.scale)
+            image_base64 = base64.b64encode(image).decode()
 
             return jsonify(
                 {
@@ -121,8 +121,9 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="SLAM Web Console")
     parser.add_argument("--port", type=int, default=5000)
     parser.add_argument("--data-dir", type=str, default="slam_data")
+    parser.add_argument("--scale", type=int, default=4, help="Pixels per map cell")
 
     args = parser.parse_args()
 
-    server = SLAMConsoleServer(port=args.port, data_dir=args.data_dir)
+    server = SLAMConsoleServer(port=args.port, data_dir=args.data_dir, scale=args.scale)
     server.run()
@@ -16,29 +16,52 @@
 # DEALINGS IN THE SOFTWARE.
 
 
+import collections
+import copy
 import concurrent.futures
 import gzip
-import io
+import itertools
 import lzma
-import math
 import os
 import pickle
 import random
 import time
+import zipfile
 from pathlib import Path
 
 import bittensor as bt
-import matplotlib
 import numpy as np
 
-matplotlib.use("Agg")  # Use non-interactive backend for plotting
-
-import matplotlib.pyplot as plt
-
+from eastworld.miner.slam.beams import get_beam_templates, interpolation_offsets
 from eastworld.miner.slam.grid import OccupancyGridMap
+from eastworld.miner.slam.render import GREEN, RED, MapCanvas
 
 SENSOR_MAX_RANGE = 50.0
 
+_particle_ids = itertools.count()
+
+# Saved state kinds and their state file suffixes
+STATE_KEYFRAME = 0
+STATE_DELTA = 1
+STATE_LEGACY = 2
+STATE_SUFFIXES = {
+    STATE_KEYFRAME: ".npz",
+    STATE_DELTA: ".delta.npz",
+    STATE_LEGACY: ".pkl.xz",
+}
+
+# Record of the append-only history index, one per saved state
+HISTORY_INDEX_DTYPE = np.dtype(
+    [
+        ("timestamp", "<f8"),
+        ("x", "<f8"),
+        ("y", "<f8"),
+        ("theta", "<f8"),
+        ("kind", "u1"),
+        ("size", "<u8"),
+    ]
+)
+
 
 class Particle:
     def __init__(
@@ -50,21 +73,80 @@ class Particle:
         map_width=1000,
         map_height=1000,
         resolution=2.0,
+        grid: np.ndarray | None = None,
     ):
+        self.id = next(_particle_ids)
+        # Id of the particle this one was resampled from
+        self.parent_id = None
         self.x = x
         self.y = y
         self.theta = theta
         self.weight = weight
         self.map = OccupancyGridMap(
-            width=map_width, height=map_height, resolution=resolution
+            width=map_width, height=map_height, resolution=resolution, grid=grid
         )
+        # Cell updates (flat grid indices, log-odds values) applied in the current step
+        self.deltas: list[tuple[np.ndarray, np.ndarray]] = []
+        # Count sketch of the map, see `FastSLAM._map_sketch`
+        self.sketch: np.ndarray | None = None
+        # Index of the ancestor in the last saved state and the flat grid indices
+        # changed since, see `FastSLAM.save`
+        self.saved_slot: int | None = None
+        self.history_cells: list[np.ndarray] = []
 
     def copy(self):
-        p = Particle(self.x, self.y, self.theta, self.weight)
-        p.map.grid = self.map.grid.copy()
+        p = Particle(
+            self.x,
+            self.y,
+            self.theta,
+            self.weight,
+            map_width=self.map.width,
+            map_height=self.map.height,
+            resolution=self.map.resolution,
+            grid=self.map.grid.copy(),
+        )
+        p.parent_id = self.id
+        if self.sketch is not None:
+            p.sketch = self.sketch.copy()
+        p.saved_slot = self.saved_slot
+        p.history_cells = list(self.history_cells)
         return p
 
 
+class HistoryEntry:
+    """
+    A saved SLAM state in the history. Built from the history index, the image and
+    state files are only read on access.
+    """
+
+    def __init__(self, record: np.void, state_dir: str, history_dir: str):
+        self.timestamp = float(record["timestamp"])
+        self.position = {
+            "x": float(record["x"]),
+            "y": float(record["y"]),
+            "theta": float(record["theta"]),
+        }
+        self.kind = int(record["kind"])
+        self.size = int(record["size"])
+        self.image_path = os.path.join(history_dir, f"{self.timestamp:.6f}.png.gz")
+        self.state_path = os.path.join(
+            state_dir, f"{self.timestamp:.6f}{STATE_SUFFIXES[self.kind]}"
+        )
+
+    def __getitem__(self, key: str):
+        # Dict style access of the history entries of older versions
+        return getattr(self, key)
+
+    def load_image(self) -> bytes:
+        """Load the PNG visualization of the state"""
+        with gzip.open(self.image_path, "rb") as f:
+            return f.read()
+
+    def load_state(self) -> dict:
+        """Load the state file, see `_load_state_file`"""
+        return _load_state_file(self.state_path)
+
+
 class FastSLAM:
     # Direction mapped to angles (radians) - corrected to north up, south down, west left, east right
     direction_to_angle = {
@@ -78,7 +160,15 @@ class FastSLAM:
         "northwest": 3 * np.pi / 4,  # 135 degrees - upper left
     }
 
-    def __init__(self, num_particles=200, load_data=False, data_dir="slam_data"):
+    def __init__(
+        self,
+        num_particles=200,
+        load_data=False,
+        data_dir="slam_data",
+        map_width=1000,
+        map_height=1000,
+        resolution=2.0,
+    ):
         """
         FastSLAM Initialization
 
@@ -86,14 +176,24 @@ class FastSLAM:
             num_particles: Number of particles to use
             load_data: Load historical data on initialization
             data_dir: Directory to store SLAM data
+            map_width: Width of each particle map in cells
+            map_height: Height of each particle map in cells
+            resolution: Map resolution in meters per cell
         """
         self.num_particles = num_particles
         self.data_dir = data_dir
         self.history_dir = os.path.join(data_dir, "history")
         self.state_dir = os.path.join(data_dir, "states")
-        self.history = []
+        self.history: list[HistoryEntry] = []
         self.history_base_index = 0
-        self.history_metadata = {"total": 0, "timestamps": [], "positions": []}
+        # Records of all saved states, see `HISTORY_INDEX_DTYPE`
+        self.history_index_file = os.path.join(data_dir, "history.idx")
+        self._history_index = np.zeros(0, dtype=HISTORY_INDEX_DTYPE)
+        # Save a full snapshot every `keyframe_interval` saves and only the changes
+        # in between, keep the history of the last `history_keyframes` keyframes
+        self.keyframe_interval = 10
+        self.history_keyframes = 20
+        self._save_count = 0
 
         self._save_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
         self._save_future = None
@@ -106,15 +206,43 @@ class FastSLAM:
                 x=np.random.normal(0, 60),
                 y=np.random.normal(0, 60),
                 theta=np.random.normal(-np.pi, np.pi),
+                map_width=map_width,
+                map_height=map_height,
+                resolution=resolution,
             )
             for _ in range(num_particles)
         ]
 
+        # Running weighted fusion of the top-k particle maps. The fused map is kept
+        # the exact mixture of its member particle maps with the member weights, so
+        # it differs from the mixture of the current top-k by at most
+        # 2 * drift * max |log-odds|, with drift the total variation distance of the
+        # two weightings. It is rebuilt when the drift exceeds the threshold.
+        self.fuse_top_k = 10
+        self.fuse_rebuild_threshold = 0.2
+        self.fused_map: OccupancyGridMap | None = None
+        self.fused_drift = 0.0
+        self._fused_weights: dict[int, float] = {}
+
+        # Inject particles around the best one when the particle set effectiveness
+        # drops below the threshold, checked every `injection_check_interval` iterations
+        # and at least `injection_cooldown` iterations after the previous injection
+        self.injection_threshold = 0.2
+        self.injection_check_interval = 1
+        self.injection_cooldown = 5
+        self._last_injection: int | None = None
+
+        # Number of buckets of the map sketches used to estimate map diversity
+        self.sketch_size = 4096
+        self._sketch_shape: tuple[int, int] | None = None
+        self._sketch_buckets: np.ndarray | None = None
+        self._sketch_signs: np.ndarray | None = None
+
         # Ensure data directories exist
         for directory in [self.data_dir, self.history_dir, self.state_dir]:
             os.makedirs(directory, exist_ok=True)
 
-        # Create history metadata file
+        # History metadata file of older versions
         self.metadata_file = os.path.join(self.data_dir, "history_metadata.pkl")
 
         # Motion model noise parameters
@@ -139,7 +267,9 @@ class FastSLAM:
 
     @property
     def grid_map(self):
-        return self.get_best_particle().map
+        if self.fused_map is None:
+            return self.get_best_particle().map
+        return self.fused_map
 
     def predict(self, odometry: float, orientation: str):
         """
@@ -191,15 +321,8 @@ class FastSLAM:
                 p.weight *= self.measurement_likelihood(p, angle, measured_dist)
 
                 # Interpolate angles for more measurement
-                interpolate_angles = []
-                t = np.arctan(2.0 / measured_dist)
-                if t > 0.09:
-                    offsets = np.arange(0.09, t, 0.09)
-                    interpolate_angles.extend(offsets)
-                    interpolate_angles.extend(-offsets)
-                for ia in interpolate_angles:
+                for ia in interpolation_offsets(measured_dist):
                     offset = angle + ia
-                    offset = math.atan2(math.sin(offset), math.cos(offset))
 
                     confidence_factor = 0.8
                     self.update_map_for_particle(p, offset, measured_dist)
@@ -212,50 +335,130 @@ class FastSLAM:
             for p in self.particles:
                 p.weight /= total_weight
 
+        self._update_fused_map()
+
     def update_map_for_particle(
         self, particle: Particle, angle: float, distance: float
     ):
         """
         Update particle's map based on particle position and measurement
         """
-        start_x, start_y = particle.x, particle.y
-        end_x = start_x + distance * np.cos(particle.theta + angle)
-        end_y = start_y + distance * np.sin(particle.theta + angle)
-
-        # Bresenham's algorithm for ray tracing
-        sx, sy = particle.map.world_to_grid(start_x, start_y)
-        ex, ey = particle.map.world_to_grid(end_x, end_y)
-        points = self.bresenham(sx, sy, ex, ey)
+        # Cells along the beam from the precomputed templates
+        templates = get_beam_templates(particle.map.resolution)
+        offset_x, offset_y = templates.ray(
+            particle.x, particle.y, particle.theta + angle, distance
+        )
+        sx, sy = particle.map.world_to_grid(particle.x, particle.y)
+        xs = sx + offset_x
+        ys = sy + offset_y
 
         # Update the cells along the line (except the last one which is the obstacle)
-        for i, (gx, gy) in enumerate(points):
-            if i < len(points) - 1:
-                particle.map.update_cell(int(gx), int(gy), occupied=False)
-            elif distance < SENSOR_MAX_RANGE:
-                particle.map.update_cell(int(gx), int(gy), occupied=True)
-
-    def bresenham(self, x0, y0, x1, y1):
-        """Bresenham's algorithm implementation for ray tracing"""
-        points = []
-        dx = abs(x1 - x0)
-        dy = abs(y1 - y0)
-        sx = 1 if x0 < x1 else -1
-        sy = 1 if y0 < y1 else -1
-        err = dx - dy
-
-        while True:
-            points.append((x0, y0))
-            if x0 == x1 and y0 == y1:
-                break
-            e2 = 2 * err
-            if e2 > -dy:
-                err -= dy
-                x0 += sx
-            if e2 < dx:
-                err += dx
-                y0 += sy
+        values = np.full(len(xs), particle.map.log_odds_free)
+        if distance < SENSOR_MAX_RANGE:
+            values[-1] = particle.map.log_odds_occupied
+        else:
+            xs, ys, values = xs[:-1], ys[:-1], values[:-1]
 
-        return points
+        inside = (
+            (xs >= 0)
+            & (xs < particle.map.width)
+            & (ys >= 0)
+            & (ys < particle.map.height)
+        )
+        self._apply_cell_updates(particle, xs[inside], ys[inside], values[inside])
+
+    def _apply_cell_updates(
+        self, particle: Particle, xs: np.ndarray, ys: np.ndarray, values: np.ndarray
+    ):
+        """Add log-odds values to the particle map and record them as step deltas"""
+        if len(values) == 0:
+            return
+        indices = ys * particle.map.width + xs
+        np.add.at(particle.map.grid.reshape(-1), indices, values)
+        particle.deltas.append((indices, values))
+        particle.history_cells.append(indices)
+        if particle.sketch is not None:
+            np.add.at(
+                particle.sketch,
+                self._sketch_buckets[indices],
+                self._sketch_signs[indices] * values,
+            )
+
+    def _update_fused_map(self):
+        """
+        Fold the step deltas of the fused map members into the running fused map,
+        with the member weights. The fused map is rebuilt from the current top-k
+        when the member weights drift too far from the top-k weights.
+        """
+        top_k = min(self.fuse_top_k, len(self.particles))
+        top_particles = sorted(self.particles, key=lambda p: p.weight, reverse=True)[
+            :top_k
+        ]
+        total_weight = sum(p.weight for p in top_particles)
+        if total_weight > 0:
+            weights = [p.weight / total_weight for p in top_particles]
+        else:
+            weights = [1.0 / top_k] * top_k
+        current = {p.id: w for p, w in zip(top_particles, weights)}
+
+        members = None
+        best_map = top_particles[0].map
+        if (
+            self.fused_map is not None
+            and self.fused_map.grid.shape == best_map.grid.shape
+        ):
+            members = self._carry_fused_members(top_particles)
+        if members is not None:
+            self.fused_drift = 0.5 * sum(
+                abs(members.get(pid, 0.0) - current.get(pid, 0.0))
+                for pid in members.keys() | current.keys()
+            )
+
+        if members is None or self.fused_drift > self.fuse_rebuild_threshold:
+            self.fused_map = self.get_fuse_map(top_k)
+            self.fused_drift = 0.0
+            members = current
+        else:
+            particles = {p.id: p for p in self.particles}
+            fused_grid = self.fused_map.grid.reshape(-1)
+            for pid, w in members.items():
+                if pid not in particles:
+                    continue
+                for indices, values in particles[pid].deltas:
+                    np.add.at(fused_grid, indices, values * w)
+
+        self._fused_weights = members
+        for p in self.particles:
+            p.deltas.clear()
+
+    def _carry_fused_members(self, top_particles: list[Particle]) -> dict[int, float]:
+        """
+        Pass the weight of each fused map member on to the particles carrying its
+        map: the member itself, or its resampled copies. The weight is split over
+        the copies in the top-k, or given to the heaviest copy if none is. A member
+        without descendants keeps its weight, its map is frozen in the fused map and
+        only counts towards the drift.
+        """
+        descendants = collections.defaultdict(list)
+        for p in self.particles:
+            if p.id in self._fused_weights:
+                descendants[p.id].append(p)
+            elif p.parent_id in self._fused_weights:
+                descendants[p.parent_id].append(p)
+
+        top_ids = {p.id for p in top_particles}
+        members = collections.defaultdict(float)
+        for pid, w in self._fused_weights.items():
+            candidates = descendants.get(pid)
+            if not candidates:
+                members[pid] += w
+                continue
+            carriers = [p for p in candidates if p.id in top_ids] or [
+                max(candidates, key=lambda p: p.weight)
+            ]
+            for p in carriers:
+                members[p.id] += w / len(carriers)
+        return dict(members)
 
     def measurement_likelihood(
         self, particle: Particle, angle: float, measured_dist: float
@@ -288,14 +491,19 @@ class FastSLAM:
         max_range = SENSOR_MAX_RANGE
         step_size = 2.0
 
-        for dist in np.arange(0, max_range, step_size):
-            x = particle.x + dist * np.cos(particle.theta + angle)
-            y = particle.y + dist * np.sin(particle.theta + angle)
-
-            gx, gy = particle.map.world_to_grid(x, y)
+        templates = get_beam_templates(particle.map.resolution)
+        offset_x, offset_y, distances = templates.samples(
+            particle.x, particle.y, particle.theta + angle, step_size, max_range
+        )
+        gx, gy = particle.map.world_to_grid(particle.x, particle.y)
+        xs = np.clip(gx + offset_x, 0, particle.map.width - 1)
+        ys = np.clip(gy + offset_y, 0, particle.map.height - 1)
 
-            if particle.map.is_occupied(gx, gy):
-                return dist
+        hits = np.flatnonzero(
+            particle.map.grid[ys, xs] > particle.map.log_odds_threshold
+        )
+        if len(hits):
+            return float(distances[hits[0]])
 
         return None
 
@@ -424,7 +632,7 @@ class FastSLAM:
         angle_diversity = 1.0 - mean_vector_length
 
         # 4. Calculate map diversity - compare map similarity between different particles
-        # For efficiency, only sample top_k particles for comparison
+        # For efficiency, only sample top_k particles and compare their map sketches
         top_k = min(10, len(self.particles))
         sorted_particles = sorted(self.particles, key=lambda p: p.weight, reverse=True)[
             :top_k
@@ -432,29 +640,19 @@ class FastSLAM:
 
         # Calculate map similarity
         if len(sorted_particles) > 1:
-            map_similarities = []
-            for i in range(len(sorted_particles)):
-                for j in range(i + 1, len(sorted_particles)):
-                    # Calculate correlation coefficient or similarity between two map grids
-                    map1 = sorted_particles[i].map.grid.flatten()
-                    map2 = sorted_particles[j].map.grid.flatten()
-
-                    # Use cosine similarity
-                    dot_product = np.dot(map1, map2)
-                    norm1 = np.linalg.norm(map1)
-                    norm2 = np.linalg.norm(map2)
-
-                    if norm1 > 0 and norm2 > 0:
-                        similarity = dot_product / (norm1 * norm2)
-                        map_similarities.append(similarity)
-                    else:
-                        map_similarities.append(0.0)
-
-            if map_similarities:
-                avg_similarity = np.mean(map_similarities)
-                map_diversity = 1.0 - avg_similarity
-            else:
-                map_diversity = 0.0
+            sketches = np.stack([self._map_sketch(p) for p in sorted_particles])
+
+            # Use cosine similarity, pairs with an empty map count as dissimilar
+            norms = np.linalg.norm(sketches, axis=1)
+            norms_product = np.outer(norms, norms)
+            similarities = np.divide(
+                sketches @ sketches.T,
+                norms_product,
+                out=np.zeros_like(norms_product),
+                where=norms_product > 0,
+            )
+            avg_similarity = np.mean(similarities[np.triu_indices(top_k, k=1)])
+            map_diversity = 1.0 - avg_similarity
         else:
             map_diversity = 0.0
 
@@ -475,6 +673,28 @@ class FastSLAM:
 
         return effectiveness
 
+    def _map_sketch(self, particle: Particle) -> np.ndarray:
+        """
+        Count sketch of a particle map. Every cell is hashed to a bucket with a random
+        sign, so inner products of sketches estimate inner products of the maps.
+        Sketches are kept up to date incrementally from the cell updates.
+        """
+        grid = particle.map.grid
+        if self._sketch_shape != grid.shape:
+            self._sketch_shape = grid.shape
+            self._sketch_buckets = np.random.randint(0, self.sketch_size, grid.size)
+            self._sketch_signs = np.random.choice([-1.0, 1.0], grid.size)
+            for p in self.particles:
+                p.sketch = None
+
+        if particle.sketch is None:
+            particle.sketch = np.bincount(
+                self._sketch_buckets,
+                weights=self._sketch_signs * grid.reshape(-1),
+                minlength=self.sketch_size,
+            )
+        return particle.sketch
+
     def inject_random_particles(self, ratio=0.1, min_count=5, around_best=True):
         """Inject random particles to improve particle set diversity"""
         # Calculate the number of particles to inject
@@ -482,57 +702,50 @@ class FastSLAM:
 
         # Get the best particle as the injection center
         best_particle = self.get_best_particle()
+        best_map = best_particle.map
+
+        # Sample all new poses at once
+        if around_best:
+            # Add random offsets around the best particle's position
+            # 20 is the position offset standard deviation
+            xs = best_particle.x + np.random.normal(0, 20, inject_count)
+            ys = best_particle.y + np.random.normal(0, 20, inject_count)
+            # π/4 is the direction offset standard deviation
+            thetas = best_particle.theta + np.random.normal(0, np.pi / 4, inject_count)
+            thetas = np.arctan2(np.sin(thetas), np.cos(thetas))
+
+            # Seed the maps with the cells of the best particle with high certainty
+            # (cells with large absolute values)
+            certainty_threshold = 2.0  # logodds threshold
+            seed_grid = np.where(
+                np.abs(best_map.grid) > certainty_threshold, best_map.grid, 0.0
+            )
+        else:
+            # Generate completely random particles over a larger range
+            xs = np.random.normal(0, 100, inject_count)
+            ys = np.random.normal(0, 100, inject_count)
+            thetas = np.random.uniform(-np.pi, np.pi, inject_count)
+            seed_grid = None
 
-        # Generate new particles
+        # Generate new particles with the same map dimensions as the best particle
         new_particles = []
-        for _ in range(inject_count):
-            if around_best:
-                # Add random offsets around the best particle's position
-                x = best_particle.x + np.random.normal(
-                    0, 20
-                )  # 20 is the position offset standard deviation
-                y = best_particle.y + np.random.normal(0, 20)
-                theta = best_particle.theta + np.random.normal(
-                    0, np.pi / 4
-                )  # π/4 is the direction offset standard deviation
-                theta = math.atan2(math.sin(theta), math.cos(theta))
-
-                # Create new particle with the same map dimensions as the best particle
-                p = Particle(
-                    x=x,
-                    y=y,
-                    theta=theta,
-                    weight=1.0 / self.num_particles,
-                    map_width=best_particle.map.width,
-                    map_height=best_particle.map.height,
-                    resolution=best_particle.map.resolution,
-                )
-
-                # Optional: Copy part of the map information from the best particle
-                # Here we only copy cells with high certainty (cells with large absolute values)
-                certainty_threshold = 2.0  # logodds threshold
-                for i in range(best_particle.map.height):
-                    for j in range(best_particle.map.width):
-                        cell_value = best_particle.map.grid[i, j]
-                        if abs(cell_value) > certainty_threshold:
-                            p.map.grid[i, j] = cell_value
-
-                new_particles.append(p)
-            else:
-                # Generate completely random particles
-                p = Particle(
-                    x=np.random.normal(
-                        0, 100
-                    ),  # Larger range for random initial positions
-                    y=np.random.normal(0, 100),
-                    theta=np.random.uniform(-np.pi, np.pi),
-                    weight=1.0 / self.num_particles,
-                )
-                new_particles.append(p)
+        for x, y, theta in zip(xs, ys, thetas):
+            p = Particle(
+                x=float(x),
+                y=float(y),
+                theta=float(theta),
+                weight=1.0 / self.num_particles,
+                map_width=best_map.width,
+                map_height=best_map.height,
+                resolution=best_map.resolution,
+                grid=None if seed_grid is None else seed_grid.copy(),
+            )
+            new_particles.append(p)
 
         # Remove particles with lowest weights
         self.particles.sort(key=lambda p: p.weight)
         self.particles = self.particles[inject_count:] + new_particles
+        self._last_injection = self._iteration_count
 
         # Re-normalize weights
         total_weight = sum(p.weight for p in self.particles)
@@ -545,81 +758,6 @@ class FastSLAM:
             f"{'around best particle' if around_best else 'randomly'}"
         )
 
-    def get_fuse_map_with_alignment(self, top_k: int = 10) -> OccupancyGridMap:
-        """Advanced map fusion considering particle position differences with alignment"""
-        # Limit top_k to not exceed the total number of particles
-        top_k = min(top_k, len(self.particles))
-
-        # Sort particles by weight
-        sorted_particles = sorted(self.particles, key=lambda p: p.weight, reverse=True)[
-            :top_k
-        ]
-
-        # If there are no particles, return an empty map
-        if not sorted_particles:
-            return OccupancyGridMap()
-
-        # Get the highest weight particle as reference
-        reference_particle = sorted_particles[0]
-        ref_x, ref_y = reference_particle.x, reference_particle.y
-
-        # Create fusion map with the same dimensions as the reference particle
-        map_width = reference_particle.map.width
-        map_height = reference_particle.map.height
-        resolution = reference_particle.map.resolution
-
-        fused_map = OccupancyGridMap(
-            width=map_width, height=map_height, resolution=resolution
-        )
-        fused_map.grid = np.zeros((map_height, map_width), dtype=np.float64)
-
-        # Initialize weight accumulation grid to track how many particles updated each cell
-        weight_grid = np.zeros((map_height, map_width), dtype=np.float64)
-
-        # Calculate total weight of selected particles
-        total_weight = sum(p.weight for p in sorted_particles)
-
-        # If total weight is 0, use uniform weights
-        if total_weight <= 0:
-            weights = [1.0 / top_k] * top_k
-        else:
-            # Normalize weights
-            weights = [p.weight / total_weight for p in sorted_particles]
-
-        # Align and fuse each particle
-        for i, particle in enumerate(sorted_particles):
-            # Calculate position offset relative to reference particle
-            dx = ref_x - particle.x
-            dy = ref_y - particle.y
-
-            # Convert to grid offset
-            grid_dx, grid_dy = int(dx / resolution), int(dy / resolution)
-
-            # Fuse maps after alignment
-            for y in range(map_height):
-                for x in range(map_width):
-                    # Calculate aligned coordinates
-                    aligned_x = x - grid_dx
-                    aligned_y = y - grid_dy
-
-                    # Check if aligned coordinates are within original map bounds
-                    if (0 <= aligned_x < map_width) and (0 <= aligned_y < map_height):
-                        # Add to fusion map weighted by particle weight
-                        cell_value = (
-                            particle.map.grid[aligned_y, aligned_x] * weights[i]
-                        )
-                        fused_map.grid[y, x] += cell_value
-                        weight_grid[y, x] += weights[i]
-
-        # Normalize grid values by accumulated weights
-        # Avoid division by zero
-        mask = weight_grid > 0
-        fused_map.grid[mask] /= weight_grid[mask]
-
-        bt.logging.info(f"Aligned and fused map created from top {top_k} particles")
-
-        return fused_map
-
     def get_current_pose(self) -> tuple[float, float, float]:
         best_particle = self.get_best_particle()
         return best_particle.x, best_particle.y, best_particle.theta
@@ -631,310 +769,590 @@ class FastSLAM:
         bt.logging.info("SLAM predict done")
         self.update_weights(lidar_data)
         bt.logging.info("SLAM update weights done")
+        if (
+            self.injection_check_interval
+            and self._iteration_count % self.injection_check_interval == 0
+            and (
+                self._last_injection is None
+                or self._iteration_count - self._last_injection
+                >= self.injection_cooldown
+            )
+            and self.mesurement_effectiveness() < self.injection_threshold
+        ):
+            # Recover from particle deprivation before it is resampled away
+            self.inject_random_particles()
+
+        # Capture the state to save before resampling. Resampling replaces every
+        # particle with a copy, so the captured particles are never changed again
+        # while the background save reads them.
+        state = None
+        if self._iteration_count % 10 == 0 and self._save_ready():
+            state = self._capture_state()
         self.resample()
         bt.logging.info("SLAM resample done")
 
-        if self._iteration_count % 10 == 0:
-            if self._save_future is not None and not self._save_future.done():
-                bt.logging.warning("Previous save still running, skipping this save")
-                return
-            self._save_future = self._save_executor.submit(self.save)
+        if state is not None:
+            self._save_future = self._save_executor.submit(self.save, state)
             bt.logging.info("SLAM save state submitted to background")
 
         self._iteration_count += 1
 
-    def save(self):
-        """Save the current SLAM state to history and file"""
-        with open(os.path.join(self.data_dir, "map.pkl"), "wb") as f:
-            pickle.dump(
-                self.get_fuse_map_with_alignment(), f, protocol=pickle.HIGHEST_PROTOCOL
-            )
+    def _save_ready(self) -> bool:
+        """Check the previous background save before submitting a new one"""
+        if self._save_future is None:
+            return True
+        if not self._save_future.done():
+            bt.logging.warning("Previous save still running, skipping this save")
+            return False
+        if self._save_future.exception() is not None:
+            bt.logging.error(f"Previous save failed: {self._save_future.exception()}")
+            # The next delta would miss the failed one, start a new keyframe
+            self._save_count = 0
+        return True
+
+    def _capture_state(self) -> dict:
+        """
+        Capture the particles to save and their map changes since the previous save.
+        Runs in the main loop so the particle set and the change tracking stay
+        consistent while the save itself runs in the background. The particles must
+        not be changed afterwards, the fused map is copied with its topology.
+        """
+        keyframe = self._save_count % self.keyframe_interval == 0
+        self._save_count += 1
+
+        particles = list(self.particles)
+        slots = np.array(
+            [
+                -1 if keyframe or p.saved_slot is None else p.saved_slot
+                for p in particles
+            ],
+            dtype=np.int64,
+        )
+        changed = [p.history_cells for p in particles]
+        for i, p in enumerate(particles):
+            p.saved_slot = i
+            p.history_cells = []
+
+        best_particle = max(particles, key=lambda p: p.weight)
+        return {
+            "keyframe": keyframe,
+            "particles": particles,
+            "grid_map": copy.deepcopy(self.grid_map),
+            "slots": slots,
+            "changed": changed,
+            "position": {
+                "x": best_particle.x,
+                "y": best_particle.y,
+                "theta": best_particle.theta,
+            },
+        }
+
+    def save(self, state: dict | None = None):
+        """
+        Save the current SLAM state to history and file. Every `keyframe_interval`
+        saves a full snapshot is written, the saves in between only store the cells
+        changed since the previous save.
+
+        Args:
+            state: Captured state to save, see `_capture_state`. Captured now if None.
+        """
+        if state is None:
+            state = self._capture_state()
+
+        state["grid_map"].save_snapshot(os.path.join(self.data_dir, "map.npz"))
 
-        best_particle = self.get_best_particle()
-        bt.logging.debug("SLAM save state get best particle")
         timestamp = time.time()
 
         # Generate and save the visualization
-        image = self.visualize()
+        image = self.visualize(particles=state["particles"])
         bt.logging.debug("SLAM save state generated visualization")
         image_filename = os.path.join(self.history_dir, f"{timestamp:.6f}.png.gz")
         with gzip.open(image_filename, "wb") as f:
             f.write(image)
         bt.logging.debug("SLAM save state save visualization")
 
-        # Create a history entry (excluding image data)
-        entry = {
-            "timestamp": timestamp,
-            "image_path": image_filename,  # Store the image path instead of image data
-            "position": {
-                "x": best_particle.x,
-                "y": best_particle.y,
-                "theta": best_particle.theta,
-            },
-        }
-        self.history.append(entry)
-
         bt.logging.debug("SLAM save state save serialize begin")
         # Serialize and save the SLAM state
-        state_data = {
-            "timestamp": timestamp,
-            "position": entry["position"],
-            "slam_state": self._serialize_efficient(),
-        }
+        if state["keyframe"]:
+            state_data = self._serialize_efficient(state["particles"])
+            state_filename = os.path.join(self.state_dir, f"{timestamp:.6f}.npz")
+        else:
+            state_data = self._serialize_efficient(
+                state["particles"], state["slots"], state["changed"]
+            )
+            state_filename = os.path.join(self.state_dir, f"{timestamp:.6f}.delta.npz")
+        state_data["timestamp"] = np.float64(timestamp)
+        state_data["position"] = np.array(
+            [state["position"]["x"], state["position"]["y"], state["position"]["theta"]]
+        )
         bt.logging.debug("SLAM save state save serialized")
-        state_filename = os.path.join(self.state_dir, f"{timestamp:.6f}.pkl.xz")
-        with lzma.open(state_filename, "wb") as f:
-            pickle.dump(state_data, f, protocol=pickle.HIGHEST_PROTOCOL)
-        bt.logging.debug("SLAM save state save state data lzma")
-
-        # Update metadata
-        self.history_metadata["total"] = len(self.history)
-        self.history_metadata["timestamps"].append(timestamp)
-        self.history_metadata["positions"].append(entry["position"])
-        with open(self.metadata_file, "wb") as f:
-            pickle.dump(self.history_metadata, f, protocol=pickle.HIGHEST_PROTOCOL)
+        _save_arrays(state_filename, state_data)
+        bt.logging.debug("SLAM save state save state data")
+
+        # Record the state in the history index
+        record = np.array(
+            [
+                (
+                    timestamp,
+                    state["position"]["x"],
+                    state["position"]["y"],
+                    state["position"]["theta"],
+                    STATE_KEYFRAME if state["keyframe"] else STATE_DELTA,
+                    os.path.getsize(state_filename),
+                )
+            ],
+            dtype=HISTORY_INDEX_DTYPE,
+        )
+        self._append_history(record)
+        entry = HistoryEntry(record[0], self.state_dir, self.history_dir)
+        self.history.append(entry)
+        if state["keyframe"]:
+            self._prune_history()
 
         bt.logging.info(f"SLAM state saved: {state_filename}")
         return entry
 
-    def _serialize_efficient(self):
-        """Serialize the SLAM state using a more efficient method, saving only necessary data"""
-        # Only save the key attributes of particles to reduce redundant data
-        particles_data = []
-        for p in self.particles:
-            # Compress grid data - only save non-zero values
-            grid = p.map.grid
-            # Retrieve the indices and values of non-zero elements
-            nonzero_indices = np.nonzero(grid)
-            # Pack the indices and values into a list of tuples
-            sparse_grid = [
-                (i, j, grid[i, j])
-                for i, j in zip(nonzero_indices[0], nonzero_indices[1])
+    def _prune_history(self):
+        """Remove the history older than the last `history_keyframes` keyframes"""
+        index = self._history_index
+        keyframes = np.flatnonzero(index["kind"] != STATE_DELTA)
+        if len(keyframes) <= self.history_keyframes:
+            return
+
+        count = keyframes[-self.history_keyframes]
+        for record in index[:count]:
+            filenames = [
+                os.path.join(self.history_dir, f"{record['timestamp']:.6f}.png.gz"),
+                self._state_filename(record),
             ]
+            for filename in filenames:
+                try:
+                    if os.path.exists(filename):
+                        os.remove(filename)
+                except OSError as e:
+                    bt.logging.warning(f"Error removing history file {filename}: {e}")
+
+        self._history_index = index[count:]
+        self._write_history_index()
+        cutoff = self._history_index[0]["timestamp"]
+        self.history = [e for e in self.history if e.timestamp >= cutoff]
+        bt.logging.info(f"Pruned {count} SLAM history entries")
+
+    def _serialize_efficient(
+        self,
+        particles: list[Particle] | None = None,
+        slots: np.ndarray | None = None,
+        changed: list[list[np.ndarray]] | None = None,
+    ) -> dict[str, np.ndarray]:
+        """
+        Serialize particles into columnar arrays: poses and map info per particle,
+        and the map cells of all particles concatenated. Sparse maps store the flat
+        indices (delta encoded, so they compress well) and values of their non-zero
+        cells, maps with more than 10% non-zero cells store the full grid.
 
-            particles_data.append(
-                {
-                    "x": p.x,
-                    "y": p.y,
-                    "theta": p.theta,
-                    "weight": p.weight,
-                    "map_info": {
-                        "width": p.map.width,
-                        "height": p.map.height,
-                        "resolution": p.map.resolution,
-                    },
-                    "sparse_grid": (
-                        sparse_grid
-                        if len(sparse_grid) < (p.map.width * p.map.height // 10)
-                        else None
-                    ),
-                    "full_grid": (
-                        None
-                        if len(sparse_grid) < (p.map.width * p.map.height // 10)
-                        else grid.tobytes()
-                    ),
-                }
-            )
+        Args:
+            particles: Particles to serialize, defaults to the current particles
+            slots: For a delta, index of each particle's ancestor in the previously
+                saved state, -1 for particles without one
+            changed: For a delta, flat indices of the cells each particle changed
+                since the previous save. Only these cells are stored for particles
+                with an ancestor.
+        """
+        if particles is None:
+            particles = self.particles
+        if slots is None:
+            slots = np.full(len(particles), -1, dtype=np.int64)
+        else:
+            slots = slots.copy()
+
+        poses = np.array([(p.x, p.y, p.theta, p.weight) for p in particles])
+        shapes = np.array([p.map.grid.shape for p in particles], dtype=np.int64)
+        resolutions = np.array([p.map.resolution for p in particles])
+
+        dense = np.zeros(len(particles), dtype=bool)
+        cell_counts = np.zeros(len(particles), dtype=np.int64)
+        cell_indices = []
+        cell_values = []
+        for i, p in enumerate(particles):
+            grid = p.map.grid.ravel()
+            if slots[i] >= 0:
+                indices = np.unique(
+                    np.concatenate(changed[i] or [np.zeros(0, np.intp)])
+                )
+                if len(indices) >= grid.size // 10:
+                    # Cheaper to store the whole map than the changes
+                    slots[i] = -1
+            if slots[i] < 0:
+                indices = np.flatnonzero(grid)
+            if len(indices) < grid.size // 10:
+                cell_indices.append(np.diff(indices, prepend=0).astype(np.int32))
+                cell_values.append(grid[indices])
+                cell_counts[i] = len(indices)
+            else:
+                dense[i] = True
+                cell_values.append(grid)
+                cell_counts[i] = grid.size
 
         return {
-            "num_particles": self.num_particles,
-            "particles": particles_data,
+            "num_particles": np.int64(self.num_particles),
+            "poses": poses,
+            "shapes": shapes,
+            "resolutions": resolutions,
+            "slots": slots,
+            "dense": dense,
+            "cell_counts": cell_counts,
+            "cell_indices": np.concatenate(cell_indices or [np.zeros(0, np.int32)]),
+            "cell_values": np.concatenate(cell_values or [np.zeros(0)]),
         }
 
-    @classmethod
-    def _deserialize_efficient(cls, data):
-        """Restore the SLAM state from efficient serialization data"""
-        slam = cls(num_particles=data["num_particles"], load_history=False)
+    def _deserialize_efficient(
+        self, data: dict[str, np.ndarray], previous: list[Particle] | None = None
+    ) -> list[Particle]:
+        """
+        Restore particles from the columnar serialization data
 
-        new_particles = []
+        Args:
+            data: Serialized keyframe or delta arrays
+            previous: Particles of the previously saved state a delta is applied to.
+                Their maps are reused and must not be used afterwards.
+
+        Returns:
+            The restored particles
+        """
+        poses = data["poses"]
+        shapes = data["shapes"]
+        resolutions = data["resolutions"]
+        slots = data.get("slots", np.full(len(poses), -1))
+        dense = data["dense"]
+        cell_counts = data["cell_counts"]
+        cell_indices = data["cell_indices"]
+        cell_values = data["cell_values"]
+
+        # Start of each particle's cells in the concatenated arrays
+        value_starts = np.concatenate([[0], np.cumsum(cell_counts)])
+        index_starts = np.concatenate([[0], np.cumsum(np.where(dense, 0, cell_counts))])
+        # The last particle restored from an ancestor takes over its map
+        references = collections.Counter(slots[slots >= 0].tolist())
+
+        particles = []
+        for i, (x, y, theta, weight) in enumerate(poses):
+            height, width = shapes[i]
+            p = Particle(
+                x=x,
+                y=y,
+                theta=theta,
+                weight=weight,
+                map_width=width,
+                map_height=height,
+                resolution=resolutions[i],
+            )
+
+            slot = int(slots[i])
+            if slot >= 0:
+                references[slot] -= 1
+                grid = previous[slot].map.grid
+                p.map.grid = grid if references[slot] == 0 else grid.copy()
+
+            values = cell_values[value_starts[i] : value_starts[i + 1]]
+            if dense[i]:
+                p.map.grid[:] = values.reshape(height, width)
+            else:
+                deltas = cell_indices[index_starts[i] : index_starts[i + 1]]
+                p.map.grid.ravel()[np.cumsum(deltas, dtype=np.intp)] = values
+            particles.append(p)
+
+        return particles
+
+    def _deserialize_legacy(self, data: dict) -> list[Particle]:
+        """Restore particles from the pickled tuple format of older versions"""
+        particles = []
         for p_data in data["particles"]:
+            map_info = p_data["map_info"]
             p = Particle(
                 x=p_data["x"],
                 y=p_data["y"],
                 theta=p_data["theta"],
                 weight=p_data["weight"],
-                map_width=p_data["map_info"]["width"],
-                map_height=p_data["map_info"]["height"],
+                map_width=map_info["width"],
+                map_height=map_info["height"],
+                resolution=map_info["resolution"],
             )
 
-            # Set map resolution
-            p.map.resolution = p_data["map_info"]["resolution"]
-
-            # Restore grid data
             if p_data["sparse_grid"] is not None:
-                # Restore using sparse representation
-                for i, j, value in p_data["sparse_grid"]:
-                    p.map.grid[i, j] = value
+                if p_data["sparse_grid"]:
+                    cells = np.array(p_data["sparse_grid"])
+                    rows = cells[:, 0].astype(np.intp)
+                    cols = cells[:, 1].astype(np.intp)
+                    p.map.grid[rows, cols] = cells[:, 2]
             elif p_data["full_grid"] is not None:
-                # Restore using full binary data - fix read-only array issue
-                grid_shape = (p_data["map_info"]["height"], p_data["map_info"]["width"])
-                # Create a writable copy of the array using copy=True parameter, or use np.array conversion
-                p.map.grid = np.array(
-                    np.frombuffer(p_data["full_grid"], dtype=np.float64).reshape(
-                        grid_shape
-                    ),
-                    copy=True,
+                p.map.grid[:] = np.frombuffer(
+                    p_data["full_grid"], dtype=np.float64
+                ).reshape(map_info["height"], map_info["width"])
+            particles.append(p)
+
+        return particles
+
+    def _set_particles(self, particles: list[Particle], num_particles: int):
+        """Replace the particle set, dropping state derived from the previous one"""
+        self.particles = particles
+        self.num_particles = num_particles
+        self.fused_map = None
+        self._fused_weights = {}
+        # Saved history continues from a new keyframe
+        self._save_count = 0
+
+    def _state_filename(self, record: np.void) -> str:
+        """Path of the state file of a history index record"""
+        suffix = STATE_SUFFIXES[int(record["kind"])]
+        return os.path.join(self.state_dir, f"{record['timestamp']:.6f}{suffix}")
+
+    def _append_history(self, record: np.ndarray):
+        """Append saved state records to the history index"""
+        with open(self.history_index_file, "ab") as f:
+            f.write(record.tobytes())
+        self._history_index = np.concatenate([self._history_index, record])
+
+    def _write_history_index(self):
+        """Rewrite the whole history index file"""
+        tmp_filename = self.history_index_file + ".tmp"
+        with open(tmp_filename, "wb") as f:
+            f.write(self._history_index.tobytes())
+        os.replace(tmp_filename, self.history_index_file)
+
+    def _read_history_index(self) -> np.ndarray:
+        """Read the history index, migrating the history of older versions"""
+        if os.path.exists(self.history_index_file):
+            with open(self.history_index_file, "rb") as f:
+                data = f.read()
+            # Drop a record partially written by an interrupted save
+            data = data[: len(data) - len(data) % HISTORY_INDEX_DTYPE.itemsize]
+            return np.frombuffer(data, dtype=HISTORY_INDEX_DTYPE).copy()
+
+        # Older versions keep timestamps and positions in a metadata pickle, or
+        # only have the state files
+        timestamps, positions = [], []
+        try:
+            if os.path.exists(self.metadata_file):
+                with open(self.metadata_file, "rb") as f:
+                    metadata = pickle.load(f)
+                timestamps = metadata["timestamps"]
+                positions = metadata["positions"]
+        except Exception as e:
+            bt.logging.error(f"Error loading history metadata: {str(e)}")
+        if not timestamps:
+            state_files = list(Path(self.state_dir).glob("*.npz"))
+            state_files += list(Path(self.state_dir).glob("*.pkl.xz"))
+            timestamps = sorted(
+                {
+                    float(
+                        f.name.removesuffix(".npz")
+                        .removesuffix(".delta")
+                        .removesuffix(".pkl.xz")
+                    )
+                    for f in state_files
+                }
+            )
+            positions = [{} for _ in timestamps]
+
+        records = []
+        for timestamp, position in zip(timestamps, positions):
+            for kind, suffix in STATE_SUFFIXES.items():
+                state_filename = os.path.join(
+                    self.state_dir, f"{timestamp:.6f}{suffix}"
+                )
+                if os.path.exists(state_filename):
+                    break
+            else:
+                continue
+            position = position or {}
+            records.append(
+                (
+                    timestamp,
+                    position.get("x", np.nan),
+                    position.get("y", np.nan),
+                    position.get("theta", np.nan),
+                    kind,
+                    os.path.getsize(state_filename),
                 )
+            )
+        self._history_index = np.array(records, dtype=HISTORY_INDEX_DTYPE)
+        if not records:
+            return self._history_index
+        self._write_history_index()
+        bt.logging.info(f"Migrated {len(records)} SLAM history entries to the index")
+        return self._history_index
+
+    def _restore_state(self, timestamp: float) -> str | None:
+        """
+        Restore the particles saved at or before a timestamp, starting from the
+        nearest keyframe and applying the deltas saved after it
 
-            new_particles.append(p)
+        Returns:
+            Path of the last state file applied, None if there is no keyframe
+        """
+        index = self._history_index
+        end = np.searchsorted(index["timestamp"], timestamp, side="right")
 
-        slam.particles = new_particles
-        return slam
+        # Nearest keyframe
+        keyframes = np.flatnonzero(index["kind"][:end] != STATE_DELTA)
+        if len(keyframes) == 0:
+            return None
+        start = keyframes[-1]
 
-    def load(self, max_entries: int = 100, load_states: bool = False):
-        """Load historical SLAM data, limiting the maximum number of entries for performance"""
+        state_filename = self._state_filename(index[start])
+        state_data = _load_state_file(state_filename)
+        if index[start]["kind"] == STATE_KEYFRAME:
+            particles = self._deserialize_efficient(state_data["slam_state"])
+            num_particles = int(state_data["slam_state"]["num_particles"])
+        else:
+            particles = self._deserialize_legacy(state_data["slam_state"])
+            num_particles = state_data["slam_state"]["num_particles"]
+
+        for record in index[start + 1 : end]:
+            delta_filename = self._state_filename(record)
+            try:
+                state_data = _load_state_file(delta_filename)
+            except OSError as e:
+                bt.logging.warning(
+                    f"SLAM history broken at {delta_filename}: {e}, "
+                    f"restored state from {state_filename}"
+                )
+                break
+            particles = self._deserialize_efficient(state_data["slam_state"], particles)
+            state_filename = delta_filename
+
+        self._set_particles(particles, num_particles)
+        return state_filename
+
+    def load(
+        self,
+        max_entries: int = 100,
+        load_states: bool = False,
+        timestamp: float | None = None,
+    ):
+        """
+        Load historical SLAM data, limiting the maximum number of entries for performance
+
+        Args:
+            max_entries: Maximum number of history entries to load
+            load_states: Load the history entries. Entries are built from the
+                history index, their image and state files are read on access.
+            timestamp: Restore the state saved at or before this timestamp instead
+                of the latest one
+        """
         # Ensure data directories exist
         if not os.path.exists(self.data_dir):
             for directory in [self.data_dir, self.history_dir, self.state_dir]:
                 os.makedirs(directory, exist_ok=True)
             return
 
-        # Try to load metadata first
         try:
-            if os.path.exists(self.metadata_file):
-                with open(self.metadata_file, "rb") as f:
-                    self.history_metadata = pickle.load(f)
+            self._history_index = self._read_history_index()
         except Exception as e:
-            bt.logging.error(f"Error loading history metadata: {str(e)}")
-            self.history_metadata = {"total": 0, "timestamps": [], "positions": []}
-
-        # If the metadata is empty, scan the directories and sort by timestamp
-        if not self.history_metadata["timestamps"]:
-            # Find all state files
-            state_files = list(Path(self.state_dir).glob("*.pkl.xz"))
-            if not state_files:
-                return
-
-            # Extract timestamps from filenames and sort
-            timestamps = [float(f.name.split(".")[0]) for f in state_files]
-            timestamps.sort()
-            self.history_metadata["timestamps"] = timestamps
-            self.history_metadata["positions"] = [{} for _ in range(len(timestamps))]
-            self.history_metadata["total"] = len(timestamps)
-
-            # Update metadata file
-            with open(self.metadata_file, "wb") as f:
-                pickle.dump(self.history_metadata, f, protocol=pickle.HIGHEST_PROTOCOL)
-
-        # Limit loading to the latest max_entries entries
-        timestamps = self.history_metadata["timestamps"]
-        if not timestamps:
+            bt.logging.error(f"Error loading history index: {str(e)}")
+            return
+        if len(self._history_index) == 0:
             return
-        recent_timestamps = timestamps[-max_entries:]
 
         if load_states:
-            self.history = []
-            # Load history entries
-            for timestamp in recent_timestamps:
-                state_filename = os.path.join(self.state_dir, f"{timestamp:.6f}.pkl.xz")
-                image_filename = os.path.join(
-                    self.history_dir, f"{timestamp:.6f}.png.gz"
-                )
-
-                print(f"Loading {state_filename} {time.time()}")
-                try:
-                    entry = {
-                        "timestamp": timestamp,
-                        "image_path": image_filename,  # Store image path instead of data
-                        "position": None,
-                    }
-
-                    if os.path.exists(state_filename):
-                        with lzma.open(state_filename, "rb") as f:
-                            state_data = pickle.load(f)
-                            entry["position"] = state_data["position"]
-
-                    self.history.append(entry)
-                except Exception as e:
-                    bt.logging.error(
-                        f"Error loading history entry {state_filename}: {str(e)}"
-                    )
+            self.history = [
+                HistoryEntry(record, self.state_dir, self.history_dir)
+                for record in self._history_index[-max_entries:]
+            ]
 
-        # Load the latest state as the current state
+        # Load the requested state, the latest by default, as the current state
         try:
-            latest_timestamp = timestamps[-1]
-            latest_state_file = os.path.join(
-                self.state_dir, f"{latest_timestamp:.6f}.pkl.xz"
-            )
-
-            if os.path.exists(latest_state_file):
-                with lzma.open(latest_state_file, "rb") as f:
-                    state_data = pickle.load(f)
-                    loaded_slam = self._deserialize_efficient(state_data["slam_state"])
-                    self.particles = loaded_slam.particles
-                    bt.logging.info(
-                        f"Loaded latest SLAM state from {latest_state_file}"
-                    )
+            if timestamp is None:
+                timestamp = float(self._history_index[-1]["timestamp"])
+            state_filename = self._restore_state(timestamp)
+            if state_filename is not None:
+                bt.logging.info(f"Loaded SLAM state from {state_filename}")
         except Exception as e:
-            bt.logging.error(f"Error loading latest SLAM state: {str(e)}")
+            bt.logging.error(f"Error loading SLAM state: {str(e)}")
 
-    def visualize(self) -> bytes:
-        """
-        Visualize the current state of the SLAM system
+    def visualize(
+        self, scale: int = 2, particles: list[Particle] | None = None
+    ) -> bytes:
         """
-        fig, ax = plt.subplots(figsize=(40, 40))
+        Visualize the current state of the SLAM system as a PNG image: the best
+        particle's map, all particles sized by weight with their heading, and the
+        best particle highlighted
 
-        # Plot the best particle's map
-        best_particle = self.get_best_particle()
-
-        prob_map = 1 - 1 / (1 + np.exp(best_particle.map.grid))
-        ax.imshow(prob_map, cmap="Greys", origin="lower")
-        ax.set_title("Occupancy Grid Map")
-        ax.set_xlabel("Grid X")
-        ax.set_ylabel("Grid Y")
+        Args:
+            scale: Pixels per map cell
+            particles: Particles to draw, defaults to the current particles
+        """
+        if particles is None:
+            particles = self.particles
+        best_particle = max(particles, key=lambda p: p.weight)
+        canvas = MapCanvas(best_particle.map.grid, scale)
         bt.logging.debug("SLAM visualization base map")
 
-        # Add scale bar
-        total_width_meters = best_particle.map.width * best_particle.map.resolution
-        total_height_meters = best_particle.map.height * best_particle.map.resolution
-        ax.set_title(
-            f"FastSLAM with Occupancy Grid Map\nMap size: {total_width_meters:.1f}m x {total_height_meters:.1f}m"
-        )
-        ax.set_xlabel(f"X (Resolution: {best_particle.map.resolution}m/cell)")
-        ax.set_ylabel(f"Y (Resolution: {best_particle.map.resolution}m/cell)")
-
         # Draw all particles
-        for p in self.particles:
-            grid_x, grid_y = p.map.world_to_grid(p.x, p.y)
-            size = 10 * p.weight * self.num_particles
-            ax.scatter(grid_x, grid_y, color="red", s=size, alpha=0.5)
-
-            length = 3
-            dx = length * np.cos(p.theta)
-            dy = length * np.sin(p.theta)
-            ax.arrow(
-                grid_x,
-                grid_y,
-                dx,
-                dy,
-                head_width=1,
-                head_length=1,
-                fc="red",
-                ec="red",
-                alpha=0.5,
-            )
+        grid_xs, grid_ys = np.array(
+            [p.map.world_to_grid(p.x, p.y) for p in particles]
+        ).T
+        thetas = np.array([p.theta for p in particles])
+        weights = np.array([p.weight for p in particles])
+        length = 3
+        canvas.lines(
+            grid_xs,
+            grid_ys,
+            grid_xs + length * np.cos(thetas),
+            grid_ys + length * np.sin(thetas),
+            RED,
+            alpha=0.5,
+        )
+        radii = np.clip(np.rint(np.sqrt(weights * self.num_particles) * scale), 1, None)
+        canvas.points(grid_xs, grid_ys, RED, radius=radii, alpha=0.5)
 
         # Highlight the best particle
         grid_x, grid_y = best_particle.map.world_to_grid(
             best_particle.x, best_particle.y
         )
-        ax.scatter(grid_x, grid_y, color="green", s=100, marker="*")
-
-        plt.tight_layout()  # Ensure title and axis labels are fully displayed
-        bt.logging.debug("SLAM visualization particles draw " + plt.get_backend())
-
-        # Convert the figure to a base64 string
-        buffer = io.BytesIO()
-        plt.savefig(
-            buffer,
-            format="png",
-            bbox_inches="tight",
-            transparent=False,
-            dpi=80,
-        )  # Add bbox_inches parameter to ensure complete saving
-        plt.close(fig)
-        bt.logging.debug("SLAM visualization plt saved to buffer")
-        buffer.seek(0)
-        image_png = buffer.getvalue()
-        buffer.close()
-        return image_png
+        canvas.points(grid_x, grid_y, GREEN, radius=3 * scale)
+        bt.logging.debug("SLAM visualization particles draw")
+
+        return canvas.png()
+
+
+def _save_arrays(filename: str, arrays: dict[str, np.ndarray], compresslevel: int = 1):
+    """
+    Save arrays to an .npz file with a fast deflate level. The file is written to a
+    temporary path first and renamed, so readers never see a partial file.
+    """
+    tmp_filename = filename + ".tmp"
+    with zipfile.ZipFile(
+        tmp_filename, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=compresslevel
+    ) as zf:
+        for name, array in arrays.items():
+            with zf.open(f"{name}.npy", "w", force_zip64=True) as f:
+                np.lib.format.write_array(f, np.asanyarray(array), allow_pickle=False)
+    os.replace(tmp_filename, filename)
+
+
+def _load_state_file(state_filename: str, with_state: bool = True) -> dict:
+    """
+    Load a state file
+
+    Args:
+        state_filename: Path of the state file
+        with_state: Also load the particle data, otherwise only the timestamp and
+            position are read
+
+    Returns:
+        Dict with the timestamp, position and the particle data
+    """
+    if state_filename.endswith(".npz"):
+        with np.load(state_filename) as data:
+            x, y, theta = data["position"]
+            state_data = {
+                "timestamp": float(data["timestamp"]),
+                "position": {"x": float(x), "y": float(y), "theta": float(theta)},
+            }
+            if with_state:
+                state_data["slam_state"] = {key: data[key] for key in data.files}
+        return state_data
+
+    with lzma.open(state_filename, "rb") as f:
+        return pickle.load(f)
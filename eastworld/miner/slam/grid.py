@@ -18,12 +18,20 @@
 
 import collections
 import heapq
+import json
+import os
+from typing import Callable
 
 import bittensor as bt
 import numpy as np
 
+from eastworld.miner.slam.spatial import SpatialHash
+
 ANONYMOUS_NODE_PREFIX = "node_"
 
+# Cell size in meters of the spatial index of navigation nodes
+NAV_INDEX_CELL_SIZE = 50.0
+
 
 def heuristic(a, b):
     """Heuristic function: Manhattan distance"""
@@ -31,13 +39,19 @@ def heuristic(a, b):
 
 
 class OccupancyGridMap:
-    def __init__(self, width: int = 400, height: int = 400, resolution: float = 5.0):
-        """Initialize an occupancy grid map"""
+    def __init__(
+        self,
+        width: int = 400,
+        height: int = 400,
+        resolution: float = 5.0,
+        grid: np.ndarray | None = None,
+    ):
+        """Initialize an occupancy grid map, empty or with the given log-odds grid"""
         self.width = width
         self.height = height
         self.resolution = resolution
 
-        self.grid = np.zeros((height, width))
+        self.grid = np.zeros((height, width)) if grid is None else grid
         self.base_offset_x = 0
         self.base_offset_y = 0
 
@@ -48,17 +62,124 @@ class OccupancyGridMap:
 
         self.nav_nodes = {}
         self.nav_edges = collections.defaultdict(dict)
+        # Incremented whenever a navigation node is added, so consumers can cache
+        # what they derive from the node set
+        self.nav_version = 0
+        # Descriptions of the labeled (not anonymous) nodes, and a spatial index of
+        # all nodes, maintained as nodes are added or moved
+        self.labeled_nodes: dict[str, str] = {}
+        self._nav_index = SpatialHash(NAV_INDEX_CELL_SIZE)
+        self._nav_listeners: list[Callable[[str, tuple], None]] = []
+
+    def __getstate__(self):
+        # Listeners belong to the running process
+        state = self.__dict__.copy()
+        state["_nav_listeners"] = []
+        return state
+
+    def __setstate__(self, state):
+        state.setdefault("nav_version", 0)
+        state["_nav_listeners"] = []
+        self.__dict__.update(state)
+        if "_nav_index" not in state:
+            # Grid maps pickled before the labeled node registry and spatial index
+            self._rebuild_nav_index()
+
+    def _rebuild_nav_index(self):
+        """Rebuild the labeled node registry and spatial index from `nav_nodes`"""
+        self.labeled_nodes = {}
+        self._nav_index = SpatialHash(NAV_INDEX_CELL_SIZE)
+        for node_id, (_, x, y, node_desc) in self.nav_nodes.items():
+            self._index_nav_node(node_id, x, y, node_desc)
+
+    def _index_nav_node(self, node_id: str, x: float, y: float, node_desc: str):
+        self._nav_index.move(node_id, x, y)
+        if not node_id.startswith(ANONYMOUS_NODE_PREFIX):
+            self.labeled_nodes[node_id] = node_desc
+
+    def add_nav_listener(self, listener: Callable[[str, tuple], None]):
+        """
+        Call `listener(node_id, node)` whenever a navigation node is added. Listeners
+        run in the thread that updates the map, and are not saved with the map.
+        """
+        self._nav_listeners.append(listener)
+
+    def remove_nav_listener(self, listener: Callable[[str, tuple], None]):
+        self._nav_listeners.remove(listener)
 
     def reset(self):
         """Reset the grid map to all unknown"""
         self.grid.fill(0)
 
+    def save_snapshot(self, filename: str):
+        """
+        Save the grid map to a binary .npz snapshot. The file is written to a
+        temporary path first and renamed, so readers never see a partial file.
+        """
+        topo = {
+            "nav_nodes": self.nav_nodes,
+            "nav_edges": self.nav_edges,
+        }
+        tmp_filename = filename + ".tmp"
+        with open(tmp_filename, "wb") as f:
+            np.savez(
+                f,
+                grid=self.grid,
+                shape=np.array([self.width, self.height]),
+                offset=np.array([self.base_offset_x, self.base_offset_y]),
+                resolution=np.array(self.resolution),
+                log_odds=np.array(
+                    [
+                        self.log_odds_occupied,
+                        self.log_odds_free,
+                        self.log_odds_threshold,
+                    ]
+                ),
+                topo=np.array(json.dumps(topo)),
+            )
+        os.replace(tmp_filename, filename)
+
+    @classmethod
+    def load_snapshot(cls, filename: str) -> "OccupancyGridMap":
+        """Load a grid map from a binary .npz snapshot"""
+        with np.load(filename) as data:
+            width, height = data["shape"].tolist()
+            grid_map = cls(width=0, height=0, resolution=data["resolution"].item())
+            grid_map.width = width
+            grid_map.height = height
+            grid_map.grid = data["grid"]
+            grid_map.base_offset_x, grid_map.base_offset_y = data["offset"].tolist()
+            (
+                grid_map.log_odds_occupied,
+                grid_map.log_odds_free,
+                grid_map.log_odds_threshold,
+            ) = data["log_odds"].tolist()
+            topo = json.loads(data["topo"].item())
+
+        grid_map.nav_nodes = {
+            node_id: tuple(node) for node_id, node in topo["nav_nodes"].items()
+        }
+        grid_map.nav_edges = collections.defaultdict(dict, topo["nav_edges"])
+        grid_map._rebuild_nav_index()
+        return grid_map
+
     def world_to_grid(self, x: float, y: float) -> tuple[int, int]:
         """Convert world coordinates to grid coordinates"""
         grid_x = int(x // self.resolution + self.width // 2 + self.base_offset_x)
         grid_y = int(y // self.resolution + self.height // 2 + self.base_offset_y)
         return min(max(0, grid_x), self.width - 1), min(max(0, grid_y), self.height - 1)
 
+    def world_to_cells(
+        self, xs: np.ndarray, ys: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Convert arrays of world coordinates to grid coordinates, without clamping"""
+        grid_xs = np.floor_divide(xs, self.resolution).astype(np.intp)
+        grid_ys = np.floor_divide(ys, self.resolution).astype(np.intp)
+        return (
+            grid_xs + self.width // 2 + self.base_offset_x,
+            grid_ys + self.height // 2 + self.base_offset_y,
+        )
+
     def grid_to_world(self, grid_x: int, grid_y: int) -> tuple[float, float]:
         """Convert grid coordinates to world coordinates"""
         x = (grid_x - self.width // 2 - self.base_offset_x) * self.resolution
@@ -73,6 +194,19 @@ class OccupancyGridMap:
             else:
                 self.grid[grid_y, grid_x] += self.log_odds_free
 
+    def update_cells(
+        self, grid_xs: np.ndarray, grid_ys: np.ndarray, log_odds: np.ndarray | float
+    ):
+        """Add log-odds updates to multiple cells, cells outside the map are ignored"""
+        log_odds = np.broadcast_to(log_odds, np.shape(grid_xs))
+        inside = (
+            (grid_xs >= 0)
+            & (grid_xs < self.width)
+            & (grid_ys >= 0)
+            & (grid_ys < self.height)
+        )
+        np.add.at(self.grid, (grid_ys[inside], grid_xs[inside]), log_odds[inside])
+
     def is_occupied(self, grid_x: int, grid_y: int) -> bool | None:
         """Check if a cell is occupied"""
         if 0 <= grid_x < self.width and 0 <= grid_y < self.height:
@@ -106,38 +240,48 @@ class OccupancyGridMap:
         # Update map attributes
         self.grid = new_grid
 
-        # Update base offsets to maintain world coordinate consistency
-        self.base_offset_x += x_offset
-        self.base_offset_y += y_offset
+        # Update base offsets to maintain world coordinate consistency, the origin
+        # moves with the copied data while the map center moves by half the growth
+        self.base_offset_x += x_offset - (new_width // 2 - self.width // 2)
+        self.base_offset_y += y_offset - (new_height // 2 - self.height // 2)
 
         self.width = new_width
         self.height = new_height
 
         return x_offset, y_offset  # Return the offset for the original map
 
+    def fit_bounds(self, min_x: float, min_y: float, max_x: float, max_y: float):
+        """Expand the map until a rectangle in world coordinates is inside it"""
+        while True:
+            (grid_x0, grid_x1), (grid_y0, grid_y1) = self.world_to_cells(
+                np.array([min_x, max_x]), np.array([min_y, max_y])
+            )
+            if (
+                0 <= grid_x0
+                and grid_x1 < self.width
+                and 0 <= grid_y0
+                and grid_y1 < self.height
+            ):
+                return
+            self.expand_map()
+
     def justify_map(self, factor: float = 1.4):
         """
         Readjust the map size to center the current content and leave space according to the factor
         """
         # Find the range of areas with content on the map
-        occupied_cells = []
         threshold = 0.1  # Use a threshold to determine which cells are considered "with content"
-
-        for y in range(self.height):
-            for x in range(self.width):
-                # Check if the cell has content (not in unknown state)
-                if abs(self.grid[y, x]) > threshold:
-                    occupied_cells.append((x, y))
+        content = np.abs(self.grid) > threshold
+        content_rows = np.flatnonzero(content.any(axis=1))
+        content_cols = np.flatnonzero(content.any(axis=0))
 
         # If there are no cells with content, keep the map unchanged
-        if not occupied_cells:
+        if len(content_rows) == 0:
             return
 
         # Determine the boundaries of the area with content
-        min_x = min(x for x, _ in occupied_cells)
-        max_x = max(x for x, _ in occupied_cells)
-        min_y = min(y for _, y in occupied_cells)
-        max_y = max(y for _, y in occupied_cells)
+        min_x, max_x = int(content_cols[0]), int(content_cols[-1])
+        min_y, max_y = int(content_rows[0]), int(content_rows[-1])
 
         # Calculate the width and height of the area with content
         content_width = max_x - min_x + 1
@@ -159,13 +303,9 @@ class OccupancyGridMap:
         y_offset = (new_height - content_height) // 2
 
         # Copy the area with content to the new map
-        for old_y in range(min_y, max_y + 1):
-            for old_x in range(min_x, max_x + 1):
-                if 0 <= old_y < self.height and 0 <= old_x < self.width:
-                    new_y = y_offset + (old_y - min_y)
-                    new_x = x_offset + (old_x - min_x)
-                    if 0 <= new_y < new_height and 0 <= new_x < new_width:
-                        new_grid[new_y, new_x] = self.grid[old_y, old_x]
+        new_grid[
+            y_offset : y_offset + content_height, x_offset : x_offset + content_width
+        ] = self.grid[min_y : max_y + 1, min_x : max_x + 1]
 
         # Save the dimensions and offsets of the old map for subsequent calculations
         old_width = self.width
@@ -198,6 +338,25 @@ class OccupancyGridMap:
         self.nav_edges[node_id1][node_id2] = cost
         self.nav_edges[node_id2][node_id1] = cost
 
+    def _add_nav_node(
+        self, node_id: str, pose_index: int, x: float, y: float, node_desc: str
+    ):
+        node = (pose_index, x, y, node_desc)
+        self.nav_nodes[node_id] = node
+        self._index_nav_node(node_id, x, y, node_desc)
+        self.nav_version += 1
+        for listener in list(self._nav_listeners):
+            try:
+                listener(node_id, node)
+            except Exception as e:
+                bt.logging.error(f"Navigation node listener error: {e}")
+
+    def move_nav_node(self, node_id: str, x: float, y: float):
+        """Move a navigation node, e.g. to its pose after a SLAM correction"""
+        pose_index, _, _, node_desc = self.nav_nodes[node_id]
+        self.nav_nodes[node_id] = (pose_index, x, y, node_desc)
+        self._nav_index.move(node_id, x, y)
+
     def update_nav_topo(
         self,
         pose_index: int,
@@ -212,10 +371,9 @@ class OccupancyGridMap:
         node_candidates = []
 
         # Find nodes within euclidean distance threshold
-        for nid, (_, nx, ny, _) in self.nav_nodes.items():
-            # Directly use world coordinates to calculate Euclidean distance
-            e_dist = ((x - nx) ** 2 + (y - ny) ** 2) ** 0.5
+        for nid, e_dist in self._nav_index.nearby(x, y, e_dist_threshold):
             if e_dist < e_dist_threshold:
+                _, nx, ny, _ = self.nav_nodes[nid]
                 node_candidates.append((nid, nx, ny, e_dist))
 
         # Use dstar lite to find the nearest node by path distance
@@ -242,24 +400,24 @@ class OccupancyGridMap:
 
         path_step_threshold = 15.0
         # If node_id is specified, create a new node anyway
-        if node_id == nearest_node:
+        if node_id is not None and node_id == nearest_node:
             bt.logging.warning(
                 f"Duplicate node id {node_id}. No new navigation node added"
             )
         elif node_id is not None:
             if nearest_node is not None:
-                self.nav_nodes[node_id] = (pose_index, x, y, node_desc)
+                self._add_nav_node(node_id, pose_index, x, y, node_desc)
                 self._add_nav_edge(node_id, nearest_node, nearest_step)
                 bt.logging.debug(
                     f"Added navigation node {node_id} with edge to {nearest_node}"
                 )
             elif allow_isolated:
-                self.nav_nodes[node_id] = (pose_index, x, y, node_desc)
+                self._add_nav_node(node_id, pose_index, x, y, node_desc)
                 bt.logging.debug(f"Added isolated navigation node {node_id}")
         # If no candidates, add an isolated node
         elif not node_candidates and allow_isolated:
             node_id = f"{ANONYMOUS_NODE_PREFIX}{len(self.nav_nodes)}_{pose_index}"
-            self.nav_nodes[node_id] = (pose_index, x, y, node_desc)
+            self._add_nav_node(node_id, pose_index, x, y, node_desc)
             bt.logging.debug(
                 f"Added isolated navigation node {node_id} (no nearby nodes)"
             )
@@ -267,7 +425,7 @@ class OccupancyGridMap:
         # Else if nearest step is greater than threshold, add a new node
         elif nearest_node is not None and nearest_step > path_step_threshold:
             node_id = f"{ANONYMOUS_NODE_PREFIX}{len(self.nav_nodes)}_{pose_index}"
-            self.nav_nodes[node_id] = (pose_index, x, y, node_desc)
+            self._add_nav_node(node_id, pose_index, x, y, node_desc)
             self._add_nav_edge(node_id, nearest_node, nearest_step)
             bt.logging.debug(
                 f"Added anonymous navigation node {node_id} with edge to {nearest_node}"
@@ -955,14 +1113,29 @@ class OccupancyGridMap:
         return nearest_node
 
     def get_nav_nodes(
-        self, x: float = None, y: float = None, range: float = 20.0
+        self,
+        x: float = None,
+        y: float = None,
+        range: float = 20.0,
+        labeled_only: bool = False,
     ) -> list[str]:
+        """
+        Navigation node ids, all of them or those within `range` of a position
+        (nearest first)
+
+        Args:
+            x, y: World coordinates to search around, None for all nodes
+            range: Search radius in meters
+            labeled_only: Exclude the anonymous nodes
+        """
         if x is None or y is None:
+            if labeled_only:
+                return list(self.labeled_nodes)
             return list(self.nav_nodes.keys())
 
-        nodes_in_radius = []
-        for node_id, (_, node_x, node_y, node_desc) in self.nav_nodes.items():
-            distance = ((node_x - x) ** 2 + (node_y - y) ** 2) ** 0.5
-            if distance <= range:
-                nodes_in_radius.append(node_id)
-        return nodes_in_radius
+        nearby = sorted(self._nav_index.nearby(x, y, range), key=lambda n: n[1])
+        return [
+            node_id
+            for node_id, _ in nearby
+            if not labeled_only or node_id in self.labeled_nodes
+        ]
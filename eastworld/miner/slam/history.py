@@ -0,0 +1,171 @@
+# The MIT License (MIT)
+# Copyright © 2025 Eastworld AI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import os
+
+import numpy as np
+
+# Lidar directions by column, counter-clockwise from east like the compass angles
+DIRECTIONS = (
+    "east",
+    "northeast",
+    "north",
+    "northwest",
+    "west",
+    "southwest",
+    "south",
+    "southeast",
+)
+DIRECTION_COLUMNS = {direction: i for i, direction in enumerate(DIRECTIONS)}
+
+
+def lidar_ranges(lidar_data: dict[str, float]) -> np.ndarray:
+    """Lidar readings as a float32 row in `DIRECTIONS` order, NaN if missing"""
+    row = np.full(len(DIRECTIONS), np.nan, np.float32)
+    for direction, distance in lidar_data.items():
+        row[DIRECTION_COLUMNS[direction]] = distance
+    return row
+
+
+class SensorHistory:
+    """
+    Lidar readings by pose index, stored as float32 ranges with a column per
+    direction and NaN for missing directions. Rows are allocated in chunks of
+    `chunk_size` poses. With a spill directory, chunks older than the latest
+    `memory_chunks` are written to .npy files and memory-mapped read-only.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = 1024,
+        memory_chunks: int = 4,
+        spill_dir: str | None = None,
+    ):
+        self.chunk_size = chunk_size
+        self.memory_chunks = memory_chunks
+        self.spill_dir = spill_dir
+        self._chunks: dict[int, np.ndarray | None] = {}
+        self._spilled: set[int] = set()
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, pose_index: int) -> bool:
+        row = self._row(pose_index)
+        return row is not None and not np.isnan(row).all()
+
+    def __getstate__(self):
+        # Spilled chunks are reopened from their files
+        state = self.__dict__.copy()
+        state["_chunks"] = {
+            chunk_id: None if chunk_id in self._spilled else chunk
+            for chunk_id, chunk in self._chunks.items()
+        }
+        return state
+
+    def _chunk_file(self, chunk_id: int) -> str:
+        return os.path.join(self.spill_dir, f"sensor_{chunk_id:06d}.npy")
+
+    def _chunk(self, chunk_id: int) -> np.ndarray | None:
+        chunk = self._chunks.get(chunk_id)
+        if chunk is None and chunk_id in self._spilled:
+            chunk = np.load(self._chunk_file(chunk_id), mmap_mode="r")
+            self._chunks[chunk_id] = chunk
+        return chunk
+
+    def _row(self, pose_index: int) -> np.ndarray | None:
+        chunk_id, offset = divmod(pose_index, self.chunk_size)
+        chunk = self._chunk(chunk_id)
+        return None if chunk is None else chunk[offset]
+
+    def add(self, pose_index: int, lidar_data: dict[str, float]):
+        """Record the lidar readings of a pose"""
+        chunk_id, offset = divmod(pose_index, self.chunk_size)
+        chunk = self._chunk(chunk_id)
+        if chunk is None:
+            chunk = np.full((self.chunk_size, len(DIRECTIONS)), np.nan, np.float32)
+            self._chunks[chunk_id] = chunk
+            self._spill(chunk_id)
+        elif chunk_id in self._spilled:
+            # Spilled chunks are read-only, pose indices only move forward
+            raise ValueError(f"Pose {pose_index} is already spilled to disk")
+
+        row = chunk[offset]
+        if np.isnan(row).all():
+            self._count += 1
+        row[:] = lidar_ranges(lidar_data)
+
+    def get(self, pose_index: int) -> dict[str, float] | None:
+        """Lidar readings of a pose, None if none were recorded"""
+        row = self._row(pose_index)
+        if row is None:
+            return None
+        columns = np.flatnonzero(~np.isnan(row))
+        if len(columns) == 0:
+            return None
+        return {DIRECTIONS[i]: float(row[i]) for i in columns}
+
+    def pose_indices(self) -> np.ndarray:
+        """Indices of the poses with readings, in ascending order"""
+        indices = [
+            chunk_id * self.chunk_size
+            + np.flatnonzero(~np.isnan(self._chunk(chunk_id)).all(axis=1))
+            for chunk_id in sorted(self._chunks)
+        ]
+        return np.concatenate(indices) if indices else np.zeros(0, dtype=np.intp)
+
+    def ranges(self, pose_indices: np.ndarray) -> np.ndarray:
+        """Ranges of the given poses as a float32 [N, 8] array, NaN if missing"""
+        pose_indices = np.asarray(pose_indices, dtype=np.intp)
+        ranges = np.full((len(pose_indices), len(DIRECTIONS)), np.nan, np.float32)
+        chunk_ids, offsets = np.divmod(pose_indices, self.chunk_size)
+        for chunk_id in np.unique(chunk_ids):
+            chunk = self._chunk(int(chunk_id))
+            if chunk is not None:
+                mask = chunk_ids == chunk_id
+                ranges[mask] = chunk[offsets[mask]]
+        return ranges
+
+    def _spill(self, latest_chunk_id: int):
+        """Write the chunks before the latest `memory_chunks` to the spill directory"""
+        if self.spill_dir is None:
+            return
+        for chunk_id, chunk in list(self._chunks.items()):
+            if (
+                chunk_id in self._spilled
+                or chunk_id > latest_chunk_id - self.memory_chunks
+            ):
+                continue
+            os.makedirs(self.spill_dir, exist_ok=True)
+            filename = self._chunk_file(chunk_id)
+            # Write to a temporary file and rename, so a crash leaves no partial chunk
+            with open(filename + ".tmp", "wb") as f:
+                np.save(f, chunk)
+            os.replace(filename + ".tmp", filename)
+            self._spilled.add(chunk_id)
+            self._chunks[chunk_id] = np.load(filename, mmap_mode="r")
+
+    @classmethod
+    def from_dict(cls, sensor_data: dict[int, dict[str, float]], **kwargs):
+        """Build a history from readings by pose index, as saved before the history"""
+        history = cls(**kwargs)
+        for pose_index, lidar_data in sorted(sensor_data.items()):
+            if lidar_data:
+                history.add(pose_index, lidar_data)
+        return history
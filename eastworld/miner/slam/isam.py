@@ -17,21 +17,61 @@
 
 
 import collections
+import concurrent.futures
+import contextlib
+import functools
 import json
 import math
 import os
 import pickle
+import queue
+import shutil
+import struct
+import threading
 import traceback
+import uuid
+from typing import Callable, Iterable, TypeVar
 
 import bittensor as bt
 import gtsam
 import numpy as np
 from gtsam import symbol, symbolChr, symbolIndex
 
+from eastworld.miner.slam.beams import get_beam_templates
 from eastworld.miner.slam.grid import OccupancyGridMap
+from eastworld.miner.slam.history import DIRECTIONS, SensorHistory, lidar_ranges
+from eastworld.miner.slam.keyframes import KeyFrameIndex
+from eastworld.miner.slam.landmarks import LandmarkIndex
+from eastworld.miner.slam.submap import Submap
 
 SENSOR_MAX_RANGE = 50.0
 
+T = TypeVar("T")
+
+# Steps since the last snapshot are appended to the write-ahead log
+SNAPSHOT_FILENAME = "snapshot.pkl"
+WAL_FILENAME = "steps.wal"
+# Binary grid map exported for the console
+MAP_FILENAME = "map.npz"
+# Old sensor history chunks are spilled to this subdirectory, in a directory of
+# their own per history so a new history never overwrites the chunks of the
+# history a snapshot refers to
+SENSOR_DIRNAME = "sensor"
+# Length prefix of a write-ahead log record
+WAL_HEADER = struct.Struct("<I")
+
+
+@contextlib.contextmanager
+def _atomic_open(filename: str, mode: str = "wb"):
+    """
+    Open a file for writing. The file is written to a temporary path first and
+    renamed, so readers never see a partial file.
+    """
+    tmp_filename = filename + ".tmp"
+    with open(tmp_filename, mode) as f:
+        yield f
+    os.replace(tmp_filename, filename)
+
 
 class ISAM2:
     direction_to_angle = {
@@ -44,17 +84,59 @@ class ISAM2:
         "west": np.pi,  # 180 degrees or -180 degrees - left
         "northwest": 3 * np.pi / 4,  # 135 degrees - upper left
     }
+    # Angles of the sensor history columns
+    direction_angles = np.array(list(map(direction_to_angle.get, DIRECTIONS)))
 
     def __init__(
         self,
         load_data: bool = False,
         data_dir: str = "slam_data",
         save_interval: int = 5,
+        snapshot_interval: int = 100,
+        background: bool = False,
+        smoother_lag: float | None = None,
+        reset: bool = False,
     ):
         # Create data save directory
         self.data_dir = data_dir
+        # The map and metadata are exported every `save_interval` poses, the full
+        # state every `snapshot_interval` poses. Steps in between are only
+        # appended to the write-ahead log.
         self.save_interval = save_interval
+        self.snapshot_interval = snapshot_interval
         os.makedirs(self.data_dir, exist_ok=True)
+        self._wal = None
+        self._wal_seq = 0
+        self._replaying = False
+
+        # In background mode submitted steps are integrated by a worker thread,
+        # the pose is dead-reckoned from the odometry until the worker catches up.
+        # The lock guards the SLAM state against the worker.
+        self.background = background
+        self.lock = threading.RLock()
+        self._queue: queue.Queue[Callable[[], None]] = queue.Queue()
+        self._worker: threading.Thread | None = None
+        self._should_exit = False
+
+        # Full estimates are cached until the next solver update
+        self._estimate_version = 0
+        self._estimate_cache: tuple[int, gtsam.Values] | None = None
+        self._num_variables = 0
+
+        # With a smoother lag, poses older than the lag (in poses) and landmarks not
+        # observed within it are marginalised into priors on the remaining ones,
+        # instead of resetting the graph when it grows too large. The latest key
+        # frames are kept for loop closure.
+        self.smoother_lag = smoother_lag
+        self.smoother: gtsam.IncrementalFixedLagSmoother | None = None
+
+        self._pose_lock = threading.Lock()
+        self._published_pose = (0.0, 0.0, 0.0)
+        self._pending_dx = 0.0
+        self._pending_dy = 0.0
+        self._pending_steps = 0
+        self._submitted_index = 0
+        self.pose_version = 0
 
         try:
             self.isam_params = gtsam.ISAM2Params()
@@ -68,13 +150,43 @@ class ISAM2:
             huber = gtsam.noiseModel.mEstimator.Huber(1.345)
             self.loop_noise = gtsam.noiseModel.Robust.Create(huber, noise)
 
+            # Lidar end points within this distance of a landmark observed in the
+            # recent poses observe that landmark instead of adding a new one.
+            # Older landmarks are left to loop closure, associating them would
+            # re-eliminate old parts of the Bayes tree on every step.
+            self.landmark_gate = 0.5
+            self.landmark_window = 50
+
+            # Key frames are matched within this distance of the current pose, and
+            # at least this many poses back
+            self.key_frame_radius = 100.0
+            self.key_frame_gap = 10
+            # Number of key frames kept by the smoother
+            self.key_frame_retention = 10
+
             self.max_graph_size = 100_000 * 9
             self.max_segment_poses = self.max_graph_size // 10
 
+            # Scans are integrated into submaps anchored to a pose, a new submap
+            # starts at each key frame or after this many scans
+            self.submap_max_scans = 20
+            # Submaps are moved in the grid map on rebuild when their anchor pose
+            # estimate moved further than these thresholds
+            self.rebuild_distance_threshold = 0.5
+            self.rebuild_angle_threshold = 0.01
+
             if load_data:
                 self.load(self.data_dir)
+                self._open_wal()
             else:
                 self._reset_isam()
+                if reset:
+                    # Start a new log, the snapshot of the initial state supersedes
+                    # any data left in the directory
+                    self.save()
+                # Otherwise data left in the directory is kept until the first step,
+                # its snapshot starts the log
+            self._publish_pose()
         except Exception as e:
             bt.logging.error(f"GTSAM initialization error: {e}")
             traceback.print_exc()
@@ -88,7 +200,7 @@ class ISAM2:
         ] = collections.deque(maxlen=10)
         self.segments.append((gtsam.NonlinearFactorGraph(), gtsam.Values()))
 
-        self.isam = gtsam.ISAM2(self.isam_params)
+        self._new_isam()
         self.pose_index = 0
         self.landmark_index = 0
 
@@ -102,22 +214,122 @@ class ISAM2:
         current_key = symbol("x", self.pose_index)
         values = gtsam.Values()
         graph = gtsam.NonlinearFactorGraph()
-        values.insert(current_key, self.current_pose)
-        self.segments[-1][1].insert(current_key, self.current_pose)
+        self._add_value(values, current_key, self.current_pose)
         factor = gtsam.PriorFactorPose2(
             current_key, self.current_pose, self.prior_noise
         )
-        graph.add(factor)
-        self.segments[-1][0].add(factor)
-        self.isam.update(graph, values)
+        self._add_factor(graph, factor)
+        self._update_isam(graph, values)
 
-        self.sensor_data: dict[int, dict] = {}
-        self.key_frames: dict[tuple, tuple[int, gtsam.Pose2]] = {}
+        self.sensor_data = SensorHistory(
+            spill_dir=os.path.join(self.data_dir, SENSOR_DIRNAME, uuid.uuid4().hex[:8])
+        )
+        self.landmarks = LandmarkIndex(self.landmark_gate)
+        # Submaps by anchor pose index, the grid map is their composition
+        self.submaps: dict[int, Submap] = {}
+        self.active_submap: Submap | None = None
+        self.integrated_pose_index = -1
+        self.key_frames = KeyFrameIndex(self.key_frame_radius)
         self.last_key_frame = self.pose_index
         self.last_loop_frame = self.pose_index
 
         self._rebuild_grid_map()
 
+    def _new_isam(self):
+        """Replace the ISAM2 solver with an empty one"""
+        if self.smoother_lag is not None:
+            self.smoother = gtsam.IncrementalFixedLagSmoother(
+                self.smoother_lag, self.isam_params
+            )
+            # The smoother's solver, queried like a plain ISAM2
+            self.isam = self.smoother.getISAM2()
+        else:
+            self.isam = gtsam.ISAM2(self.isam_params)
+        self._num_variables = 0
+        self._estimate_version += 1
+
+    def _update_isam(
+        self,
+        graph: gtsam.NonlinearFactorGraph,
+        values: gtsam.Values,
+        timestamps: dict[int, float] | None = None,
+    ):
+        """Update the ISAM2 solver, invalidating the cached estimate"""
+        self._estimate_version += 1
+        if self.smoother is not None:
+            if timestamps is None:
+                timestamps = self._timestamps(values)
+            try:
+                self.smoother.update(graph, values, timestamps)
+            except ValueError as e:
+                # Marginalising fails for variables outside the leaf cliques of the
+                # Bayes tree, which loop closures can cause. The update itself went
+                # through, eliminate the smoother factors again in a batch.
+                state = self._smoother_state()
+                if not all(state[1].exists(key) for key in values.keys()):
+                    raise
+                bt.logging.warning(f"Rebuilding smoother after failed update: {e}")
+                self._new_isam()
+                self.smoother.update(*state)
+                self._num_variables = state[1].size()
+                return
+        else:
+            self.isam.update(graph, values)
+        self._num_variables += values.size()
+
+    def _timestamps(
+        self, values: gtsam.Values, refresh: Iterable[int] = ()
+    ) -> dict[int, float]:
+        """
+        Smoother timestamps of new variables, poses are stamped with their index and
+        landmarks with the current pose index. Refreshed variables are stamped with
+        the current pose index, so they are not marginalised.
+        """
+        timestamps = {}
+        for key in values.keys():
+            if chr(symbolChr(key)) == "x":
+                timestamps[key] = float(symbolIndex(key))
+            else:
+                timestamps[key] = float(self.pose_index)
+        for key in refresh:
+            timestamps[key] = float(self.pose_index)
+        return timestamps
+
+    def _add_value(self, values: gtsam.Values, key: int, value):
+        """Add a new variable to a solver update, and to the current segment"""
+        values.insert(key, value)
+        if self.smoother is None:
+            self.segments[-1][1].insert(key, value)
+
+    def _add_factor(self, graph: gtsam.NonlinearFactorGraph, factor):
+        """Add a new factor to a solver update, and to the current segment"""
+        graph.add(factor)
+        if self.smoother is None:
+            self.segments[-1][0].add(factor)
+
+    def _estimate(self) -> gtsam.Values:
+        """Estimate of all variables, computed at most once per solver update"""
+        if self._estimate_cache is None or (
+            self._estimate_cache[0] != self._estimate_version
+        ):
+            self._estimate_cache = (
+                self._estimate_version,
+                self.isam.calculateEstimate(),
+            )
+        return self._estimate_cache[1]
+
+    def _pose_estimate(self, pose_index: int) -> gtsam.Pose2 | None:
+        """Estimate of a single pose, without computing the full estimate"""
+        key = symbol("x", pose_index)
+        if self._estimate_cache is not None and (
+            self._estimate_cache[0] == self._estimate_version
+        ):
+            result = self._estimate_cache[1]
+            return result.atPose2(key) if result.exists(key) else None
+        if not self.isam.valueExists(key):
+            return None
+        return self.isam.calculateEstimatePose2(key)
+
     def _new_segment(self):
         if len(self.segments) >= self.segments.maxlen:
             self.segments.popleft()
@@ -126,7 +338,7 @@ class ISAM2:
     def _reset_graph(self):
         bt.logging.warning(f"Reset GTSAM graph structure: {self.current_pose}")
 
-        self.isam = gtsam.ISAM2(self.isam_params)
+        self._new_isam()
         all_values = gtsam.Values()
         while len(self.segments) > self.segments.maxlen // 2:
             discard_graph, discard_values = self.segments.popleft()
@@ -134,14 +346,17 @@ class ISAM2:
 
         prior_set = False
         for graph, values in self.segments:
-            result = self.isam.calculateEstimate()
             for i in range(graph.size()):
                 factor = graph.at(i)
                 for key in factor.keys():
-                    if not values.exists(key) and (result and not result.exists(key)):
+                    if not values.exists(key) and not self.isam.valueExists(key):
                         bt.logging.info(
                             f"Adding missing pose: {i} {chr(symbolChr(key))} {symbolIndex(key)}"
                         )
+                        if chr(symbolChr(key)) == "l":
+                            # Landmarks are shared between segments
+                            values.insert(key, all_values.atPoint2(key))
+                            continue
                         pose = all_values.atPose2(key)
                         values.insert(key, pose)
                         if not prior_set and chr(symbolChr(key)) == "x":
@@ -152,7 +367,7 @@ class ISAM2:
                             graph.add(factor)
                             prior_set = True
 
-            self.isam.update(graph, values)
+            self._update_isam(graph, values)
             bt.logging.info(f"Adding graph structure: {graph.size()} {values.size()}")
 
         self.segments.append((gtsam.NonlinearFactorGraph(), gtsam.Values()))
@@ -160,36 +375,28 @@ class ISAM2:
     def _check_key_frame(
         self, lidar_data: dict[str, float]
     ) -> tuple[int | None, gtsam.Pose2 | None]:
-        # Sensor data precision is 1 meter, used as signature directly
-        signature = tuple(
-            lidar_data.get(d, SENSOR_MAX_RANGE + 1)
-            for d in self.direction_to_angle.keys()
+        signature = self._signature(lidar_data)
+        match_frame_id = self.key_frames.match(
+            self.current_pose.x(),
+            self.current_pose.y(),
+            signature,
+            self.key_frame_radius,
+            before=self.pose_index - self.key_frame_gap,
+            # Key frame pose may have been expired and cleared
+            is_valid=lambda i: self.isam.valueExists(symbol("x", i)),
         )
-
-        match_frame_id, match_frame_pose = self.key_frames.get(signature, (None, None))
-        if match_frame_id and match_frame_pose:
-            # Calculate distance between current pose and key frame pose
-            dx = self.current_pose.x() - match_frame_pose.x()
-            dy = self.current_pose.y() - match_frame_pose.y()
-            distance = math.sqrt(dx**2 + dy**2)
+        if match_frame_id is not None:
+            match_frame_pose = gtsam.Pose2(*self.key_frames.pose(match_frame_id))
+            distance = math.hypot(
+                self.current_pose.x() - match_frame_pose.x(),
+                self.current_pose.y() - match_frame_pose.y(),
+            )
             bt.logging.info(
                 f"Matched key frame: {self.pose_index} > {match_frame_id} {distance}"
             )
-            if distance < 100:
-                # Key frame pose may have been expired and cleared
-                if self.isam.calculateBestEstimate().exists(
-                    symbol("x", match_frame_id)
-                ):
-                    return match_frame_id, match_frame_pose
-                else:
-                    bt.logging.debug(
-                        f"Key frame pose has been cleared {match_frame_id}"
-                    )
-                    self.key_frames.pop(signature)
-            else:
-                return None, None
+            return match_frame_id, match_frame_pose
 
-        if abs(self.pose_index - self.last_key_frame) < 10:
+        if abs(self.pose_index - self.last_key_frame) < self.key_frame_gap:
             return None, None
 
         # Calculate signature gradient, ignore frames with unclear features
@@ -200,12 +407,195 @@ class ISAM2:
         if gradient_score < 50:
             return None, None
 
-        self.key_frames[tuple(signature)] = (self.pose_index, self.current_pose)
+        self.key_frames.add(
+            self.pose_index,
+            self.current_pose.x(),
+            self.current_pose.y(),
+            self.current_pose.theta(),
+            signature,
+        )
         self.last_key_frame = self.pose_index
+        if (
+            self.smoother is not None
+            and len(self.key_frames) > self.key_frame_retention
+        ):
+            # The oldest key frame is left to the smoother to marginalise
+            self.key_frames.remove(min(self.key_frames))
         return None, None
 
+    def _signature(self, lidar_data: dict[str, float]) -> tuple[float, ...]:
+        # Sensor data precision is 1 meter, used as signature directly
+        return tuple(
+            lidar_data.get(d, SENSOR_MAX_RANGE + 1)
+            for d in self.direction_to_angle.keys()
+        )
+
+    def _key_frame_offset(
+        self, key_frame_id: int, lidar_data: dict[str, float]
+    ) -> tuple[float, float]:
+        """
+        Position of a matched key frame relative to the current pose, estimated from
+        the differences of the axis-aligned lidar readings
+        """
+        readings = dict(zip(self.direction_to_angle, self._signature(lidar_data)))
+        key_frame_readings = dict(
+            zip(self.direction_to_angle, self.key_frames.signatures[key_frame_id])
+        )
+        offset = []
+        for forward, backward in [("east", "west"), ("north", "south")]:
+            estimates = []
+            for direction, sign in [(forward, 1), (backward, -1)]:
+                current, key_frame = readings[direction], key_frame_readings[direction]
+                if current <= SENSOR_MAX_RANGE and key_frame <= SENSOR_MAX_RANGE:
+                    estimates.append(sign * (current - key_frame))
+            offset.append(sum(estimates) / len(estimates) if estimates else 0.01)
+        return offset[0], offset[1]
+
     def get_current_pose(self) -> tuple[float, float, float]:
-        return self.current_x, self.current_y, self.current_theta
+        """Latest pose, dead-reckoned over the submitted steps not integrated yet"""
+        if not self.background:
+            return self.current_x, self.current_y, self.current_theta
+        return self._published_pose
+
+    @property
+    def latest_pose_index(self) -> int:
+        """Pose index of the latest submitted step"""
+        return self._submitted_index
+
+    def submit(
+        self, lidar_data: dict[str, float], odometry: float, odometry_direction: str
+    ):
+        """
+        Integrate a SLAM step. In background mode the step is queued for the worker
+        thread and the current pose is dead-reckoned right away.
+        """
+        if not self.background:
+            with self.lock:
+                self.run_iteration(lidar_data, odometry, odometry_direction)
+                self._publish_pose()
+            return
+
+        displacement = None
+        angle_rad = self.direction_to_angle.get(odometry_direction)
+        if odometry > 0 and angle_rad is not None:
+            dx = odometry * math.cos(angle_rad)
+            dy = odometry * math.sin(angle_rad)
+            displacement = (dx, dy)
+            with self._pose_lock:
+                self._pending_dx += dx
+                self._pending_dy += dy
+                self._pending_steps += 1
+                self._submitted_index += 1
+                x, y, theta = self._published_pose
+                self._published_pose = (x + dx, y + dy, theta)
+                self.pose_version += 1
+
+        self._queue.put(
+            functools.partial(
+                self._run_step, lidar_data, odometry, odometry_direction, displacement
+            )
+        )
+
+    def schedule(self, callback: Callable[["ISAM2"], None]):
+        """
+        Run a callback with the SLAM state once the submitted steps are integrated,
+        in the worker thread in background mode
+        """
+        if not self.background:
+            with self.lock:
+                callback(self)
+            return
+        self._queue.put(functools.partial(callback, self))
+
+    def call(self, callback: Callable[["ISAM2"], T]) -> concurrent.futures.Future[T]:
+        """
+        Run a callback like `schedule` and return a future of its result. In
+        background mode the worker thread owns the SLAM state, so CPU-bound work on
+        it, like path planning, is run there instead of the caller's event loop.
+        """
+        future: concurrent.futures.Future[T] = concurrent.futures.Future()
+
+        def run(slam: "ISAM2"):
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(callback(slam))
+            except Exception as e:
+                future.set_exception(e)
+
+        self.schedule(run)
+        return future
+
+    def start(self):
+        """Start the worker thread of background mode"""
+        if not self.background or self._worker is not None:
+            return
+        self._should_exit = False
+        self._worker = threading.Thread(target=self._work, daemon=True)
+        self._worker.start()
+
+    def stop(self, timeout: float = 30.0):
+        """Stop the worker thread once the queued work is done"""
+        if self._worker is None:
+            return
+        self._should_exit = True
+        self._worker.join(timeout)
+        self._worker = None
+
+    def flush(self):
+        """Block until the queued work is done"""
+        if self._worker is not None:
+            self._queue.join()
+
+    def _work(self):
+        while True:
+            try:
+                task = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                if self._should_exit:
+                    return
+                continue
+
+            try:
+                with self.lock:
+                    task()
+            except Exception as e:
+                bt.logging.error(f"SLAM worker error: {e}")
+                traceback.print_exc()
+            finally:
+                self._queue.task_done()
+
+    def _run_step(
+        self,
+        lidar_data: dict[str, float],
+        odometry: float,
+        odometry_direction: str,
+        displacement: tuple[float, float] | None,
+    ):
+        try:
+            self.run_iteration(lidar_data, odometry, odometry_direction)
+        finally:
+            if displacement is not None:
+                with self._pose_lock:
+                    self._pending_dx -= displacement[0]
+                    self._pending_dy -= displacement[1]
+                    self._pending_steps -= 1
+            self._publish_pose()
+
+    def _publish_pose(self):
+        """Publish the optimised pose, dead-reckoned over the queued steps"""
+        with self._pose_lock:
+            if self._pending_steps == 0:
+                # Drop accumulated rounding errors and resynchronise the index
+                self._pending_dx = 0.0
+                self._pending_dy = 0.0
+                self._submitted_index = self.pose_index
+            self._published_pose = (
+                self.current_x + self._pending_dx,
+                self.current_y + self._pending_dy,
+                self.current_theta,
+            )
+            self.pose_version += 1
 
     def run_iteration(
         self, lidar_data: dict[str, float], odometry: float, odometry_direction: str
@@ -213,6 +603,8 @@ class ISAM2:
         try:
             if odometry <= 0:
                 return
+            if not self._replaying:
+                self._append_wal(lidar_data, odometry, odometry_direction)
 
             # Update pose based on odometry
             angle_rad = self.direction_to_angle[odometry_direction]
@@ -243,25 +635,38 @@ class ISAM2:
                 between_factor = gtsam.BetweenFactorPose2(
                     prev_key, current_key, delta_pose, self.between_pose_noise
                 )
-                values.insert(current_key, self.current_pose)
-                self.segments[-1][1].insert(current_key, self.current_pose)
-                graph.add(between_factor)
-                self.segments[-1][0].add(between_factor)
+                self._add_value(values, current_key, self.current_pose)
+                self._add_factor(graph, between_factor)
 
                 # Process lidar data, add bearing and range factors
-                self.sensor_data[self.pose_index] = lidar_data
+                self.sensor_data.add(self.pose_index, lidar_data)
+                self.landmarks.prune(self.pose_index - self.landmark_window)
+                observed = set()
                 for direction, distance in lidar_data.items():
+                    if distance > SENSOR_MAX_RANGE:
+                        # Nothing was hit within range
+                        continue
                     try:
                         # Calculate landmark position in global coordinate system based on bearing and distance
                         bearing_angle = self.direction_to_angle[direction]
                         landmark_x = self.current_x + distance * math.cos(bearing_angle)
                         landmark_y = self.current_y + distance * math.sin(bearing_angle)
 
-                        landmark_key = symbol("l", self.landmark_index)
-                        point2 = gtsam.Point2(landmark_x, landmark_y)
-                        values.insert(landmark_key, point2)
-                        self.segments[-1][1].insert(landmark_key, point2)
-                        self.landmark_index += 1
+                        landmark_id = self._associate_landmark(
+                            landmark_x, landmark_y, observed
+                        )
+                        if landmark_id is None:
+                            landmark_id = self.landmark_index
+                            point2 = gtsam.Point2(landmark_x, landmark_y)
+                            self._add_value(values, symbol("l", landmark_id), point2)
+                            self.landmarks.add(
+                                landmark_id, landmark_x, landmark_y, self.pose_index
+                            )
+                            self.landmark_index += 1
+                        else:
+                            self.landmarks.observe(landmark_id, self.pose_index)
+                        observed.add(landmark_id)
+                        landmark_key = symbol("l", landmark_id)
 
                         # Add bearing and range factor
                         bearing = gtsam.Rot2(bearing_angle)
@@ -272,8 +677,7 @@ class ISAM2:
                             distance,
                             self.bearing_range_noise,
                         )
-                        graph.add(bearing_range_factor)
-                        self.segments[-1][0].add(bearing_range_factor)
+                        self._add_factor(graph, bearing_range_factor)
                     except Exception as e:
                         bt.logging.error(
                             f"Failed to process lidar measurement (direction: {direction}): {e}"
@@ -288,15 +692,17 @@ class ISAM2:
                         )
                         # Add loop closure factor
                         key_frame_symbol = symbol("x", key_frame_id)
-                        if self.isam.calculateBestEstimate().exists(key_frame_symbol):
+                        if self.isam.valueExists(key_frame_symbol):
+                            offset_x, offset_y = self._key_frame_offset(
+                                key_frame_id, lidar_data
+                            )
                             loop_factor = gtsam.BetweenFactorPose2(
                                 current_key,
                                 symbol("x", key_frame_id),
-                                gtsam.Pose2(0.01, 0.01, 0),
+                                gtsam.Pose2(offset_x, offset_y, 0),
                                 self.loop_noise,
                             )
-                            graph.add(loop_factor)
-                            self.segments[-1][0].add(loop_factor)
+                            self._add_factor(graph, loop_factor)
                             self.last_loop_frame = self.pose_index
                             close_loop = True
                         else:
@@ -305,11 +711,18 @@ class ISAM2:
                             )
 
                 try:
-                    self.isam.update(graph, values)
-                    result: gtsam.Values = self.isam.calculateEstimate()
+                    if self.smoother is not None:
+                        refresh = [symbol("l", i) for i in observed]
+                        refresh += [symbol("x", i) for i in self.key_frames]
+                        self._update_isam(
+                            graph, values, self._timestamps(values, refresh)
+                        )
+                    else:
+                        self._update_isam(graph, values)
+                    current_pose = self._pose_estimate(self.pose_index)
 
-                    if result.exists(current_key):
-                        self.current_pose = result.atPose2(current_key)
+                    if current_pose is not None:
+                        self.current_pose = current_pose
                         self.current_x = self.current_pose.x()
                         self.current_y = self.current_pose.y()
                         self.current_theta = self.current_pose.theta()
@@ -329,10 +742,12 @@ class ISAM2:
                     )
                     self._rebuild_grid_map()
                     self._reanchor_grid_map_nodes()
+                    self._reindex_landmarks()
+                    self._reindex_key_frames()
 
-                if result.size() > self.max_graph_size:
+                if self.smoother is None and self._num_variables > self.max_graph_size:
                     bt.logging.warning(
-                        f"GTSAM graph structure too large {result.size()}, simplifying"
+                        f"GTSAM graph structure too large {self._num_variables}, simplifying"
                     )
                     self._reset_graph()
 
@@ -343,48 +758,127 @@ class ISAM2:
                 bt.logging.error(f"GTSAM processing failed: {e}")
                 traceback.print_exc()
 
-            # Update grid map
-            self._update_grid_map(self.current_pose, lidar_data)
+            # Update grid map, unless a rebuild after loop closure already did
+            if self.pose_index > self.integrated_pose_index:
+                self._update_grid_map(self.current_pose, lidar_data, self.pose_index)
 
-            # Save map and trajectory periodically
-            if self.pose_index and self.pose_index % self.save_interval == 0:
-                self.save()
+            # Save the state and export the map periodically
+            if self.pose_index and not self._replaying:
+                if self._wal is None or self.pose_index % self.snapshot_interval == 0:
+                    self.save()
+                elif self.pose_index % self.save_interval == 0:
+                    self.export_map()
         except Exception as e:
             bt.logging.error(f"SLAM iteration error: {e}")
             traceback.print_exc()
 
+    def _associate_landmark(self, x: float, y: float, observed: set[int]) -> int | None:
+        """
+        Find the known landmark a lidar end point observes. A landmark is observed at
+        most once per scan.
+        """
+        while True:
+            landmark_id = self.landmarks.nearest(x, y, self.landmark_gate, observed)
+            if landmark_id is None:
+                return None
+            if self.isam.valueExists(symbol("l", landmark_id)):
+                return landmark_id
+            # Dropped from the graph when it was simplified
+            self.landmarks.remove(landmark_id)
+
+    def _reindex_landmarks(self):
+        """Move the indexed landmarks to their latest estimates"""
+        for landmark_id in self.landmarks:
+            key = symbol("l", landmark_id)
+            if self.isam.valueExists(key):
+                point = self.isam.calculateEstimatePoint2(key)
+                self.landmarks.move(landmark_id, point[0], point[1])
+            else:
+                self.landmarks.remove(landmark_id)
+
+    def _reindex_key_frames(self):
+        """Move the key frames to their latest pose estimates"""
+        for pose_index in self.key_frames:
+            pose = self._pose_estimate(pose_index)
+            if pose is None:
+                self.key_frames.remove(pose_index)
+            else:
+                self.key_frames.add(
+                    pose_index,
+                    pose.x(),
+                    pose.y(),
+                    pose.theta(),
+                    self.key_frames.signatures[pose_index],
+                )
+
     def _rebuild_grid_map(self):
+        """
+        Update the grid map to the latest pose estimates. Submaps whose anchor pose
+        moved are removed from the grid map and placed again at the new anchor.
+        """
+        moved = 0
+        for anchor_index, submap in self.submaps.items():
+            pose = self._pose_estimate(anchor_index)
+            if pose is None:
+                continue
+            old_x, old_y, old_theta = submap.placed_anchor
+            distance = math.hypot(pose.x() - old_x, pose.y() - old_y)
+            rotation = abs(math.remainder(pose.theta() - old_theta, 2 * math.pi))
+            if (
+                distance <= self.rebuild_distance_threshold
+                and rotation <= self.rebuild_angle_threshold
+            ):
+                continue
+
+            cell_xs, cell_ys, values = submap.cells()
+            self._place_cells(submap, cell_xs, cell_ys, -values)
+            submap.placed_anchor = (pose.x(), pose.y(), pose.theta())
+            self._place_cells(submap, cell_xs, cell_ys, values)
+            moved += 1
+
+        self.grid_map.justify_map()
+        bt.logging.info(f"Moved {moved} of {len(self.submaps)} submaps")
+
+    def _replay_submaps(self):
+        """Build the submaps and the grid map again from all sensor data"""
         self.grid_map.reset()
-        result = self.isam.calculateEstimate()
-        for i in range(1, self.pose_index + 1):
+        self.submaps = {}
+        self.active_submap = None
+
+        result = self._estimate()
+        # Read the columnar history once, rows are integrated as they are stored
+        pose_indices = self.sensor_data.pose_indices()
+        ranges = self.sensor_data.ranges(pose_indices)
+        for i, row in zip(pose_indices.tolist(), ranges):
             key = symbol("x", i)
-            sensor_data = self.sensor_data.get(i, None)
-            if sensor_data and result.exists(key):
+            if result.exists(key):
                 pose = result.atPose2(key)
-                self._update_grid_map(pose, sensor_data)
+                self._integrate_scan(i, pose.x(), pose.y(), pose.theta(), row)
+
         self.grid_map.justify_map()
+        bt.logging.info(f"Replayed {len(self.sensor_data)} scans")
 
     def _reanchor_grid_map_nodes(self):
         """Reanchor grid map nodes to the latest isam estimate"""
-        result = self.isam.calculateEstimate()
-        for node_id, (
-            node_pid,
-            node_x,
-            node_y,
-            node_desc,
-        ) in self.grid_map.nav_nodes.items():
-            node_key = symbol("x", node_pid)
-            if result.exists(node_key):
-                pose = result.atPose2(node_key)
-                self.grid_map.nav_nodes[node_id] = (
-                    node_pid,
-                    pose.x(),
-                    pose.y(),
-                    node_desc,
-                )
+        for node_id, (node_pid, _, _, _) in list(self.grid_map.nav_nodes.items()):
+            pose = self._pose_estimate(node_pid)
+            if pose is not None:
+                self.grid_map.move_nav_node(node_id, pose.x(), pose.y())
 
-    def _update_grid_map(self, pose: gtsam.Pose2, lidar_data: dict[str, float]):
-        """Update occupancy grid map using sensor data"""
+    def _update_grid_map(
+        self,
+        pose: gtsam.Pose2,
+        lidar_data: dict[str, float],
+        pose_index: int,
+    ):
+        """
+        Update occupancy grid map using sensor data
+
+        Args:
+            pose: Pose the sensor data was measured at
+            lidar_data: Lidar readings by direction
+            pose_index: Index of the pose
+        """
         try:
             x, y, theta = pose.x(), pose.y(), pose.theta()
 
@@ -400,147 +894,418 @@ class ISAM2:
             ):
                 self.grid_map.justify_map(factor=1.4)
 
-            # Update current position as free
-            self.grid_map.update_cell(grid_x, grid_y, False)
-
-            # Process lidar data
-            for direction, distance in lidar_data.items():
-                # Calculate obstacle position in world coordinates
-                angle_rad = self.direction_to_angle[direction] + theta
+            self._integrate_scan(pose_index, x, y, theta, lidar_ranges(lidar_data))
+        except Exception as e:
+            print(f"Error updating grid map: {e}")
+            traceback.print_exc()
 
-                # Interpolation to accelerate mapping
-                interpolates = [0]
-                t = np.arctan(2.0 / distance)
-                if t > 0.09:  # 5 degrees
-                    interpolates.extend(np.arange(0.09, t, 0.09))
-                    interpolates.extend(-np.arange(0.09, t, 0.09))
+    def _integrate_scan(
+        self,
+        pose_index: int,
+        x: float,
+        y: float,
+        theta: float,
+        ranges: np.ndarray,
+    ):
+        """
+        Integrate a lidar scan into the active submap and the grid map. The ranges
+        are a row of the sensor history, in `DIRECTIONS` order with NaN if missing.
+        """
+        submap = self.active_submap
+        if (
+            submap is None
+            or submap.num_scans >= self.submap_max_scans
+            or pose_index == self.last_key_frame
+        ):
+            if submap is not None:
+                submap.freeze()
+            submap = Submap(pose_index, self.grid_map.resolution)
+            submap.placed_anchor = (x, y, theta)
+            self.submaps[pose_index] = submap
+            self.active_submap = submap
+
+        # Scans must never be clipped by the submap border, the submap is placed
+        # into the grid map as a whole
+        local_x, local_y, local_theta = submap.to_local(
+            submap.placed_anchor, x, y, theta
+        )
+        valid = ranges[~np.isnan(ranges)]
+        reach = (float(valid.max()) if len(valid) else 0.0) + 2 * submap.resolution
+        submap.grid.fit_bounds(
+            local_x - reach, local_y - reach, local_x + reach, local_y + reach
+        )
+        grid_xs, grid_ys, values = self._scan_cells(
+            submap.grid, local_x, local_y, local_theta, ranges
+        )
+        submap.grid.update_cells(grid_xs, grid_ys, values)
+        submap.num_scans += 1
+        self.integrated_pose_index = pose_index
 
-                for offset in interpolates:
-                    angle = angle_rad + offset
-                    angle = math.atan2(math.sin(angle), math.cos(angle))
+        # Add the same cells to the grid map, which stays the composition of all
+        # submaps at their placed anchors
+        cell_xs, cell_ys = submap.local_cells(grid_xs, grid_ys)
+        self._place_cells(submap, cell_xs, cell_ys, values)
 
-                    obstacle_x = x + distance * math.cos(angle)
-                    obstacle_y = y + distance * math.sin(angle)
+    def _place_cells(
+        self,
+        submap: Submap,
+        cell_xs: np.ndarray,
+        cell_ys: np.ndarray,
+        values: np.ndarray,
+    ):
+        """Add log-odds of submap cells to the grid map at the placed anchor"""
+        if len(cell_xs) == 0:
+            return
+        xs, ys = submap.to_world(cell_xs, cell_ys, submap.placed_anchor)
+        # Cells must never be clipped, so that moving a submap later subtracts
+        # exactly what was added
+        self.grid_map.fit_bounds(xs.min(), ys.min(), xs.max(), ys.max())
+        grid_xs, grid_ys = self.grid_map.world_to_cells(xs, ys)
+        self.grid_map.update_cells(grid_xs, grid_ys, values)
+
+    def _scan_cells(
+        self,
+        grid_map: OccupancyGridMap,
+        x: float,
+        y: float,
+        theta: float,
+        ranges: np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Cells of a grid map updated by a lidar scan taken at the given pose"""
+        templates = get_beam_templates(grid_map.resolution)
+        grid_x, grid_y = grid_map.world_to_grid(x, y)
+        log_odds_free = grid_map.log_odds_free
+        log_odds_occupied = grid_map.log_odds_occupied
+
+        # Current position is free
+        offsets_x = [np.zeros(1, dtype=np.intp)]
+        offsets_y = [np.zeros(1, dtype=np.intp)]
+        end_masks = [np.zeros(1, dtype=bool)]
+        end_values = [0.0]
+        lengths = [1]
+
+        for column in np.flatnonzero(~np.isnan(ranges)):
+            distance = float(ranges[column])
+            angle_rad = self.direction_angles[column] + theta
+
+            # Beam and interpolated beams, points along them are free and the end
+            # points are the obstacle
+            offset_x, offset_y, ends = templates.reading(x, y, angle_rad, distance)
+            offsets_x.append(offset_x)
+            offsets_y.append(offset_y)
+            end_masks.append(ends)
+            end_values.append(
+                log_odds_occupied if distance <= SENSOR_MAX_RANGE else 0.0
+            )
+            lengths.append(len(offset_x))
 
-                    # Convert to grid coordinates
-                    obstacle_grid_x, obstacle_grid_y = self.grid_map.world_to_grid(
-                        obstacle_x, obstacle_y
-                    )
+        values = np.where(
+            np.concatenate(end_masks),
+            np.repeat(end_values, lengths),
+            log_odds_free,
+        )
+        return (
+            grid_x + np.concatenate(offsets_x),
+            grid_y + np.concatenate(offsets_y),
+            values,
+        )
 
-                    # Update obstacle position as occupied
-                    if distance <= SENSOR_MAX_RANGE:
-                        self.grid_map.update_cell(
-                            obstacle_grid_x, obstacle_grid_y, True
-                        )
+    def _open_wal(self, truncate: bool = False):
+        """Open the write-ahead log of the data directory for appending"""
+        if self._wal is not None:
+            self._wal.close()
+        self._wal = open(
+            os.path.join(self.data_dir, WAL_FILENAME), "wb" if truncate else "ab"
+        )
 
-                    # Update points along the ray (Bresenham algorithm)
-                    self._update_ray(grid_x, grid_y, obstacle_grid_x, obstacle_grid_y)
+    def _append_wal(
+        self, lidar_data: dict[str, float], odometry: float, odometry_direction: str
+    ):
+        """Append a step to the write-ahead log"""
+        if self._wal is None:
+            return
+        self._wal_seq += 1
+        record = pickle.dumps(
+            (self._wal_seq, lidar_data, odometry, odometry_direction),
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+        self._wal.write(WAL_HEADER.pack(len(record)) + record)
+        # Flushed to the OS, so the step survives a crash of the process
+        self._wal.flush()
+
+    def _replay_wal(self, load_path: str):
+        """Integrate the logged steps newer than the loaded state"""
+        wal_file = os.path.join(load_path, WAL_FILENAME)
+        if not os.path.exists(wal_file):
+            return
+
+        steps = []
+        end = 0
+        with open(wal_file, "rb") as f:
+            while True:
+                header = f.read(WAL_HEADER.size)
+                if len(header) < WAL_HEADER.size:
+                    break
+                (length,) = WAL_HEADER.unpack(header)
+                record = f.read(length)
+                if len(record) < length:
+                    break
+                try:
+                    steps.append(pickle.loads(record))
+                except Exception:
+                    break
+                end = f.tell()
+        if end < os.path.getsize(wal_file):
+            # The last record was cut short by a crash while it was written
+            bt.logging.warning(f"Discarding incomplete log record at {end}")
+            os.truncate(wal_file, end)
+
+        self._replaying = True
+        try:
+            replayed = 0
+            for seq, lidar_data, odometry, odometry_direction in steps:
+                if seq <= self._wal_seq:
+                    continue
+                self.run_iteration(lidar_data, odometry, odometry_direction)
+                self._wal_seq = seq
+                replayed += 1
+        finally:
+            self._replaying = False
+        bt.logging.info(f"Replayed {replayed} logged steps")
+
+    def _metadata(self) -> dict:
+        return {
+            "pose_index": self.pose_index,
+            "landmark_index": self.landmark_index,
+            "x": self.current_x,
+            "y": self.current_y,
+            "theta": self.current_theta,
+        }
+
+    def export_map(self, save_path: str | None = None):
+        """Export the grid map and the current pose for the console"""
+        save_path = save_path or self.data_dir
+        try:
+            self.grid_map.save_snapshot(os.path.join(save_path, MAP_FILENAME))
+            with _atomic_open(os.path.join(save_path, "metadata.json"), "w") as f:
+                json.dump(self._metadata(), f, indent=4)
         except Exception as e:
-            print(f"Error updating grid map: {e}")
-            traceback.print_exc()
-
-    def _update_ray(self, x0, y0, x1, y1):
-        """Update cells along a ray using Bresenham algorithm"""
-        dx = abs(x1 - x0)
-        dy = abs(y1 - y0)
-        sx = 1 if x0 < x1 else -1
-        sy = 1 if y0 < y1 else -1
-        err = dx - dy
-
-        while x0 != x1 or y0 != y1:
-            self.grid_map.update_cell(x0, y0, False)
-
-            e2 = 2 * err
-            if e2 > -dy:
-                err -= dy
-                x0 += sx
-            if e2 < dx:
-                err += dx
-                y0 += sy
-
-    def save(self, save_path: str = "slam_data"):
-        """Save SLAM data"""
+            bt.logging.error(f"Error exporting SLAM map: {e}")
+
+    def save(self, save_path: str | None = None):
+        """
+        Save a snapshot of the SLAM state and truncate the write-ahead log, the
+        steps it holds are part of the snapshot
+        """
+        save_path = save_path or self.data_dir
         try:
-            # Save map data
-            with open(os.path.join(save_path, "map.pkl"), "wb") as f:
-                pickle.dump(self.grid_map, f, protocol=pickle.HIGHEST_PROTOCOL)
-
-            # Save trajectory data
-            result: gtsam.Values = self.isam.calculateEstimate()
-            trajectory = []
-            for key in result.keys():
-                if chr(symbolChr(key)) == "x":
-                    pose = result.atPose2(key)
-                    trajectory.append(pose)
-            with open(os.path.join(save_path, "trajectory.pkl"), "wb") as f:
-                pickle.dump(trajectory, f, protocol=pickle.HIGHEST_PROTOCOL)
-
-            # Save graph structure
-            graphs = [g for g, _ in self.segments]
-            with open(os.path.join(save_path, "graphs.pkl"), "wb") as f:
-                pickle.dump(graphs, f, protocol=pickle.HIGHEST_PROTOCOL)
-            values = [v for _, v in self.segments]
-            with open(os.path.join(save_path, "values.pkl"), "wb") as f:
-                pickle.dump(values, f, protocol=pickle.HIGHEST_PROTOCOL)
-
-            # Save metadata
-            metadata = {
-                "pose_index": self.pose_index,
-                "landmark_index": self.landmark_index,
-                "x": self.current_x,
-                "y": self.current_y,
-                "theta": self.current_theta,
+            # The grid map is saved as a binary snapshot next to the state under a
+            # new name, the snapshot only points to it once both are written, so a
+            # crash in between keeps the previous pair
+            map_filename = (
+                f"snapshot_map_{self._wal_seq:012d}_{uuid.uuid4().hex[:8]}.npz"
+            )
+            self.grid_map.save_snapshot(os.path.join(save_path, map_filename))
+
+            snapshot = {
+                "seq": self._wal_seq,
+                "metadata": {
+                    **self._metadata(),
+                    "last_key_frame": self.last_key_frame,
+                    "last_loop_frame": self.last_loop_frame,
+                },
+                "grid_map": map_filename,
+                "graphs": [g for g, _ in self.segments],
+                "values": [v for _, v in self.segments],
+                # Restored in a single solver update, without optimising again
+                "linearization_point": (
+                    self.isam.getLinearizationPoint() if self.smoother is None else None
+                ),
+                "smoother": self._smoother_state(),
+                "key_frames": self.key_frames,
+                "landmarks": self.landmarks,
+                "sensor_data": self.sensor_data,
+                "submaps": self.submaps,
+                "integrated_pose_index": self.integrated_pose_index,
             }
-            with open(os.path.join(save_path, "metadata.json"), "w") as f:
-                json.dump(metadata, f, indent=4)
+            with _atomic_open(os.path.join(save_path, SNAPSHOT_FILENAME)) as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            for filename in os.listdir(save_path):
+                if filename.startswith("snapshot_map_") and filename != map_filename:
+                    os.remove(os.path.join(save_path, filename))
+            if os.path.samefile(save_path, self.data_dir):
+                self._open_wal(truncate=True)
+                self._remove_old_spill_dirs()
+
+            self.export_map(save_path)
+            bt.logging.warning(f"GTSAM data saved successfully #{self.pose_index}")
+        except Exception as e:
+            bt.logging.error(f"Error saving SLAM data: {e}")
+            traceback.print_exc()
 
-            # Save key frame data
-            with open(os.path.join(save_path, "key_frames.pkl"), "wb") as f:
-                pickle.dump(self.key_frames, f, protocol=pickle.HIGHEST_PROTOCOL)
+    def _remove_old_spill_dirs(self):
+        """Remove the spilled chunks of histories the snapshot no longer refers to"""
+        sensor_dir = os.path.join(self.data_dir, SENSOR_DIRNAME)
+        if not os.path.isdir(sensor_dir):
+            return
+        current = os.path.basename(self.sensor_data.spill_dir)
+        for name in os.listdir(sensor_dir):
+            if name != current:
+                shutil.rmtree(os.path.join(sensor_dir, name), ignore_errors=True)
+
+    def _smoother_state(
+        self,
+    ) -> tuple[gtsam.NonlinearFactorGraph, gtsam.Values, dict[int, float]] | None:
+        """Factors, including marginal priors, linearisation point and timestamps"""
+        if self.smoother is None:
+            return None
+        factors = self.smoother.getFactors()
+        graph = gtsam.NonlinearFactorGraph()
+        for i in range(factors.size()):
+            # Slots of removed factors are empty
+            if factors.at(i) is not None:
+                graph.add(factors.at(i))
+        return graph, self.smoother.getLinearizationPoint(), self.smoother.timestamps()
 
-            # Save sensor data
-            with open(os.path.join(save_path, "sensor_data.pkl"), "wb") as f:
-                pickle.dump(self.sensor_data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    def _restore_smoother(
+        self,
+        graph: gtsam.NonlinearFactorGraph,
+        values: gtsam.Values,
+        timestamps: dict[int, float],
+    ):
+        self.segments = collections.deque(maxlen=10)
+        self.segments.append((gtsam.NonlinearFactorGraph(), gtsam.Values()))
+        self._new_isam()
+        self._update_isam(graph, values, timestamps)
 
-            bt.logging.warning(f"GTSAM data saved successfully #{self.pose_index}")
-        except Exception as e:
-            print(f"Error saving SLAM data: {e}")
+    def _restore_segments(
+        self,
+        graphs: list[gtsam.NonlinearFactorGraph],
+        values: list[gtsam.Values],
+        linearization_point: gtsam.Values | None = None,
+    ):
+        self.segments = collections.deque(maxlen=10)
+        self._new_isam()
+        if linearization_point is None:
+            # Optimise again from the initial values of each segment
+            for graph, value in zip(graphs, values):
+                self.segments.append((graph, value))
+                self._update_isam(graph, value)
+            return
+
+        # All factors at the saved linearisation point, in a single update
+        all_graph = gtsam.NonlinearFactorGraph()
+        for graph, value in zip(graphs, values):
+            self.segments.append((graph, value))
+            all_graph.push_back(graph)
+        all_values = gtsam.Values()
+        for key in all_graph.keyVector():
+            all_values.insert(
+                key,
+                (
+                    linearization_point.atPose2(key)
+                    if chr(symbolChr(key)) == "x"
+                    else linearization_point.atPoint2(key)
+                ),
+            )
+        self._update_isam(all_graph, all_values)
+
+    def _restore_metadata(self, metadata: dict):
+        self.pose_index = metadata["pose_index"]
+        self.landmark_index = metadata["landmark_index"]
+        self.current_x = metadata["x"]
+        self.current_y = metadata["y"]
+        self.current_theta = metadata["theta"]
+        self.current_pose = gtsam.Pose2(
+            self.current_x, self.current_y, self.current_theta
+        )
+        self.last_key_frame = metadata.get("last_key_frame", self.pose_index)
+        self.last_loop_frame = metadata.get("last_loop_frame", self.pose_index)
+
+    def _restore_sensor_data(self, sensor_data: SensorHistory | dict[int, dict]):
+        if isinstance(sensor_data, dict):
+            # Readings by pose index of data saved before the history
+            sensor_data = SensorHistory.from_dict(sensor_data)
+            sensor_data.spill_dir = uuid.uuid4().hex[:8]
+        sensor_data.spill_dir = os.path.join(
+            self.data_dir, SENSOR_DIRNAME, os.path.basename(sensor_data.spill_dir)
+        )
+        self.sensor_data = sensor_data
+
+    def _restore_active_submap(self):
+        self.active_submap = None
+        last_submap = next(reversed(self.submaps.values()), None)
+        if last_submap is not None and not last_submap.frozen:
+            self.active_submap = last_submap
+
+    def load(self, load_path: str | None = None):
+        """Load the latest snapshot, or data saved before snapshots, and replay the log"""
+        load_path = load_path or self.data_dir
+        snapshot_file = os.path.join(load_path, SNAPSHOT_FILENAME)
+        if os.path.exists(snapshot_file):
+            self._load_snapshot(snapshot_file)
+        elif os.path.exists(os.path.join(load_path, "graphs.pkl")):
+            self._load_legacy(load_path)
+            self._wal_seq = 0
+        else:
+            self._reset_isam()
+            self._wal_seq = 0
+        self._replay_wal(load_path)
+
+        bt.logging.warning(f"GTSAM data loaded successfully #{self.pose_index}")
+
+    def _load_snapshot(self, snapshot_file: str):
+        with open(snapshot_file, "rb") as f:
+            snapshot = pickle.load(f)
 
-    def load(self, load_path: str = "slam_data"):
-        # Restore map data
+        self._wal_seq = snapshot["seq"]
+        self.grid_map = snapshot["grid_map"]
+        if isinstance(self.grid_map, str):
+            self.grid_map = OccupancyGridMap.load_snapshot(
+                os.path.join(os.path.dirname(snapshot_file), self.grid_map)
+            )
+        self._restore_metadata(snapshot["metadata"])
+        if snapshot.get("smoother") is not None:
+            self._restore_smoother(*snapshot["smoother"])
+        else:
+            self._restore_segments(
+                snapshot["graphs"],
+                snapshot["values"],
+                snapshot.get("linearization_point"),
+            )
+        self.key_frames = snapshot["key_frames"]
+        self.landmarks = snapshot["landmarks"]
+        self._restore_sensor_data(snapshot["sensor_data"])
+        self.submaps = snapshot["submaps"]
+        self.integrated_pose_index = snapshot["integrated_pose_index"]
+        self._restore_active_submap()
+
+    def _load_legacy(self, load_path: str):
+        """Load the data files saved before snapshots"""
         with open(os.path.join(load_path, "map.pkl"), "rb") as f:
             self.grid_map = pickle.load(f)
 
+        with open(os.path.join(load_path, "metadata.json"), "r") as f:
+            self._restore_metadata(json.load(f))
+
         # Restore graph structure
         with open(os.path.join(load_path, "graphs.pkl"), "rb") as f:
             graphs: list[gtsam.NonlinearFactorGraph] = pickle.load(f)
         with open(os.path.join(load_path, "values.pkl"), "rb") as f:
             values: list[gtsam.Values] = pickle.load(f)
-        self.segments = collections.deque(maxlen=10)
-        self.isam = gtsam.ISAM2(self.isam_params)
-        for graph, value in zip(graphs, values):
-            self.segments.append((graph, value))
-            self.isam.update(graph, value)
+        self._restore_segments(graphs, values)
 
-        with open(os.path.join(load_path, "metadata.json"), "r") as f:
-            metadata = json.load(f)
-            self.pose_index = metadata["pose_index"]
-            self.landmark_index = metadata["landmark_index"]
-            self.current_x = metadata["x"]
-            self.current_y = metadata["y"]
-            self.current_theta = metadata["theta"]
-            self.current_pose = gtsam.Pose2(
-                self.current_x, self.current_y, self.current_theta
-            )
-
-        # Restore key frame data
+        # Key frames by signature
         with open(os.path.join(load_path, "key_frames.pkl"), "rb") as f:
-            self.key_frames = pickle.load(f)
-            self.last_key_frame = self.pose_index
-            self.last_loop_frame = self.pose_index
+            key_frames: dict[tuple, tuple[int, gtsam.Pose2]] = pickle.load(f)
+        self.key_frames = KeyFrameIndex(self.key_frame_radius)
+        for signature, (pose_index, pose) in key_frames.items():
+            self.key_frames.add(pose_index, pose.x(), pose.y(), pose.theta(), signature)
 
-        # Restore sensor data
-        with open(os.path.join(load_path, "sensor_data.pkl"), "rb") as f:
-            self.sensor_data = pickle.load(f)
+        # Landmarks were not associated before snapshots, they are not reused
+        self.landmarks = LandmarkIndex(self.landmark_gate)
 
-        bt.logging.warning(f"GTSAM data loaded successfully #{self.pose_index}")
+        # Readings by pose index, the submaps are built from them
+        with open(os.path.join(load_path, "sensor_data.pkl"), "rb") as f:
+            self._restore_sensor_data(pickle.load(f))
+        self._replay_submaps()
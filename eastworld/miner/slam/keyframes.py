@@ -0,0 +1,82 @@
+# The MIT License (MIT)
+# Copyright © 2025 Eastworld AI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+from typing import Callable
+
+import numpy as np
+
+from eastworld.miner.slam.spatial import SpatialHash
+
+
+class KeyFrameIndex(SpatialHash):
+    """
+    Key frames by pose index, hashed by position and matched by lidar signature.
+    Signatures match when no reading differs by more than the tolerance, which
+    absorbs the rounding of the lidar to whole meters.
+    """
+
+    def __init__(self, cell_size: float, tolerance: float = 1.0):
+        super().__init__(cell_size)
+        self.tolerance = tolerance
+        self.thetas: dict[int, float] = {}
+        self.signatures: dict[int, np.ndarray] = {}
+
+    def add(self, pose_index: int, x: float, y: float, theta: float, signature):
+        self.move(pose_index, x, y)
+        self.thetas[pose_index] = theta
+        self.signatures[pose_index] = np.asarray(signature, dtype=np.float64)
+
+    def remove(self, pose_index: int):
+        super().remove(pose_index)
+        self.thetas.pop(pose_index, None)
+        self.signatures.pop(pose_index, None)
+
+    def pose(self, pose_index: int) -> tuple[float, float, float]:
+        x, y = self.positions[pose_index]
+        return x, y, self.thetas[pose_index]
+
+    def match(
+        self,
+        x: float,
+        y: float,
+        signature,
+        max_distance: float,
+        before: int | None = None,
+        is_valid: Callable[[int], bool] | None = None,
+    ) -> int | None:
+        """
+        Key frame within `max_distance` of a position with the closest matching
+        signature, or None. Only key frames with a pose index below `before` are
+        considered and those failing `is_valid` are removed.
+        """
+        signature = np.asarray(signature, dtype=np.float64)
+        best, best_score = None, None
+        for pose_index, distance in list(self.nearby(x, y, max_distance)):
+            if before is not None and pose_index >= before:
+                continue
+            difference = np.abs(self.signatures[pose_index] - signature)
+            if difference.max() > self.tolerance:
+                continue
+            score = (difference.sum(), distance)
+            if best_score is not None and score >= best_score:
+                continue
+            if is_valid is not None and not is_valid(pose_index):
+                self.remove(pose_index)
+                continue
+            best, best_score = pose_index, score
+        return best
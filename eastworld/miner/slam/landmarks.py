@@ -0,0 +1,62 @@
+# The MIT License (MIT)
+# Copyright © 2025 Eastworld AI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+from eastworld.miner.slam.spatial import SpatialHash
+
+
+class LandmarkIndex(SpatialHash):
+    """
+    Landmark positions for nearest neighbour data association, with the pose index
+    each landmark was last observed at
+    """
+
+    def __init__(self, cell_size: float):
+        super().__init__(cell_size)
+        self.last_seen: dict[int, int] = {}
+
+    def add(self, index: int, x: float, y: float, pose_index: int):
+        """Add a landmark observed at a pose"""
+        self.move(index, x, y)
+        self.last_seen[index] = pose_index
+
+    def observe(self, index: int, pose_index: int):
+        self.last_seen[index] = max(self.last_seen.get(index, pose_index), pose_index)
+
+    def remove(self, index: int):
+        super().remove(index)
+        self.last_seen.pop(index, None)
+
+    def prune(self, min_pose_index: int):
+        """Remove landmarks last observed before a pose index"""
+        for index, pose_index in list(self.last_seen.items()):
+            if pose_index < min_pose_index:
+                self.remove(index)
+
+    def nearest(
+        self,
+        x: float,
+        y: float,
+        max_distance: float,
+        exclude: set[int] = frozenset(),
+    ) -> int | None:
+        """Nearest landmark within `max_distance`, or None"""
+        nearest, nearest_distance = None, max_distance
+        for index, distance in self.nearby(x, y, max_distance):
+            if index not in exclude and distance <= nearest_distance:
+                nearest, nearest_distance = index, distance
+        return nearest
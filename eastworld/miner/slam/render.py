@@ -0,0 +1,189 @@
+# The MIT License (MIT)
+# Copyright © 2025 Eastworld AI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import struct
+import zlib
+
+import numpy as np
+
+RED = (255, 0, 0)
+GREEN = (0, 160, 0)
+BLUE = (0, 0, 255)
+ORANGE = (255, 165, 0)
+
+
+def log_odds_to_image(grid: np.ndarray, scale: int = 1) -> np.ndarray:
+    """
+    Convert a log-odds grid to a grayscale RGB image, occupied cells dark and free
+    cells light. The first grid row is drawn at the bottom.
+
+    Args:
+        grid: Log-odds grid map
+        scale: Pixels per cell
+
+    Returns:
+        uint8 array of shape (height * scale, width * scale, 3)
+    """
+    # 1 - P(occupied) = 1 / (1 + exp(log_odds)), clipped to keep exp finite
+    free = 1.0 / (1.0 + np.exp(np.clip(grid[::-1], -50.0, 50.0)))
+    gray = (free * 255.0 + 0.5).astype(np.uint8)
+    if scale > 1:
+        gray = np.repeat(np.repeat(gray, scale, axis=0), scale, axis=1)
+    return np.repeat(gray[:, :, np.newaxis], 3, axis=2)
+
+
+def encode_png(image: np.ndarray, compress_level: int = 1) -> bytes:
+    """
+    Encode an RGB uint8 image as PNG
+
+    Args:
+        image: Array of shape (height, width, 3)
+        compress_level: zlib compression level, low levels are much faster and the
+            flat map images still compress well
+    """
+    height, width, _ = image.shape
+    # Each scanline starts with its filter type, 0 (None)
+    raw = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    raw[:, 1:] = image.reshape(height, width * 3)
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return (
+            struct.pack(">I", len(data))
+            + tag
+            + data
+            + struct.pack(">I", zlib.crc32(tag + data))
+        )
+
+    return b"".join(
+        [
+            b"\x89PNG\r\n\x1a\n",
+            chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)),
+            chunk(b"IDAT", zlib.compress(raw.tobytes(), compress_level)),
+            chunk(b"IEND", b""),
+        ]
+    )
+
+
+class MapCanvas:
+    """
+    Raster image of a grid map to stamp markers into. Drawing methods take grid
+    coordinates and operate on whole arrays of markers at once.
+    """
+
+    def __init__(self, grid: np.ndarray, scale: int = 1):
+        self.scale = max(1, int(scale))
+        self.grid_height, self.grid_width = grid.shape
+        self.image = log_odds_to_image(grid, self.scale)
+
+    def to_pixel(self, grid_x, grid_y) -> tuple[np.ndarray, np.ndarray]:
+        """Pixel coordinates (column, row) of the center of grid cells"""
+        grid_x = np.asarray(grid_x, dtype=np.float64)
+        grid_y = np.asarray(grid_y, dtype=np.float64)
+        px = grid_x * self.scale + self.scale // 2
+        py = (self.grid_height - 1 - grid_y) * self.scale + self.scale // 2
+        return np.rint(px).astype(np.intp), np.rint(py).astype(np.intp)
+
+    def _stamp(
+        self,
+        px: np.ndarray,
+        py: np.ndarray,
+        radius: int,
+        color: tuple[int, int, int],
+        alpha: float,
+    ):
+        """Blend filled discs of a pixel radius centered at the pixels"""
+        oy, ox = np.mgrid[-radius : radius + 1, -radius : radius + 1]
+        disc = ox**2 + oy**2 <= radius**2 + radius
+        xs = (px[:, np.newaxis] + ox[disc]).ravel()
+        ys = (py[:, np.newaxis] + oy[disc]).ravel()
+        inside = (
+            (xs >= 0)
+            & (xs < self.image.shape[1])
+            & (ys >= 0)
+            & (ys < self.image.shape[0])
+        )
+        xs, ys = xs[inside], ys[inside]
+        if alpha >= 1.0:
+            self.image[ys, xs] = color
+        else:
+            blended = self.image[ys, xs] * (1.0 - alpha) + np.array(color) * alpha
+            self.image[ys, xs] = blended.astype(np.uint8)
+
+    def points(
+        self,
+        grid_xs,
+        grid_ys,
+        color: tuple[int, int, int],
+        radius=2,
+        alpha: float = 1.0,
+    ):
+        """
+        Draw discs at grid cells
+
+        Args:
+            grid_xs, grid_ys: Grid coordinates of the points
+            color: RGB color
+            radius: Disc radius in pixels, one for all points or one per point
+            alpha: Opacity
+        """
+        px, py = self.to_pixel(grid_xs, grid_ys)
+        px, py = np.atleast_1d(px), np.atleast_1d(py)
+        radii = np.broadcast_to(np.asarray(radius, dtype=np.intp), px.shape)
+        for r in np.unique(radii):
+            selected = radii == r
+            self._stamp(px[selected], py[selected], int(r), color, alpha)
+
+    def lines(
+        self,
+        grid_x1s,
+        grid_y1s,
+        grid_x2s,
+        grid_y2s,
+        color: tuple[int, int, int],
+        width: int = 1,
+        alpha: float = 1.0,
+    ):
+        """
+        Draw line segments between grid coordinates
+
+        Args:
+            grid_x1s, grid_y1s: Grid coordinates of the segment starts
+            grid_x2s, grid_y2s: Grid coordinates of the segment ends
+            color: RGB color
+            width: Line width in pixels
+            alpha: Opacity
+        """
+        x1, y1 = self.to_pixel(grid_x1s, grid_y1s)
+        x2, y2 = self.to_pixel(grid_x2s, grid_y2s)
+        x1, y1, x2, y2 = (np.atleast_1d(a) for a in (x1, y1, x2, y2))
+        if len(x1) == 0:
+            return
+
+        # One sample per pixel along the longer axis of each segment
+        lengths = np.maximum(np.abs(x2 - x1), np.abs(y2 - y1)) + 1
+        segment = np.repeat(np.arange(len(lengths)), lengths)
+        starts = np.cumsum(lengths) - lengths
+        t = (np.arange(lengths.sum()) - starts[segment]) / np.maximum(
+            lengths[segment] - 1, 1
+        )
+        px = np.rint(x1[segment] + (x2 - x1)[segment] * t).astype(np.intp)
+        py = np.rint(y1[segment] + (y2 - y1)[segment] * t).astype(np.intp)
+        self._stamp(px, py, width // 2, color, alpha)
+
+    def png(self, compress_level: int = 1) -> bytes:
+        return encode_png(self.image, compress_level)
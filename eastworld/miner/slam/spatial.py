@@ -0,0 +1,74 @@
+# The MIT License (MIT)
+# Copyright © 2025 Eastworld AI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import math
+from typing import Iterator
+
+
+class SpatialHash:
+    """Positions of items hashed into square cells, for radius queries"""
+
+    def __init__(self, cell_size: float):
+        self.cell_size = cell_size
+        self.positions: dict[int, tuple[float, float]] = {}
+        self._cells: dict[tuple[int, int], set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def __contains__(self, index: int) -> bool:
+        return index in self.positions
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(list(self.positions))
+
+    def _cell(self, x: float, y: float) -> tuple[int, int]:
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def move(self, index: int, x: float, y: float):
+        """Set the position of an item"""
+        position = self.positions.get(index)
+        if position is not None:
+            self._discard(index, position)
+        self.positions[index] = (x, y)
+        self._cells.setdefault(self._cell(x, y), set()).add(index)
+
+    def remove(self, index: int):
+        position = self.positions.pop(index, None)
+        if position is not None:
+            self._discard(index, position)
+
+    def nearby(
+        self, x: float, y: float, max_distance: float
+    ) -> Iterator[tuple[int, float]]:
+        """Items within `max_distance` of a position and their distance"""
+        cell_x, cell_y = self._cell(x, y)
+        reach = math.ceil(max_distance / self.cell_size)
+        for i in range(cell_x - reach, cell_x + reach + 1):
+            for j in range(cell_y - reach, cell_y + reach + 1):
+                for index in self._cells.get((i, j), ()):
+                    item_x, item_y = self.positions[index]
+                    distance = math.hypot(item_x - x, item_y - y)
+                    if distance <= max_distance:
+                        yield index, distance
+
+    def _discard(self, index: int, position: tuple[float, float]):
+        cell = self._cell(*position)
+        self._cells[cell].discard(index)
+        if not self._cells[cell]:
+            del self._cells[cell]
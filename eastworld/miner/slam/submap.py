@@ -0,0 +1,102 @@
+# The MIT License (MIT)
+# Copyright © 2025 Eastworld AI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import math
+
+import numpy as np
+
+from eastworld.miner.slam.grid import OccupancyGridMap
+
+
+class Submap:
+    """
+    Local occupancy grid in the frame of an anchor pose. Scans are integrated
+    relative to the anchor, so when the anchor estimate changes the submap is moved
+    as a whole instead of re-integrating its scans.
+    """
+
+    def __init__(self, anchor_index: int, resolution: float, size: int = 64):
+        self.anchor_index = anchor_index
+        self.resolution = resolution
+        self.grid: OccupancyGridMap | None = OccupancyGridMap(
+            width=size, height=size, resolution=resolution
+        )
+        # Anchor pose (x, y, theta) the submap is composed into the global map with
+        self.placed_anchor: tuple[float, float, float] | None = None
+        self.num_scans = 0
+
+        # Cells with content of a frozen submap, in local cell coordinates
+        self._cells: tuple[np.ndarray, np.ndarray, np.ndarray] | None = None
+
+    @property
+    def frozen(self) -> bool:
+        return self.grid is None
+
+    def to_local(
+        self, anchor: tuple[float, float, float], x: float, y: float, theta: float
+    ) -> tuple[float, float, float]:
+        """Transform a world pose into the frame of the anchor pose"""
+        anchor_x, anchor_y, anchor_theta = anchor
+        dx, dy = x - anchor_x, y - anchor_y
+        cos, sin = math.cos(anchor_theta), math.sin(anchor_theta)
+        return dx * cos + dy * sin, -dx * sin + dy * cos, theta - anchor_theta
+
+    def local_cells(
+        self, grid_xs: np.ndarray, grid_ys: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Convert grid indices of the active submap to local cell coordinates"""
+        return (
+            grid_xs - self.grid.width // 2 - self.grid.base_offset_x,
+            grid_ys - self.grid.height // 2 - self.grid.base_offset_y,
+        )
+
+    def cells(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Cells with content in local cell coordinates and their log-odds"""
+        if self._cells is not None:
+            return self._cells
+        grid_ys, grid_xs = np.nonzero(self.grid.grid)
+        cell_xs, cell_ys = self.local_cells(grid_xs, grid_ys)
+        return cell_xs, cell_ys, self.grid.grid[grid_ys, grid_xs]
+
+    def to_world(
+        self,
+        cell_xs: np.ndarray,
+        cell_ys: np.ndarray,
+        anchor: tuple[float, float, float],
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """World coordinates of the centers of local cells placed at an anchor pose"""
+        anchor_x, anchor_y, anchor_theta = anchor
+        local_xs = (cell_xs + 0.5) * self.resolution
+        local_ys = (cell_ys + 0.5) * self.resolution
+        cos, sin = math.cos(anchor_theta), math.sin(anchor_theta)
+        return (
+            anchor_x + local_xs * cos - local_ys * sin,
+            anchor_y + local_xs * sin + local_ys * cos,
+        )
+
+    def freeze(self):
+        """Drop the dense grid of a finished submap, keeping only cells with content"""
+        if self.grid is None:
+            return
+        cell_xs, cell_ys, values = self.cells()
+        self._cells = (
+            cell_xs.astype(np.int32),
+            cell_ys.astype(np.int32),
+            values,
+        )
+        self.grid = None
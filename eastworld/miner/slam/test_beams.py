@@ -0,0 +1,111 @@
+# The MIT License (MIT)
+# Copyright © 2025 Eastworld AI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import math
+import threading
+import unittest
+
+import numpy as np
+
+from eastworld.miner.slam.beams import (
+    BeamTemplates,
+    TemplateCache,
+    bresenham,
+    get_beam_templates,
+)
+from eastworld.miner.slam.grid import OccupancyGridMap
+
+
+class TestBeamTemplates(unittest.TestCase):
+    def setUp(self):
+        self.grid_map = OccupancyGridMap(width=200, height=200, resolution=2.0)
+        self.templates = BeamTemplates(self.grid_map.resolution)
+
+    def test_ray_matches_world_coordinates(self):
+        for x, y in [(0.0, 0.0), (3.0, -5.0), (-7.5, 12.5), (0.5, 1.5)]:
+            sx, sy = self.grid_map.world_to_grid(x, y)
+            for i in range(8):
+                angle = i * np.pi / 4
+                for distance in [1.0, 7.0, 20.0, 50.0]:
+                    ex, ey = self.grid_map.world_to_grid(
+                        x + distance * math.cos(angle), y + distance * math.sin(angle)
+                    )
+                    offset_x, offset_y = self.templates.ray(x, y, angle, distance)
+                    self.assertEqual(
+                        list(zip(sx + offset_x, sy + offset_y)),
+                        bresenham(sx, sy, ex, ey),
+                    )
+
+    def test_reading(self):
+        offset_x, offset_y, ends = self.templates.reading(0.0, 0.0, 0.0, 4.0)
+        self.assertEqual(len(offset_x), len(offset_y))
+        self.assertEqual(len(offset_x), len(ends))
+
+        # One end point for the beam and each interpolated beam
+        self.assertGreater(np.count_nonzero(ends), 1)
+        self.assertTrue(ends[-1])
+        self.assertEqual((offset_x[ends][0], offset_y[ends][0]), (2, 0))
+
+        # Zero range readings only cover the sensor cell
+        offset_x, offset_y, ends = self.templates.reading(0.0, 0.0, 0.0, 0.0)
+        self.assertEqual((list(offset_x), list(offset_y)), ([0], [0]))
+
+    def test_samples(self):
+        offset_x, offset_y, distances = self.templates.samples(
+            1.0, 1.0, np.pi / 2, 2.0, 10.0
+        )
+        np.testing.assert_array_equal(distances, [0.0, 2.0, 4.0, 6.0, 8.0])
+        np.testing.assert_array_equal(offset_x, [0, 0, 0, 0, 0])
+        np.testing.assert_array_equal(offset_y, [0, 1, 2, 3, 4])
+
+    def test_template_cache_bounded(self):
+        cache = TemplateCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+        # The least recently used template is evicted
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual((cache.get("a"), cache.get("c")), (1, 3))
+
+        # Continuous headings fall into the fixed angle bins
+        self.templates._samples = TemplateCache(10000)
+        for angle in np.random.default_rng(0).uniform(0, 2 * np.pi, 20000):
+            self.templates.samples(0.0, 0.0, angle, 2.0, 10.0)
+        self.assertLessEqual(len(self.templates._samples), self.templates.angle_bins)
+
+    def test_shared_templates(self):
+        results = []
+
+        def build():
+            templates = get_beam_templates(3.0)
+            for angle in np.linspace(0, 2 * np.pi, 500):
+                templates.reading(0.5, 0.5, angle, 20.0)
+            results.append(templates)
+
+        threads = [threading.Thread(target=build) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(results), 4)
+        self.assertTrue(all(t is results[0] for t in results))
+
+
+if __name__ == "__main__":
+    unittest.main()
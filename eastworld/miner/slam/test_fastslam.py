@@ -0,0 +1,294 @@
+# The MIT License (MIT)
+# Copyright © 2025 Eastworld AI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from eastworld.miner.slam.fastslam import STATE_DELTA, FastSLAM
+
+
+class TestFastSLAM(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        random.seed(0)
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.slam = FastSLAM(
+            num_particles=20,
+            data_dir=self.data_dir.name,
+            map_width=100,
+            map_height=100,
+        )
+        self.lidar = {
+            "north": 20.0,
+            "northeast": 51.0,
+            "east": 12.0,
+            "southeast": 30.0,
+            "south": 8.0,
+            "southwest": 51.0,
+            "west": 16.0,
+            "northwest": 25.0,
+        }
+
+    def tearDown(self):
+        self.data_dir.cleanup()
+
+    def test_fused_map_rebuild(self):
+        self.slam.predict(3.0, "north")
+        self.slam.update_weights(self.lidar)
+
+        # First update always builds the fused map from scratch
+        expected = self.slam.get_fuse_map(self.slam.fuse_top_k)
+        np.testing.assert_allclose(self.slam.fused_map.grid, expected.grid)
+        self.assertIs(self.slam.grid_map, self.slam.fused_map)
+        self.assertTrue(all(not p.deltas for p in self.slam.particles))
+
+    def update_fused(self, direction: str, maps: dict):
+        """Run an update, recording the particle maps the fused map is made of"""
+        self.slam.predict(3.0, direction)
+        self.slam.update_weights(self.lidar)
+        maps.update({p.id: p.map.grid.copy() for p in self.slam.particles})
+
+    def assert_fused_mixture(self, maps: dict):
+        """The fused map is the mixture of its members, close to the top-k mixture"""
+        members = self.slam._fused_weights
+        mixture = sum(maps[pid] * w for pid, w in members.items())
+        np.testing.assert_allclose(self.slam.fused_map.grid, mixture, atol=1e-9)
+
+        expected = self.slam.get_fuse_map(self.slam.fuse_top_k).grid
+        max_log_odds = max(np.abs(maps[pid]).max() for pid in members)
+        max_log_odds = max(
+            max_log_odds, *(np.abs(p.map.grid).max() for p in self.slam.particles)
+        )
+        self.assertLessEqual(
+            np.abs(self.slam.fused_map.grid - expected).max(),
+            2 * self.slam.fused_drift * max_log_odds + 1e-9,
+        )
+
+    def test_fused_map_incremental(self):
+        maps = {}
+        self.update_fused("north", maps)
+        self.slam.resample()
+
+        # Never rebuild, the fused map is only updated from step deltas
+        self.slam.fuse_rebuild_threshold = float("inf")
+        with mock.patch.object(
+            self.slam, "get_fuse_map", wraps=self.slam.get_fuse_map
+        ) as get_fuse_map:
+            before = self.slam.fused_map.grid.copy()
+            for direction in ["east", "south", "west"]:
+                self.update_fused(direction, maps)
+                self.assertFalse(np.array_equal(before, self.slam.fused_map.grid))
+                before = self.slam.fused_map.grid.copy()
+                self.assert_fused_mixture(maps)
+                self.slam.resample()
+            # Only the calls of the mixture checks
+            self.assertEqual(get_fuse_map.call_count, 3)
+            self.assertGreater(self.slam.fused_drift, 0.0)
+
+    def test_fused_map_injection(self):
+        maps = {}
+        self.update_fused("north", maps)
+        self.slam.inject_random_particles()
+        self.slam.resample()
+
+        # Injected particles count towards the drift but do not force a rebuild
+        self.slam.fuse_rebuild_threshold = float("inf")
+        fused_map = self.slam.fused_map
+        self.update_fused("east", maps)
+        self.assertIs(self.slam.fused_map, fused_map)
+        self.assert_fused_mixture(maps)
+
+        # Past the threshold the fused map is rebuilt from the current top-k
+        self.slam.resample()
+        self.slam.fuse_rebuild_threshold = 0.0
+        self.update_fused("south", maps)
+        self.assertIsNot(self.slam.fused_map, fused_map)
+        self.assertEqual(self.slam.fused_drift, 0.0)
+        self.assert_fused_mixture(maps)
+
+    def test_map_sketch_incremental(self):
+        particle = self.slam.particles[0]
+        self.slam._map_sketch(particle)
+
+        # Sketch follows the cell updates and is inherited by copies
+        self.slam.update_map_for_particle(particle, 0.0, 20.0)
+        copied = particle.copy()
+        self.slam.update_map_for_particle(copied, np.pi / 2, 10.0)
+        incremental = copied.sketch.copy()
+        copied.sketch = None
+        np.testing.assert_allclose(incremental, self.slam._map_sketch(copied))
+
+    def test_map_sketch_similarity(self):
+        a = self.slam.particles[0]
+        b = self.slam.particles[1]
+        for direction, distance in self.lidar.items():
+            angle = self.slam.direction_to_angle[direction]
+            self.slam.update_map_for_particle(a, angle, distance)
+            self.slam.update_map_for_particle(b, angle + 0.1, distance)
+
+        exact = np.dot(a.map.grid.reshape(-1), b.map.grid.reshape(-1)) / (
+            np.linalg.norm(a.map.grid) * np.linalg.norm(b.map.grid)
+        )
+        sketch_a = self.slam._map_sketch(a)
+        sketch_b = self.slam._map_sketch(b)
+        estimate = np.dot(sketch_a, sketch_b) / (
+            np.linalg.norm(sketch_a) * np.linalg.norm(sketch_b)
+        )
+        self.assertAlmostEqual(exact, estimate, delta=0.05)
+
+    def _step(self, direction: str):
+        self.slam.predict(3.0, direction)
+        self.slam.update_weights(self.lidar)
+        self.slam.resample()
+
+    def test_background_save_state(self):
+        self._step("north")
+        self.slam._iteration_count = 0
+        with mock.patch.object(self.slam._save_executor, "submit") as submit:
+            self.slam.run_iteration(self.lidar, 3.0, "east")
+        state = submit.call_args.args[1]
+
+        # The saved particles and map are not the ones the filter keeps changing
+        saved_ids = {id(p) for p in state["particles"]}
+        self.assertFalse(saved_ids & {id(p) for p in self.slam.particles})
+        self.assertIsNot(state["grid_map"].grid, self.slam.grid_map.grid)
+        grids = [p.map.grid.copy() for p in state["particles"]]
+        fused = state["grid_map"].grid.copy()
+        self._step("south")
+        for p, grid in zip(state["particles"], grids):
+            np.testing.assert_array_equal(p.map.grid, grid)
+        np.testing.assert_array_equal(state["grid_map"].grid, fused)
+
+    def test_state_roundtrip(self):
+        self._step("north")
+        # One dense map to cover both cell layouts
+        self.slam.particles[0].map.grid[:] = np.random.normal(size=(100, 100))
+        expected = [(p.x, p.y, p.theta, p.map.grid.copy()) for p in self.slam.particles]
+        with mock.patch.object(self.slam, "visualize", return_value=b""):
+            self.slam.save()
+
+        restored = FastSLAM(num_particles=1, data_dir=self.data_dir.name)
+        restored.load()
+
+        self.assertEqual(restored.num_particles, 20)
+        self.assertIsNone(restored.fused_map)
+        for p, (x, y, theta, grid) in zip(restored.particles, expected):
+            self.assertEqual((p.x, p.y, p.theta), (x, y, theta))
+            np.testing.assert_array_equal(p.map.grid, grid)
+
+    def test_inject_random_particles(self):
+        self._step("north")
+        best = self.slam.get_best_particle()
+        survivors = sorted(self.slam.particles, key=lambda p: p.weight)[5:]
+        self.slam.inject_random_particles(min_count=5)
+
+        self.assertEqual(len(self.slam.particles), 20)
+        self.assertEqual(self.slam.particles[:15], survivors)
+        self.assertAlmostEqual(sum(p.weight for p in self.slam.particles), 1.0)
+
+        # New particles get their own copy of the certain cells of the best map
+        seed = np.where(np.abs(best.map.grid) > 2.0, best.map.grid, 0.0)
+        injected = self.slam.particles[15:]
+        for p in injected:
+            np.testing.assert_array_equal(p.map.grid, seed)
+            self.assertIsNot(p.map.grid, best.map.grid)
+        self.assertFalse(np.shares_memory(injected[0].map.grid, injected[1].map.grid))
+
+        self.slam.inject_random_particles(min_count=5, around_best=False)
+        for p in self.slam.particles[15:]:
+            self.assertFalse(p.map.grid.any())
+
+    def test_injection_cooldown(self):
+        self.slam.injection_threshold = float("inf")
+        with (
+            mock.patch.object(
+                self.slam,
+                "inject_random_particles",
+                wraps=self.slam.inject_random_particles,
+            ) as inject,
+            mock.patch.object(self.slam, "_save_ready", return_value=False),
+        ):
+            for i in range(12):
+                self.slam.run_iteration(self.lidar, 3.0, ["north", "east"][i % 2])
+
+        # Triggered on the first iteration, then once per cooldown
+        self.assertEqual(inject.call_count, 3)
+        self.assertEqual(self.slam._last_injection, 10)
+
+    def test_state_deltas(self):
+        self.slam.keyframe_interval = 3
+        self.slam.history_keyframes = 2
+        expected = []
+        timestamps = []
+        with mock.patch.object(self.slam, "visualize", return_value=b"\x89PNG"):
+            for i in range(8):
+                self._step(["north", "east", "south", "west"][i % 4])
+                if i == 4:
+                    self.slam.inject_random_particles()
+                entry = self.slam.save()
+                timestamps.append(entry.timestamp)
+                grids = [p.map.grid.copy() for p in self.slam.particles]
+                expected.append((entry.timestamp, grids))
+
+        # Keyframes at saves 0, 3 and 6, only the last two groups are kept
+        state_files = sorted(os.listdir(self.slam.state_dir))
+        self.assertEqual(len(state_files), 5)
+        self.assertEqual(sum(not f.endswith(".delta.npz") for f in state_files), 2)
+
+        for timestamp, grids in expected[3:]:
+            restored = FastSLAM(num_particles=1, data_dir=self.data_dir.name)
+            restored.load(timestamp=timestamp)
+            for p, grid in zip(restored.particles, grids):
+                np.testing.assert_array_equal(p.map.grid, grid)
+
+        # History entries are built from the index
+        restored.load(load_states=True)
+        self.assertEqual([e.timestamp for e in restored.history], timestamps[3:])
+        self.assertEqual(restored.history[-1].kind, STATE_DELTA)
+        self.assertTrue(restored.history[-1].load_image().startswith(b"\x89PNG"))
+
+        # Pruned history can not be restored
+        restored = FastSLAM(num_particles=1, data_dir=self.data_dir.name)
+        restored.load(timestamp=expected[2][0])
+        self.assertEqual(restored.num_particles, 1)
+
+    def test_history_migration(self):
+        with mock.patch.object(self.slam, "visualize", return_value=b""):
+            for i in range(3):
+                self._step("north")
+                self.slam.save()
+        grids = [p.map.grid.copy() for p in self.slam.particles]
+
+        # History of older versions only has the state files
+        os.remove(self.slam.history_index_file)
+        restored = FastSLAM(num_particles=1, data_dir=self.data_dir.name)
+        restored.load(load_states=True)
+
+        self.assertEqual(len(restored.history), 3)
+        self.assertTrue(os.path.exists(restored.history_index_file))
+        for p, grid in zip(restored.particles, grids):
+            np.testing.assert_array_equal(p.map.grid, grid)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -16,12 +16,15 @@
 # DEALINGS IN THE SOFTWARE.
 
 
+import os
+import pickle
 import random
+import tempfile
 import unittest
 
 import numpy as np
 
-from eastworld.miner.slam.grid import OccupancyGridMap
+from eastworld.miner.slam.grid import ANONYMOUS_NODE_PREFIX, OccupancyGridMap
 
 
 class TestOccupancyGridMap(unittest.TestCase):
@@ -146,6 +149,17 @@ class TestOccupancyGridMap(unittest.TestCase):
         )
         np.testing.assert_array_equal(self.grid_map.grid, original_grid)
 
+    def test_update_cells(self):
+        xs = np.array([10, 10, 20, -1, self.grid_map.width])
+        ys = np.array([10, 10, 30, 5, 5])
+        values = np.array([1.0, 0.5, -0.4, 1.0, 1.0])
+        self.grid_map.update_cells(xs, ys, values)
+
+        # Repeated cells accumulate and cells outside the map are ignored
+        self.assertEqual(self.grid_map.grid[10, 10], 1.5)
+        self.assertEqual(self.grid_map.grid[30, 20], -0.4)
+        self.assertEqual(np.count_nonzero(self.grid_map.grid), 2)
+
     def test_is_occupied(self):
         # Initial state: all cells are unoccupied
         for _ in range(10):
@@ -178,6 +192,7 @@ class TestOccupancyGridMap(unittest.TestCase):
 
         original_width = self.grid_map.width
         original_height = self.grid_map.height
+        world_coords = [self.grid_map.grid_to_world(x, y) for x, y, _ in marked_cells]
         x_offset, y_offset = self.grid_map.expand_map()
 
         # Verify that the map size has increased
@@ -196,6 +211,12 @@ class TestOccupancyGridMap(unittest.TestCase):
             new_y = y + y_offset
             self.assertEqual(self.grid_map.grid[new_y, new_x], value)
 
+        # Verify that world coordinates still map to the same cells
+        for (x, y, value), (wx, wy) in zip(marked_cells, world_coords):
+            self.assertEqual(
+                self.grid_map.world_to_grid(wx, wy), (x + x_offset, y + y_offset)
+            )
+
         expanded_width = self.grid_map.width
         expanded_height = self.grid_map.height
 
@@ -282,6 +303,94 @@ class TestOccupancyGridMap(unittest.TestCase):
         self.assertEqual(empty_map.width, original_width)
         self.assertEqual(empty_map.height, original_height)
 
+    def test_snapshot(self):
+        """Test the binary snapshot roundtrip"""
+        self.grid_map.update_cell(10, 20, True)
+        self.grid_map.expand_map(260, 240)
+        self.grid_map.update_nav_topo(3, 12.0, -4.0, "gate")
+        self.grid_map.update_nav_topo(9, 40.0, 4.0)
+
+        with tempfile.TemporaryDirectory() as data_dir:
+            filename = os.path.join(data_dir, "map.npz")
+            self.grid_map.save_snapshot(filename)
+            loaded = OccupancyGridMap.load_snapshot(filename)
+
+        np.testing.assert_array_equal(loaded.grid, self.grid_map.grid)
+        self.assertEqual(
+            (loaded.width, loaded.height, loaded.resolution),
+            (self.grid_map.width, self.grid_map.height, self.grid_map.resolution),
+        )
+        self.assertEqual(
+            loaded.grid_to_world(10, 20), self.grid_map.grid_to_world(10, 20)
+        )
+        self.assertEqual(loaded.nav_nodes, self.grid_map.nav_nodes)
+        self.assertEqual(dict(loaded.nav_edges), dict(self.grid_map.nav_edges))
+
+    def test_nav_version(self):
+        """Test the version counter of the navigation nodes"""
+        self.assertEqual(self.grid_map.nav_version, 0)
+        self.grid_map.update_nav_topo(3, 12.0, -4.0, "gate", allow_isolated=True)
+        self.assertEqual(self.grid_map.nav_version, 1)
+        # No node is added near an existing one
+        self.grid_map.update_nav_topo(4, 13.0, -4.0)
+        self.assertEqual(self.grid_map.nav_version, 1)
+
+        # Maps pickled without the counter start from zero
+        state = self.grid_map.__dict__.copy()
+        del state["nav_version"]
+        restored = OccupancyGridMap.__new__(OccupancyGridMap)
+        restored.__setstate__(state)
+        self.assertEqual(restored.nav_version, 0)
+
+    def test_labeled_nodes(self):
+        """Test the labeled node registry, spatial queries and listeners"""
+        added = []
+        self.grid_map.add_nav_listener(lambda node_id, node: added.append(node_id))
+        self.grid_map.update_nav_topo(1, 0.0, 0.0, allow_isolated=True)
+        self.grid_map.update_nav_topo(2, 30.0, 0.0, "gate", "A gate", True)
+        self.grid_map.update_nav_topo(3, 500.0, 0.0, "tower", "A tower", True)
+
+        anonymous = f"{ANONYMOUS_NODE_PREFIX}0_1"
+        self.assertEqual(added, [anonymous, "gate", "tower"])
+        self.assertEqual(
+            self.grid_map.labeled_nodes, {"gate": "A gate", "tower": "A tower"}
+        )
+        self.assertEqual(
+            self.grid_map.get_nav_nodes(labeled_only=True), ["gate", "tower"]
+        )
+        self.assertEqual(len(self.grid_map.get_nav_nodes()), 3)
+        # Nearest first
+        self.assertEqual(
+            self.grid_map.get_nav_nodes(25.0, 0.0, 40.0), ["gate", anonymous]
+        )
+        self.assertEqual(
+            self.grid_map.get_nav_nodes(25.0, 0.0, 40.0, labeled_only=True), ["gate"]
+        )
+
+        self.grid_map.move_nav_node("tower", 35.0, 5.0)
+        self.assertEqual(self.grid_map.nav_nodes["tower"], (3, 35.0, 5.0, "A tower"))
+        self.assertEqual(
+            self.grid_map.get_nav_nodes(30.0, 0.0, 10.0), ["gate", "tower"]
+        )
+
+        # Snapshots and pickles rebuild the registry, listeners are not kept
+        with tempfile.TemporaryDirectory() as data_dir:
+            filename = os.path.join(data_dir, "map.npz")
+            self.grid_map.save_snapshot(filename)
+            loaded = OccupancyGridMap.load_snapshot(filename)
+        self.assertEqual(loaded.labeled_nodes, self.grid_map.labeled_nodes)
+        self.assertEqual(loaded.get_nav_nodes(30.0, 0.0, 10.0), ["gate", "tower"])
+
+        unpickled = pickle.loads(pickle.dumps(self.grid_map))
+        self.assertEqual(unpickled._nav_listeners, [])
+        state = self.grid_map.__dict__.copy()
+        for name in ("labeled_nodes", "_nav_index", "_nav_listeners"):
+            del state[name]
+        legacy = OccupancyGridMap.__new__(OccupancyGridMap)
+        legacy.__setstate__(state)
+        self.assertEqual(legacy.labeled_nodes, self.grid_map.labeled_nodes)
+        self.assertEqual(legacy.get_nav_nodes(30.0, 0.0, 10.0), ["gate", "tower"])
+
     def test_justify_map_coordinate_consistency(self):
         """Test the consistency of the coordinate system after map adjustment"""
         # Create some structures on the map
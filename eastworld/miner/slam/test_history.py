@@ -0,0 +1,97 @@
+# The MIT License (MIT)
+# Copyright © 2025 Eastworld AI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import os
+import pickle
+import tempfile
+import unittest
+
+import numpy as np
+
+from eastworld.miner.slam.history import (
+    DIRECTION_COLUMNS,
+    DIRECTIONS,
+    SensorHistory,
+    lidar_ranges,
+)
+
+
+class TestSensorHistory(unittest.TestCase):
+    def test_add_get(self):
+        history = SensorHistory(chunk_size=4)
+        history.add(1, {"north": 10.0, "east": 51.0})
+        history.add(6, {"south": 5.5})
+
+        self.assertEqual(len(history), 2)
+        self.assertIn(6, history)
+        self.assertNotIn(2, history)
+        self.assertNotIn(100, history)
+        self.assertEqual(history.get(1), {"east": 51.0, "north": 10.0})
+        self.assertIsNone(history.get(3))
+        self.assertEqual(history.pose_indices().tolist(), [1, 6])
+
+        ranges = history.ranges([6, 1, 9])
+        self.assertEqual(ranges.shape, (3, 8))
+        self.assertEqual(ranges[0, 6], 5.5)
+        self.assertTrue(np.isnan(ranges[2]).all())
+
+    def test_lidar_ranges(self):
+        row = lidar_ranges({"north": 20.0, "west": 51.0})
+        self.assertEqual(row.dtype, np.float32)
+        self.assertEqual(len(row), len(DIRECTIONS))
+        self.assertEqual(row[DIRECTION_COLUMNS["north"]], 20.0)
+        self.assertEqual(row[DIRECTION_COLUMNS["west"]], 51.0)
+        self.assertEqual(np.count_nonzero(np.isnan(row)), len(DIRECTIONS) - 2)
+
+    def test_spill(self):
+        with tempfile.TemporaryDirectory() as spill_dir:
+            history = SensorHistory(chunk_size=4, memory_chunks=1, spill_dir=spill_dir)
+            for i in range(10):
+                history.add(i, {"north": float(i)})
+
+            self.assertEqual(
+                sorted(os.listdir(spill_dir)),
+                ["sensor_000000.npy", "sensor_000001.npy"],
+            )
+            self.assertEqual(history.get(2), {"north": 2.0})
+            with self.assertRaises(ValueError):
+                history.add(3, {"north": 1.0})
+
+            # Spilled chunks are not pickled, they are read back from their files
+            data = pickle.dumps(history)
+            self.assertLess(
+                len(data),
+                len(
+                    pickle.dumps(
+                        SensorHistory.from_dict(
+                            {i: history.get(i) for i in range(10)}, chunk_size=4
+                        )
+                    )
+                ),
+            )
+            loaded = pickle.loads(data)
+            self.assertEqual(loaded.pose_indices().tolist(), list(range(10)))
+            np.testing.assert_array_equal(
+                loaded.ranges([3, 9])[:, DIRECTION_COLUMNS["north"]], [3.0, 9.0]
+            )
+            self.assertEqual(loaded.get(9), {"north": 9.0})
+            self.assertEqual(loaded.get(1), {"north": 1.0})
+
+
+if __name__ == "__main__":
+    unittest.main()
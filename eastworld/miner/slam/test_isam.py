@@ -0,0 +1,464 @@
+# The MIT License (MIT)
+# Copyright © 2025 Eastworld AI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import copy
+import json
+import os
+import pickle
+import tempfile
+import unittest
+from unittest import mock
+
+import gtsam
+import numpy as np
+from gtsam import symbol
+
+from eastworld.miner.slam.grid import OccupancyGridMap
+from eastworld.miner.slam.isam import ISAM2
+
+
+def world_cells(grid_map):
+    """Non-zero cells of a grid map by world cell coordinates"""
+    ys, xs = np.nonzero(grid_map.grid)
+    return {
+        (
+            int(x - grid_map.width // 2 - grid_map.base_offset_x),
+            int(y - grid_map.height // 2 - grid_map.base_offset_y),
+        ): grid_map.grid[y, x]
+        for x, y in zip(xs, ys)
+    }
+
+
+def walk_lidar(i):
+    return {
+        "north": 10.0 + i % 7,
+        "east": 51.0,
+        "south": 5.0 + i % 3,
+        "west": 30.0 + i % 5,
+    }
+
+
+def save_legacy(slam, save_path):
+    """Save SLAM data in the files written before snapshots"""
+    files = {
+        "map.pkl": slam.grid_map,
+        "graphs.pkl": [g for g, _ in slam.segments],
+        "values.pkl": [v for _, v in slam.segments],
+        "key_frames.pkl": {
+            tuple(slam.key_frames.signatures[i]): (
+                i,
+                gtsam.Pose2(*slam.key_frames.pose(i)),
+            )
+            for i in slam.key_frames.signatures
+        },
+        "sensor_data.pkl": {
+            int(i): slam.sensor_data.get(int(i))
+            for i in slam.sensor_data.pose_indices()
+        },
+    }
+    for filename, data in files.items():
+        with open(os.path.join(save_path, filename), "wb") as f:
+            pickle.dump(data, f)
+    with open(os.path.join(save_path, "metadata.json"), "w") as f:
+        json.dump(slam._metadata(), f)
+    os.remove(os.path.join(save_path, "snapshot.pkl"))
+    os.remove(os.path.join(save_path, "steps.wal"))
+
+
+class TestISAM2(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.slam = ISAM2(data_dir=self.data_dir.name, save_interval=1000)
+        # Walk around a square on a small map, so scans reach beyond its border
+        self.slam.grid_map = OccupancyGridMap(width=60, height=60, resolution=2)
+        for i in range(40):
+            self.slam.run_iteration(
+                walk_lidar(i), 25.0, ["north", "east", "south", "west"][i // 10]
+            )
+
+    def tearDown(self):
+        self.data_dir.cleanup()
+
+    def _close_loop(self):
+        """Pull the last pose to the first one, moving most of the trajectory"""
+        graph = gtsam.NonlinearFactorGraph()
+        self.slam._add_factor(
+            graph,
+            gtsam.BetweenFactorPose2(
+                symbol("x", self.slam.pose_index),
+                symbol("x", 1),
+                gtsam.Pose2(0.0, 0.0, 0.0),
+                self.slam.loop_noise,
+            ),
+        )
+        self.slam._update_isam(graph, gtsam.Values())
+
+    def assertMapsEqual(self, first, second):
+        first, second = world_cells(first), world_cells(second)
+        for cell in first.keys() | second.keys():
+            self.assertAlmostEqual(first.get(cell, 0.0), second.get(cell, 0.0))
+
+    def composed_map(self):
+        """Grid map composed from scratch of all submaps at their placed anchors"""
+        grid_map = copy.deepcopy(self.slam.grid_map)
+        grid_map.reset()
+        slam = copy.copy(self.slam)
+        slam.grid_map = grid_map
+        for submap in self.slam.submaps.values():
+            slam._place_cells(submap, *submap.cells())
+        return grid_map
+
+    def test_submaps(self):
+        self.assertGreater(len(self.slam.submaps), 1)
+        self.assertEqual(
+            sum(submap.num_scans for submap in self.slam.submaps.values()), 40
+        )
+        # Only the active submap keeps a dense grid
+        active = [s for s in self.slam.submaps.values() if not s.frozen]
+        self.assertEqual(active, [self.slam.active_submap])
+        self.assertMapsEqual(self.slam.grid_map, self.composed_map())
+
+    def test_rebuild_moves_submaps(self):
+        self._close_loop()
+        self.slam.rebuild_distance_threshold = 0.0
+        self.slam.rebuild_angle_threshold = 0.0
+        anchors = {i: s.placed_anchor for i, s in self.slam.submaps.items()}
+        self.slam._rebuild_grid_map()
+
+        result = self.slam.isam.calculateEstimate()
+        for i, submap in self.slam.submaps.items():
+            pose = result.atPose2(symbol("x", i))
+            self.assertEqual(submap.placed_anchor, (pose.x(), pose.y(), pose.theta()))
+        self.assertNotEqual(
+            anchors, {i: s.placed_anchor for i, s in self.slam.submaps.items()}
+        )
+        self.assertMapsEqual(self.slam.grid_map, self.composed_map())
+
+    def test_rebuild_threshold(self):
+        anchors = {i: s.placed_anchor for i, s in self.slam.submaps.items()}
+        self.slam.rebuild_distance_threshold = float("inf")
+        self.slam.rebuild_angle_threshold = float("inf")
+        self._close_loop()
+        self.slam._rebuild_grid_map()
+        self.assertEqual(
+            anchors, {i: s.placed_anchor for i, s in self.slam.submaps.items()}
+        )
+
+    def test_estimate_cache(self):
+        result = self.slam._estimate()
+        self.assertIs(result, self.slam._estimate())
+        for i in [1, 20, self.slam.pose_index]:
+            pose = result.atPose2(symbol("x", i))
+            self.assertTrue(pose.equals(self.slam._pose_estimate(i), 1e-9))
+        self.assertIsNone(self.slam._pose_estimate(self.slam.pose_index + 1))
+
+        # Solver updates invalidate the cached estimate
+        self._close_loop()
+        self.assertIsNot(result, self.slam._estimate())
+        pose = self.slam._pose_estimate(20)
+        self.slam._estimate_cache = None
+        self.assertTrue(pose.equals(self.slam._pose_estimate(20), 1e-9))
+
+    def test_landmark_association(self):
+        slam = ISAM2(data_dir=self.data_dir.name, save_interval=1000)
+        lidar = {"north": 10.0, "east": 51.0, "south": 10.0, "west": 20.0}
+        for i in range(10):
+            slam.run_iteration(lidar, 5.0, ["north", "south"][i % 2])
+
+        # Walking back and forth observes the same landmarks, max range readings
+        # add none
+        self.assertEqual(slam.landmark_index, 6)
+        self.assertEqual(len(slam.landmarks), 6)
+        self.assertEqual(slam._num_variables, 1 + 10 + 6)
+
+    def test_key_frame_offset(self):
+        slam = ISAM2(data_dir=self.data_dir.name, save_interval=1000)
+        lidar = {"north": 10.0, "east": 4.0, "south": 20.0, "west": 8.0}
+        slam.key_frames.add(5, 0.0, 0.0, 0.0, slam._signature(lidar))
+
+        # One meter east and north of the key frame
+        lidar = {"north": 9.0, "east": 3.0, "south": 21.0, "west": 9.0}
+        self.assertEqual(slam._key_frame_offset(5, lidar), (-1.0, -1.0))
+        lidar = {"north": 9.0, "east": 51.0, "south": 51.0, "west": 9.0}
+        self.assertEqual(slam._key_frame_offset(5, lidar), (-1.0, -1.0))
+
+    def test_save_load(self):
+        self.slam.save(self.data_dir.name)
+        loaded = ISAM2(load_data=True, data_dir=self.data_dir.name)
+        self.assertEqual(self.slam.submaps.keys(), loaded.submaps.keys())
+        self.assertIs(loaded.active_submap, list(loaded.submaps.values())[-1])
+        self.assertMapsEqual(self.slam.grid_map, loaded.grid_map)
+
+        # Data saved before snapshots builds the submaps from the sensor data
+        save_legacy(self.slam, self.data_dir.name)
+        loaded = ISAM2(load_data=True, data_dir=self.data_dir.name)
+        self.assertEqual(loaded.pose_index, self.slam.pose_index)
+        self.assertEqual(
+            sum(submap.num_scans for submap in loaded.submaps.values()),
+            len(self.slam.sensor_data),
+        )
+        self.assertEqual(
+            loaded.key_frames.signatures.keys(), self.slam.key_frames.signatures.keys()
+        )
+        self.assertEqual(len(loaded.landmarks), 0)
+
+    def test_replay_reads_rows(self):
+        # Replay integrates the rows of the columnar history, not per pose dicts
+        with mock.patch.object(
+            self.slam.sensor_data, "get", side_effect=AssertionError
+        ):
+            self.slam._replay_submaps()
+        self.assertEqual(
+            sum(submap.num_scans for submap in self.slam.submaps.values()),
+            len(self.slam.sensor_data),
+        )
+        self.assertMapsEqual(self.composed_map(), self.slam.grid_map)
+
+    def test_restore_estimate(self):
+        # The solver is restored at the saved linearisation point
+        self._close_loop()
+        self.slam.save()
+        loaded = ISAM2(load_data=True, data_dir=self.data_dir.name)
+        for pose_index in (1, 20, 40):
+            self.assertTrue(
+                loaded._pose_estimate(pose_index).equals(
+                    self.slam._pose_estimate(pose_index), 1e-6
+                )
+            )
+
+    def assertPoseAlmostEqual(self, first, second):
+        for a, b in zip(first, second):
+            self.assertAlmostEqual(a, b, places=3)
+
+    def test_replay_log(self):
+        # Without a snapshot since the start, the steps are replayed from the log
+        loaded = ISAM2(load_data=True, data_dir=self.data_dir.name)
+        self.assertEqual(loaded.pose_index, self.slam.pose_index)
+        np.testing.assert_array_equal(
+            loaded.sensor_data.pose_indices(), self.slam.sensor_data.pose_indices()
+        )
+        self.assertPoseAlmostEqual(
+            loaded.get_current_pose(), self.slam.get_current_pose()
+        )
+
+    def test_snapshot_and_log(self):
+        self.slam.save()
+        self.assertEqual(
+            os.path.getsize(os.path.join(self.data_dir.name, "steps.wal")), 0
+        )
+        for i in range(5):
+            self.slam.run_iteration(walk_lidar(i), 10.0, "north")
+
+        loaded = ISAM2(load_data=True, data_dir=self.data_dir.name)
+        self.assertEqual(loaded.pose_index, self.slam.pose_index)
+        self.assertEqual(loaded.submaps.keys(), self.slam.submaps.keys())
+        self.assertPoseAlmostEqual(
+            loaded.get_current_pose(), self.slam.get_current_pose()
+        )
+
+        # Steps logged before the snapshot are not replayed again
+        loaded.save()
+        loaded.run_iteration(walk_lidar(0), 10.0, "east")
+        loaded._wal_seq = 0
+        loaded._append_wal(walk_lidar(0), 10.0, "east")
+        again = ISAM2(load_data=True, data_dir=self.data_dir.name)
+        self.assertEqual(again.pose_index, loaded.pose_index)
+
+    def test_incomplete_log_record(self):
+        wal_file = os.path.join(self.data_dir.name, "steps.wal")
+        size = os.path.getsize(wal_file)
+        with open(wal_file, "ab") as f:
+            f.write(b"\x40\x00\x00\x00partial")
+
+        loaded = ISAM2(load_data=True, data_dir=self.data_dir.name)
+        self.assertEqual(loaded.pose_index, self.slam.pose_index)
+        self.assertEqual(os.path.getsize(wal_file), size)
+
+    def test_snapshot_map_names(self):
+        # Saving twice at the same log position keeps the map the snapshot points to
+        maps = []
+        for _ in range(2):
+            self.slam.save()
+            maps += [
+                f
+                for f in os.listdir(self.data_dir.name)
+                if f.startswith("snapshot_map_")
+            ]
+        # The previous map is removed once the new snapshot points to the new one
+        self.assertEqual(len(maps), 2)
+        self.assertNotEqual(maps[0], maps[1])
+        loaded = ISAM2(load_data=True, data_dir=self.data_dir.name)
+        self.assertMapsEqual(self.slam.grid_map, loaded.grid_map)
+
+    def test_keep_persisted_state(self):
+        wal_file = os.path.join(self.data_dir.name, "steps.wal")
+        size = os.path.getsize(wal_file)
+
+        # A new session keeps the data until its first step
+        fresh = ISAM2(data_dir=self.data_dir.name)
+        self.assertEqual(os.path.getsize(wal_file), size)
+        loaded = ISAM2(load_data=True, data_dir=self.data_dir.name)
+        self.assertEqual(loaded.pose_index, self.slam.pose_index)
+
+        fresh.run_iteration(walk_lidar(0), 10.0, "north")
+        self.assertEqual(os.path.getsize(wal_file), 0)
+        fresh.run_iteration(walk_lidar(1), 10.0, "north")
+        loaded = ISAM2(load_data=True, data_dir=self.data_dir.name)
+        self.assertEqual(loaded.pose_index, 2)
+
+        # Unless a reset is asked for
+        ISAM2(data_dir=self.data_dir.name, reset=True)
+        self.assertEqual(os.path.getsize(wal_file), 0)
+        loaded = ISAM2(load_data=True, data_dir=self.data_dir.name)
+        self.assertEqual(loaded.pose_index, 0)
+
+    def test_spill_dir_per_history(self):
+        self.slam.sensor_data.chunk_size = 4
+        self.slam.sensor_data.memory_chunks = 1
+        for i in range(10):
+            self.slam.sensor_data.add(100 + i, walk_lidar(i))
+        self.slam.save()
+        spill_dir = self.slam.sensor_data.spill_dir
+        chunks = os.listdir(spill_dir)
+        self.assertTrue(chunks)
+
+        # A reset history spills to a new directory, the snapshot keeps its chunks
+        self.slam._reset_isam()
+        self.assertNotEqual(self.slam.sensor_data.spill_dir, spill_dir)
+        self.assertEqual(os.listdir(spill_dir), chunks)
+        loaded = ISAM2(load_data=True, data_dir=self.data_dir.name)
+        self.assertEqual(loaded.sensor_data.spill_dir, spill_dir)
+        self.assertEqual(loaded.sensor_data.get(100), walk_lidar(0))
+
+        # Until the next snapshot no longer refers to them
+        self.slam.save()
+        self.assertFalse(os.path.exists(spill_dir))
+
+
+class TestISAM2Smoother(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.slam = ISAM2(
+            data_dir=self.data_dir.name, save_interval=1000, smoother_lag=20.0
+        )
+        self.slam.key_frame_retention = 2
+        for i in range(200):
+            self.slam.run_iteration(
+                walk_lidar(i), 5.0, ["north", "east", "south", "west"][i // 10 % 4]
+            )
+
+    def tearDown(self):
+        self.data_dir.cleanup()
+
+    def test_marginalisation(self):
+        timestamps = self.slam.smoother.timestamps()
+        self.assertFalse(self.slam.isam.valueExists(symbol("x", 1)))
+        self.assertTrue(self.slam.isam.valueExists(symbol("x", 200)))
+        self.assertEqual(len(self.slam.segments[-1][0].keys()), 0)
+        self.assertLessEqual(len(self.slam.key_frames), 2)
+        for pose_index in self.slam.key_frames:
+            self.assertIn(symbol("x", pose_index), timestamps)
+        self.assertLess(len(timestamps), 100)
+
+    def test_save_load(self):
+        self.slam.save()
+        loaded = ISAM2(load_data=True, data_dir=self.data_dir.name, smoother_lag=20.0)
+        self.assertEqual(loaded.smoother.timestamps(), self.slam.smoother.timestamps())
+        for a, b in zip(loaded.get_current_pose(), self.slam.get_current_pose()):
+            self.assertAlmostEqual(a, b, places=3)
+
+        # Poses of the loaded window are marginalised as the window moves on
+        for i in range(30):
+            loaded.run_iteration(walk_lidar(i), 5.0, "north")
+        for pose_index in range(180, 200):
+            self.assertEqual(
+                loaded.isam.valueExists(symbol("x", pose_index)),
+                pose_index in loaded.key_frames,
+            )
+
+
+class TestISAM2Background(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.slam = ISAM2(
+            data_dir=self.data_dir.name, save_interval=1000, background=True
+        )
+
+    def tearDown(self):
+        self.slam.stop()
+        self.data_dir.cleanup()
+
+    def test_dead_reckoning(self):
+        # Without a worker steps stay queued, the pose is dead-reckoned
+        version = self.slam.pose_version
+        self.slam.submit(walk_lidar(0), 5.0, "north")
+        self.slam.submit(walk_lidar(1), 3.0, "east")
+        self.slam.submit(walk_lidar(2), 0.0, "east")
+        x, y, _ = self.slam.get_current_pose()
+        self.assertAlmostEqual(x, 3.0)
+        self.assertAlmostEqual(y, 5.0)
+        self.assertEqual(self.slam.pose_version, version + 2)
+        self.assertEqual(self.slam.latest_pose_index, 2)
+        self.assertEqual(self.slam.pose_index, 0)
+
+        self.slam.start()
+        self.slam.flush()
+        self.assertEqual(self.slam.pose_index, 2)
+        self.assertEqual(self.slam.latest_pose_index, 2)
+        x, y, _ = self.slam.get_current_pose()
+        self.assertAlmostEqual(x, self.slam.current_x)
+        self.assertAlmostEqual(y, self.slam.current_y)
+
+    def test_matches_synchronous(self):
+        sync_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(sync_dir.cleanup)
+        sync = ISAM2(data_dir=sync_dir.name, save_interval=1000)
+
+        pose_indices = []
+        self.slam.start()
+        for i in range(15):
+            direction = ["north", "east"][i // 8]
+            self.slam.submit(walk_lidar(i), 10.0, direction)
+            sync.submit(walk_lidar(i), 10.0, direction)
+            self.slam.schedule(lambda slam: pose_indices.append(slam.pose_index))
+        self.slam.flush()
+
+        self.assertEqual(pose_indices, list(range(1, 16)))
+        self.assertEqual(self.slam.get_current_pose(), sync.get_current_pose())
+        np.testing.assert_array_equal(self.slam.grid_map.grid, sync.grid_map.grid)
+
+    def test_call(self):
+        self.slam.submit(walk_lidar(0), 10.0, "north")
+        future = self.slam.call(lambda slam: slam.pose_index)
+        failed = self.slam.call(lambda slam: slam.grid_map.nav_nodes["missing"])
+        self.assertFalse(future.done())
+
+        self.slam.start()
+        self.assertEqual(future.result(timeout=10), 1)
+        with self.assertRaises(KeyError):
+            failed.result(timeout=10)
+
+        # Without background mode the callback runs right away
+        sync_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(sync_dir.cleanup)
+        sync = ISAM2(data_dir=sync_dir.name, save_interval=1000)
+        self.assertEqual(sync.call(lambda slam: slam.pose_index).result(timeout=0), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+# The MIT License (MIT)
+# Copyright © 2025 Eastworld AI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import unittest
+
+from eastworld.miner.slam.keyframes import KeyFrameIndex
+
+
+class TestKeyFrameIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = KeyFrameIndex(cell_size=100.0, tolerance=1.0)
+        self.index.add(10, 0.0, 0.0, 0.0, [5, 10, 20, 51, 51, 3, 8, 12])
+        self.index.add(20, 40.0, 0.0, 0.0, [5, 11, 20, 50, 51, 3, 8, 12])
+        self.index.add(30, 500.0, 0.0, 0.0, [5, 10, 20, 51, 51, 3, 8, 12])
+
+    def test_match(self):
+        signature = [5, 10, 20, 51, 51, 3, 8, 12]
+        self.assertEqual(self.index.match(0.0, 0.0, signature, 100.0), 10)
+
+        # Near matches within the tolerance, the closest signature wins
+        signature = [6, 11, 20, 50, 51, 3, 8, 12]
+        self.assertEqual(self.index.match(10.0, 0.0, signature, 100.0), 20)
+        signature = [7, 10, 20, 51, 51, 3, 8, 12]
+        self.assertIsNone(self.index.match(10.0, 0.0, signature, 100.0))
+
+        # Only key frames near the position and before the pose index
+        signature = [5, 10, 20, 51, 51, 3, 8, 12]
+        self.assertEqual(self.index.match(480.0, 0.0, signature, 100.0), 30)
+        self.assertEqual(self.index.match(0.0, 0.0, signature, 100.0, before=20), 10)
+        self.assertIsNone(self.index.match(0.0, 0.0, signature, 100.0, before=10))
+
+    def test_invalid_key_frames(self):
+        signature = [5, 10, 20, 51, 51, 3, 8, 12]
+        match = self.index.match(0.0, 0.0, signature, 100.0, is_valid=lambda i: i > 10)
+        self.assertEqual(match, 20)
+        self.assertNotIn(10, self.index)
+        self.assertNotIn(10, self.index.signatures)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+# The MIT License (MIT)
+# Copyright © 2025 Eastworld AI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import unittest
+
+from eastworld.miner.slam.landmarks import LandmarkIndex
+
+
+class TestLandmarkIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = LandmarkIndex(cell_size=1.0)
+        self.index.add(1, 0.0, 0.0, pose_index=1)
+        self.index.add(2, 0.9, 0.0, pose_index=2)
+        self.index.add(3, -5.0, 3.0, pose_index=3)
+
+    def test_nearest(self):
+        self.assertEqual(self.index.nearest(0.6, 0.1, 1.0), 2)
+        self.assertEqual(self.index.nearest(0.3, -0.1, 1.0), 1)
+        self.assertEqual(self.index.nearest(0.6, 0.1, 1.0, exclude={2}), 1)
+        self.assertIsNone(self.index.nearest(-3.0, 3.0, 1.0))
+
+        # Gates larger than the cells search the neighbouring cells
+        self.assertEqual(self.index.nearest(-3.0, 3.0, 2.5), 3)
+
+    def test_move_and_prune(self):
+        self.index.move(3, 10.0, 10.0)
+        self.assertIsNone(self.index.nearest(-5.0, 3.0, 1.0))
+        self.assertEqual(self.index.nearest(10.0, 10.0, 1.0), 3)
+
+        self.index.observe(1, 5)
+        self.index.prune(3)
+        self.assertEqual(sorted(self.index), [1, 3])
+        self.assertIsNone(self.index.nearest(0.9, 0.0, 0.5))
+        self.assertEqual(len(self.index), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+# The MIT License (MIT)
+# Copyright © 2025 Eastworld AI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import struct
+import unittest
+import zlib
+
+import numpy as np
+
+from eastworld.miner.slam.render import RED, MapCanvas, encode_png, log_odds_to_image
+
+
+def decode_png(data: bytes) -> np.ndarray:
+    """Decode the unfiltered RGB PNG images written by `encode_png`"""
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+    pos = 8
+    chunks = {}
+    while pos < len(data):
+        (length,) = struct.unpack(">I", data[pos : pos + 4])
+        tag = data[pos + 4 : pos + 8]
+        body = data[pos + 8 : pos + 8 + length]
+        (crc,) = struct.unpack(">I", data[pos + 8 + length : pos + 12 + length])
+        assert crc == zlib.crc32(tag + body)
+        chunks[tag] = chunks.get(tag, b"") + body
+        pos += 12 + length
+
+    width, height = struct.unpack(">II", chunks[b"IHDR"][:8])
+    raw = np.frombuffer(zlib.decompress(chunks[b"IDAT"]), dtype=np.uint8)
+    raw = raw.reshape(height, width * 3 + 1)
+    assert np.all(raw[:, 0] == 0)
+    return raw[:, 1:].reshape(height, width, 3)
+
+
+class TestRender(unittest.TestCase):
+    def test_log_odds_to_image(self):
+        grid = np.zeros((4, 6))
+        grid[0, 0] = 10.0  # occupied
+        grid[3, 5] = -10.0  # free
+        image = log_odds_to_image(grid, scale=2)
+
+        self.assertEqual(image.shape, (8, 12, 3))
+        self.assertEqual(image.dtype, np.uint8)
+        # First grid row at the bottom
+        self.assertTrue(np.all(image[7, 0] == 0))
+        self.assertTrue(np.all(image[0, 11] == 255))
+        self.assertTrue(np.all(image[4, 4] == 128))
+
+    def test_encode_png(self):
+        image = np.random.randint(0, 256, size=(7, 5, 3), dtype=np.uint8)
+        np.testing.assert_array_equal(decode_png(encode_png(image)), image)
+
+    def test_canvas(self):
+        canvas = MapCanvas(np.zeros((10, 20)), scale=3)
+        canvas.points([2], [1], RED, radius=0)
+        self.assertEqual(tuple(canvas.image[8 * 3 + 1, 2 * 3 + 1]), RED)
+
+        canvas.lines([0], [9], [19], [9], RED)
+        self.assertTrue(np.all(canvas.image[1, 1 : 19 * 3 + 2] == RED))
+
+        # Markers outside the image are clipped
+        canvas.points([-5, 25], [0, 0], RED, radius=4)
+
+
+if __name__ == "__main__":
+    unittest.main()
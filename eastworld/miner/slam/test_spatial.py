@@ -0,0 +1,40 @@
+# The MIT License (MIT)
+# Copyright © 2025 Eastworld AI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import unittest
+
+from eastworld.miner.slam.spatial import SpatialHash
+
+
+class TestSpatialHash(unittest.TestCase):
+    def test_nearby(self):
+        spatial = SpatialHash(cell_size=2.0)
+        spatial.move(1, 0.0, 0.0)
+        spatial.move(2, 3.0, 4.0)
+        spatial.move(3, -10.0, 0.0)
+
+        self.assertEqual(sorted(spatial.nearby(0.0, 0.0, 5.0)), [(1, 0.0), (2, 5.0)])
+        spatial.move(2, -9.0, 0.0)
+        self.assertEqual(sorted(i for i, _ in spatial.nearby(-10.0, 0.0, 1.0)), [2, 3])
+        spatial.remove(3)
+        self.assertEqual(sorted(spatial), [1, 2])
+        self.assertNotIn(3, spatial)
+
+
+if __name__ == "__main__":
+    unittest.main()
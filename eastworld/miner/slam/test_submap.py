@@ -0,0 +1,60 @@
+# The MIT License (MIT)
+# Copyright © 2025 Eastworld AI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import math
+import unittest
+
+import numpy as np
+
+from eastworld.miner.slam.submap import Submap
+
+
+class TestSubmap(unittest.TestCase):
+    def setUp(self):
+        self.submap = Submap(anchor_index=3, resolution=2.0, size=20)
+        self.anchor = (10.0, -4.0, math.pi / 2)
+
+    def test_to_local(self):
+        x, y, theta = self.submap.to_local(self.anchor, 10.0, 2.0, math.pi)
+        self.assertAlmostEqual(x, 6.0)
+        self.assertAlmostEqual(y, 0.0)
+        self.assertAlmostEqual(theta, math.pi / 2)
+
+        # Cell centers go back to the world pose they were taken from
+        xs, ys = self.submap.to_world(np.array([2]), np.array([-1]), self.anchor)
+        x, y, _ = self.submap.to_local(self.anchor, xs[0], ys[0], 0.0)
+        self.assertAlmostEqual(x, 5.0)
+        self.assertAlmostEqual(y, -1.0)
+
+    def test_freeze(self):
+        grid = self.submap.grid
+        grid.update_cell(12, 7, True)
+        grid.update_cell(3, 15, False)
+        grid.expand_map()
+        cells = self.submap.cells()
+
+        self.submap.freeze()
+        self.assertTrue(self.submap.frozen)
+        for before, after in zip(cells, self.submap.cells()):
+            np.testing.assert_array_equal(before, after)
+        np.testing.assert_array_equal(self.submap.cells()[0], [2, -7])
+        np.testing.assert_array_equal(self.submap.cells()[1], [-3, 5])
+
+
+if __name__ == "__main__":
+    unittest.main()
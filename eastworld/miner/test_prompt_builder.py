@@ -0,0 +1,61 @@
+# The MIT License (MIT)
+# Copyright © 2025 Eastworld AI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import unittest
+
+from eastworld.miner.prompt_builder import PromptBuilder, content_version
+
+
+class TestPromptBuilder(unittest.TestCase):
+    def test_section(self):
+        builder = PromptBuilder()
+        renders = []
+
+        def render():
+            renders.append(1)
+            return f"  - goal {len(renders)}"
+
+        self.assertEqual(builder.section("goals", 1, render), "  - goal 1")
+        self.assertEqual(builder.section("goals", 1, render), "  - goal 1")
+        self.assertEqual(builder.section("goals", 2, render), "  - goal 2")
+        self.assertEqual(len(renders), 2)
+        self.assertEqual((builder.hits, builder.misses), (1, 2))
+
+        # Sections are cached independently
+        self.assertEqual(builder.section("plans", 2, lambda: "plan"), "plan")
+        self.assertEqual(builder.section("goals", 2, render), "  - goal 2")
+
+        builder.invalidate("goals")
+        self.assertEqual(builder.section("goals", 2, render), "  - goal 3")
+        builder.invalidate()
+        self.assertEqual(builder.section("plans", 2, lambda: "new plan"), "new plan")
+
+    def test_content_version(self):
+        action_space = [{"function": {"name": "talk", "description": "Talk"}}]
+        self.assertEqual(
+            content_version(action_space),
+            content_version([{"function": {"description": "Talk", "name": "talk"}}]),
+        )
+        self.assertNotEqual(
+            content_version(action_space),
+            content_version([{"function": {"name": "talk", "description": "Say"}}]),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,491 @@
+# The MIT License (MIT)
+# Copyright © 2025 Eastworld AI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import asyncio
+import concurrent.futures
+import json
+import os
+import tempfile
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from langchain_core.prompts import PromptTemplate
+
+from eastworld.base.miner import BaseMinerNeuron
+from eastworld.miner import senior
+from eastworld.miner.memory.embeddings import HashingEmbedder
+from eastworld.miner.memory.episodic import EpisodicMemory
+from eastworld.miner.prompt_builder import PromptBuilder
+from eastworld.miner.senior import (
+    FORWARD_RESPONSE_MARGIN,
+    NODE_DEADLINES,
+    JSONFileMemory,
+    SeniorAgent,
+)
+from eastworld.miner.slam.grid import OccupancyGridMap
+
+MOVE_EAST = {
+    "name": "move_in_direction",
+    "arguments": {"direction": "east", "distance": 5},
+}
+MOVE_WEST = {
+    "name": "move_in_direction",
+    "arguments": {"direction": "west", "distance": 5},
+}
+
+
+def make_synapse(timeout: float) -> SimpleNamespace:
+    return SimpleNamespace(
+        timeout=timeout,
+        dendrite=None,
+        sensor=SimpleNamespace(
+            lidar=[["north", "20.0m"], ["east", "8.0m"], ["south", "30.0m"]],
+            odometry=["north", "0m"],
+        ),
+        action=None,
+    )
+
+
+def make_agent(data_dir: str) -> SeniorAgent:
+    """Agent with the state `forward` needs, without a wallet or the network"""
+    agent = object.__new__(SeniorAgent)
+    agent.uid = 0
+    agent.step = 0
+    agent.graph_task = None
+    agent.graph_late = False
+    agent.late_action = None
+    agent.memory = JSONFileMemory(os.path.join(data_dir, "memory.json"))
+    agent.episode_situation = None
+    agent.local_action_space = []
+    agent.maze_run_explore_direction = "north"
+    agent.maze_run_counter = 0
+    return agent
+
+
+class StubLLM:
+    """
+    Chat completions stub answering each kind of call, after the delay set for
+    the kind: "landmark", "review", "action" or "objectives"
+    """
+
+    def __init__(self, **delays: float):
+        self.delays = delays
+        self.calls: list[str] = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, model, messages, tools=None, tool_choice=None):
+        prompt = messages[0]["content"]
+        if tools is not None:
+            kind = "action"
+        elif model == "small":
+            kind = "landmark"
+        elif "Reflection and State Summary" in prompt:
+            kind = "objectives"
+        else:
+            kind = "review"
+        self.calls.append(kind)
+        await asyncio.sleep(self.delays.get(kind, 0.0))
+
+        message = SimpleNamespace(content="", tool_calls=None)
+        if kind == "action":
+            message.tool_calls = [
+                SimpleNamespace(
+                    function=SimpleNamespace(
+                        name="move_in_direction",
+                        arguments=json.dumps(MOVE_EAST["arguments"]),
+                    )
+                )
+            ]
+        elif kind == "landmark":
+            message.content = "NA"
+        elif kind == "objectives":
+            message.content = "Find the exit\n\nFollow the wall"
+        else:
+            message.content = "The corridor continues east"
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+class StubSLAM:
+    """SLAM stub running its callbacks right away"""
+
+    def __init__(self):
+        self.grid_map = OccupancyGridMap(width=50, height=50, resolution=2)
+        self.latest_pose_index = 0
+
+    def get_current_pose(self):
+        return 0.0, 0.0, 0.0
+
+    def submit(self, lidar_data, odometry, odometry_direction):
+        pass
+
+    def schedule(self, callback):
+        pass
+
+    def call(self, callback):
+        future = concurrent.futures.Future()
+        future.set_result(callback(self))
+        return future
+
+
+def make_graph_agent(data_dir: str, llm: StubLLM) -> SeniorAgent:
+    """Agent running the full LLM graph against the stubbed LLM and SLAM"""
+    agent = make_agent(data_dir)
+    agent.llm = llm
+    agent.model_small = "small"
+    agent.model_medium = agent.model_large = "large"
+    agent.slam = StubSLAM()
+    agent.prompts = PromptBuilder()
+    agent.episodic_memory = EpisodicMemory(
+        os.path.join(data_dir, "episodic"), HashingEmbedder()
+    )
+    agent.memory.set("goals", ["Explore the canyon"])
+    agent.memory.set("plans", ["Follow the wall"])
+    agent.landmark_annotation_step = -5
+    # Reevaluation is tested on its own, keep it out of the graph runs
+    agent.objective_reevaluation_step = 1000
+    agent.objective_reevaluation_task = None
+    prompt_dir = "eastworld/miner/prompts"
+    for name in [
+        "landmark_annotation",
+        "after_action_review",
+        "grounding_learning",
+        "objective_reevaluation",
+        "action_selection",
+    ]:
+        setattr(
+            agent,
+            f"{name}_prompt",
+            PromptTemplate.from_file(os.path.join(prompt_dir, f"senior_{name}.txt")),
+        )
+    agent.graph = agent._build_graph()
+    return agent
+
+
+def make_observation(timeout: float) -> SimpleNamespace:
+    synapse = make_synapse(timeout)
+    synapse.sensor.odometry = ["north", "5.0m"]
+    synapse.perception = SimpleNamespace(
+        environment="A narrow canyon", objects="A crate", interactions=[]
+    )
+    synapse.items = []
+    synapse.action_log = []
+    synapse.action_space = [
+        {"function": {"name": "move_in_direction", "description": "Move"}}
+    ]
+    return synapse
+
+
+def graph_returning(action: dict, situation: str, delay: float = 0.0):
+    """Stub LLM graph selecting an action after a delay"""
+
+    async def ainvoke(state, config):
+        await asyncio.sleep(delay)
+        return {
+            **state,
+            "action": action,
+            "selected_action": action,
+            "situation": situation,
+        }
+
+    return SimpleNamespace(ainvoke=ainvoke)
+
+
+class TestForwardDeadline(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.agent = make_agent(self.data_dir.name)
+        self.timeout = FORWARD_RESPONSE_MARGIN + 0.05
+
+    def tearDown(self):
+        self.data_dir.cleanup()
+
+    async def test_deadline_fallback(self):
+        self.agent.graph = graph_returning(MOVE_EAST, "corridor", delay=0.3)
+        synapse = await self.agent.forward(make_synapse(self.timeout))
+
+        # The local policy answers, nothing is logged for the late action
+        self.assertNotEqual(synapse.action, [MOVE_EAST])
+        self.assertEqual(synapse.action[0]["name"], "move_in_direction")
+        self.assertTrue(self.agent.graph_late)
+        self.assertEqual(self.agent.memory.memory["logs"], [])
+        self.assertIsNone(self.agent.episode_situation)
+
+        await self.agent.graph_task
+        self.assertEqual(self.agent.late_action, (MOVE_EAST, "corridor"))
+        self.assertEqual(self.agent.memory.memory["logs"], [])
+
+    async def test_late_action_reuse(self):
+        self.agent.graph = graph_returning(MOVE_EAST, "corridor", delay=0.3)
+        await self.agent.forward(make_synapse(self.timeout))
+        await self.agent.graph_task
+
+        # The next step misses its deadline too, the late action is returned
+        self.agent.graph = graph_returning(MOVE_WEST, "junction", delay=0.3)
+        synapse = await self.agent.forward(make_synapse(self.timeout))
+        self.assertEqual(synapse.action, [MOVE_EAST])
+        logs = self.agent.memory.memory["logs"]
+        self.assertEqual(
+            [log["action"] for log in logs],
+            ["move_in_direction, direction: east, distance: 5"],
+        )
+        self.assertEqual(self.agent.episode_situation, "corridor")
+        await self.agent.graph_task
+
+        # An on time run drops the late action without logging it
+        self.agent.graph = graph_returning(MOVE_WEST, "junction")
+        synapse = await self.agent.forward(make_synapse(self.timeout))
+        self.assertEqual(synapse.action, [MOVE_WEST])
+        self.assertIsNone(self.agent.late_action)
+        self.assertEqual(len(self.agent.memory.memory["logs"]), 2)
+        self.assertEqual(
+            self.agent.memory.memory["logs"][-1]["action"],
+            "move_in_direction, direction: west, distance: 5",
+        )
+        self.assertEqual(self.agent.episode_situation, "junction")
+
+    async def test_late_run_skips_execution(self):
+        self.agent.graph_late = True
+        state = {
+            "observation": make_synapse(self.timeout),
+            "action": {"name": "navigate_to", "arguments": {"target": "gate"}},
+            "errors": set(),
+        }
+        with mock.patch.object(self.agent, "execute_action") as execute_action:
+            state = await self.agent.action_execution(state)
+        execute_action.assert_not_called()
+        self.assertEqual(state["action"]["name"], "navigate_to")
+
+
+class TestNodeDeadlines(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.data_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.data_dir.cleanup()
+
+    async def test_graph_on_time(self):
+        agent = make_graph_agent(self.data_dir.name, StubLLM())
+        state = await agent.graph.ainvoke(
+            {"observation": make_observation(5.0), "errors": set()}
+        )
+        self.assertEqual(state["errors"], set())
+        self.assertEqual(state["action"], MOVE_EAST)
+        self.assertEqual(agent.llm.calls.count("action"), 1)
+
+    async def test_node_past_deadline(self):
+        kinds = {
+            "Landmark Annotation": "landmark",
+            "After-Action Review": "review",
+            "Action Selection": "action",
+        }
+        self.assertEqual(kinds.keys(), NODE_DEADLINES.keys())
+        for name, kind in kinds.items():
+            with self.subTest(node=name), mock.patch.dict(NODE_DEADLINES, {name: 0.05}):
+                agent = make_graph_agent(self.data_dir.name, StubLLM(**{kind: 5.0}))
+                loop = asyncio.get_running_loop()
+                start = loop.time()
+                state = await agent.graph.ainvoke(
+                    {"observation": make_observation(5.0), "errors": set()}
+                )
+                # The node is cancelled at its deadline and reported as an error
+                self.assertLess(loop.time() - start, 1.0)
+                self.assertIn(f"{name} Timeout", state["errors"])
+                self.assertEqual(agent.llm.calls.count(kind), 1)
+
+    async def test_forward_falls_back(self):
+        with mock.patch.dict(NODE_DEADLINES, {"Action Selection": 0.05}):
+            agent = make_graph_agent(self.data_dir.name, StubLLM(action=5.0))
+        synapse = await agent.forward(make_observation(5.0))
+        await agent.graph_task
+        self.assertNotEqual(synapse.action, [MOVE_EAST])
+        self.assertEqual(synapse.action[0]["name"], "move_in_direction")
+        self.assertFalse(agent.graph_late)
+        self.assertEqual(agent.memory.memory["logs"], [])
+
+    async def test_objective_reevaluation_cadence(self):
+        agent = make_graph_agent(self.data_dir.name, StubLLM())
+        agent.objective_reevaluation_step = -senior.OBJECTIVE_REEVALUATION_INTERVAL
+        state = {"errors": set(), "reflection": "The corridor continues east"}
+        for step in range(1, 13):
+            agent.step = step
+            await agent.objective_reevaluation(state)
+            await agent.objective_reevaluation_task
+
+        # Every `OBJECTIVE_REEVALUATION_INTERVAL` steps, from the first one
+        self.assertEqual(agent.llm.calls.count("objectives"), 3)
+        self.assertEqual(agent.objective_reevaluation_step, 11)
+        self.assertEqual(agent.memory.memory["goals"], ["Find the exit"])
+        self.assertEqual(agent.memory.memory["plans"], ["Follow the wall"])
+
+        # A running reevaluation is not started again, steps do not wait for it
+        agent.llm.delays["objectives"] = 0.2
+        agent.llm.calls.clear()
+        for step in range(16, 24):
+            agent.step = step
+            await agent.objective_reevaluation(state)
+            await asyncio.sleep(0)
+        self.assertEqual(agent.llm.calls.count("objectives"), 1)
+        self.assertFalse(agent.objective_reevaluation_task.done())
+        await agent.objective_reevaluation_task
+        agent.step = 24
+        await agent.objective_reevaluation(state)
+        await agent.objective_reevaluation_task
+        self.assertEqual(agent.llm.calls.count("objectives"), 2)
+
+    async def test_objective_reevaluation_deadline(self):
+        agent = make_graph_agent(self.data_dir.name, StubLLM(objectives=5.0))
+        with mock.patch.object(senior, "OBJECTIVE_REEVALUATION_DEADLINE", 0.05):
+            await agent._reevaluate_objectives("The corridor continues east")
+        # The goals are kept when the reevaluation misses its deadline
+        self.assertEqual(agent.memory.memory["goals"], ["Explore the canyon"])
+
+
+class TestPromptSections(unittest.TestCase):
+    def test_action_space_section(self):
+        with tempfile.TemporaryDirectory() as data_dir:
+            agent = make_agent(data_dir)
+        agent.prompts = PromptBuilder()
+        action_space = [{"function": {"name": "talk", "description": "Say"}}]
+        synapse = SimpleNamespace(action_space=action_space)
+
+        # The nodes of a step share the synapse action space
+        section = agent._action_space_section(synapse)
+        self.assertEqual(section, "  - talk: Say\n")
+        self.assertIs(agent._action_space_section(synapse), section)
+        self.assertEqual((agent.prompts.hits, agent.prompts.misses), (1, 1))
+
+        # The action space of the next step is rendered again
+        synapse = SimpleNamespace(
+            action_space=[{"function": {"name": "talk", "description": "Speak"}}]
+        )
+        self.assertEqual(agent._action_space_section(synapse), "  - talk: Speak\n")
+        self.assertEqual(agent.prompts.misses, 2)
+
+
+class TestJSONFileMemory(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.data_dir.name, "memory.json")
+
+    def tearDown(self):
+        self.data_dir.cleanup()
+
+    def read(self) -> dict:
+        with open(self.file_path) as f:
+            return json.load(f)
+
+    async def test_dirty_flag(self):
+        memory = JSONFileMemory(self.file_path)
+        self.assertFalse(memory.dirty)
+        memory.push_log("move_in_direction, direction: east")
+        self.assertTrue(memory.dirty)
+        self.assertEqual(memory.versions["logs"], 1)
+
+        memory.save()
+        self.assertFalse(memory.dirty)
+        self.assertEqual(len(self.read()["logs"]), 1)
+
+        # Nothing is written without pending changes
+        with mock.patch.object(memory, "_write") as write:
+            memory.save()
+        write.assert_not_called()
+
+        memory.update_log("Moved 5m east")
+        self.assertTrue(memory.dirty)
+        self.assertEqual(memory.versions["logs"], 2)
+
+    async def test_periodic_flush(self):
+        memory = JSONFileMemory(self.file_path, flush_interval=0.05)
+        memory.start_flush()
+        task = memory._flush_task
+        memory.start_flush()
+        self.assertIs(memory._flush_task, task)
+
+        memory.set("goals", ["Find the exit"])
+        self.assertFalse(os.path.exists(self.file_path))
+        await asyncio.sleep(0.2)
+        self.assertEqual(self.read()["goals"], ["Find the exit"])
+        self.assertFalse(memory.dirty)
+        task.cancel()
+
+    async def test_atomic_write(self):
+        memory = JSONFileMemory(self.file_path)
+        memory.set("goals", ["Find the exit"])
+        memory.save()
+
+        # A failed write leaves the previous file in place
+        memory.set("goals", ["Repair the ship"])
+        with mock.patch("os.replace", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                memory.save()
+        self.assertEqual(self.read()["goals"], ["Find the exit"])
+
+        # An older encoding never overwrites a newer one
+        memory.dirty = True
+        old = memory._dump()
+        memory.set("goals", ["Talk to the team"])
+        memory.save()
+        memory._write(*old)
+        self.assertEqual(self.read()["goals"], ["Talk to the team"])
+
+    async def test_save_from_thread(self):
+        memory = JSONFileMemory(self.file_path)
+        stop = threading.Event()
+
+        def save():
+            while not stop.is_set():
+                memory.save()
+
+        thread = threading.Thread(target=save)
+        thread.start()
+        try:
+            for i in range(2000):
+                memory.push_log(f"move_in_direction, distance: {i}")
+                memory.update_log("Moved")
+        finally:
+            stop.set()
+            thread.join()
+        memory.save()
+        self.assertEqual(self.read()["logs"], memory.memory["logs"])
+
+
+class TestShutdown(unittest.TestCase):
+    def test_stop_run_thread(self):
+        with tempfile.TemporaryDirectory() as data_dir:
+            agent = make_agent(data_dir)
+            agent.slam = mock.MagicMock()
+            agent.memory.push_log("move_in_direction, direction: east")
+            with mock.patch.object(BaseMinerNeuron, "stop_run_thread"):
+                agent.stop_run_thread()
+
+            self.assertEqual(
+                [
+                    name
+                    for name, _, _ in agent.slam.mock_calls
+                    if not name.startswith("lock")
+                ],
+                ["flush", "stop", "save"],
+            )
+            self.assertFalse(agent.memory.dirty)
+            self.assertTrue(os.path.exists(agent.memory.file_path))
+
+
+if __name__ == "__main__":
+    unittest.main()